@@ -5,28 +5,58 @@ This module provides functionality for:
 - Learning pathway generation (BASIC, BALANCED, ACCELERATION)
 - Concept mastery tracking
 - AI-powered learning roadmap generation
+- Bulk learning event ingestion
 """
 
+from .student_context import StudentContext
+from .bkt import BKTEngine, BKTParams, bkt_engine
+from .mastery_store import ConceptMasteryStore, concept_mastery_store
+from .rollups import PerformanceRollupStore, performance_rollup_store
 from .learning_pathway import LearningPathwayService, PathwayError, learning_pathway_service
 from .concept_mastery import ConceptMasteryService, ConceptMasteryError, concept_mastery_service
+from .ai_cache import AIResponseCache, ai_response_cache
+from .result_cache import StudentResultCache, student_result_cache
 from .roadmap_service import RoadmapService, RoadmapError, roadmap_service
+from .roadmap_snapshots import RoadmapSnapshotStore, roadmap_snapshot_store
+from .ingestion import IngestionService, IngestionError, ingestion_service
 from .learning_pathway_routes import pathway_bp
 from .concept_mastery_routes import concept_mastery_bp
 from .roadmap_routes import roadmap_bp
+from .ingestion_routes import ingestion_bp
+from .metrics_routes import metrics_bp
 
 __all__ = [
+    'StudentContext',
     'LearningPathwayService',
     'PathwayError',
     'learning_pathway_service',
     'ConceptMasteryService',
     'ConceptMasteryError',
     'concept_mastery_service',
+    'ConceptMasteryStore',
+    'concept_mastery_store',
+    'PerformanceRollupStore',
+    'performance_rollup_store',
+    'BKTEngine',
+    'BKTParams',
+    'bkt_engine',
+    'AIResponseCache',
+    'ai_response_cache',
+    'StudentResultCache',
+    'student_result_cache',
     'RoadmapService',
     'RoadmapError',
     'roadmap_service',
+    'RoadmapSnapshotStore',
+    'roadmap_snapshot_store',
+    'IngestionService',
+    'IngestionError',
+    'ingestion_service',
     'pathway_bp',
     'concept_mastery_bp',
-    'roadmap_bp'
+    'roadmap_bp',
+    'ingestion_bp',
+    'metrics_bp'
 ]
 
 
@@ -0,0 +1,142 @@
+"""
+AI Response Cache Module.
+
+Content-addressed cache in front of the AI service. Keys are a hash of the
+call kind, the full request (prompt or action-item inputs) and the model
+name, so identical requests reuse earlier generations. Entries live in an
+in-process LRU and, with ILPG_AI_CACHE_BACKEND=mongo, in a Mongo collection
+so they survive restarts.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, Callable
+
+import sys
+from pathlib import Path
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from database import get_database
+from . import config
+from .cache import LRUTTLCache
+from .metrics import timer, count_cache, log_error
+
+
+class AIResponseCache:
+    """Prompt-hash keyed cache for AI generations."""
+    
+    def __init__(self):
+        self._db = None
+        self._memory = LRUTTLCache(max_entries=config.AI_CACHE_MAX_ENTRIES, ttl_seconds=config.AI_CACHE_TTL)
+        self._lock = threading.Lock()
+        self.persistent_hits = 0
+        self.persistent_errors = 0
+    
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = get_database()
+        return self._db
+    
+    @property
+    def collection(self):
+        if config.AI_CACHE_BACKEND != 'mongo' or self.db is None:
+            return None
+        return self.db[config.AI_CACHE_COLLECTION]
+    
+    def make_key(self, kind: str, request: Dict) -> str:
+        """Hash of the call kind, request and model."""
+        payload = json.dumps({
+            'kind': kind,
+            'model': os.getenv('GROQ_MODEL', ''),
+            'request': request
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+    
+    def _load_persistent(self, key: str) -> Any:
+        collection = self.collection
+        if collection is None:
+            return None
+        try:
+            doc = collection.find_one({'_id': key, 'expires_at': {'$gt': datetime.utcnow()}})
+        except Exception as e:
+            self._count('persistent_errors')
+            log_error('AICache', f'Error reading cache: {e}')
+            return None
+        if doc is None:
+            return None
+        self._count('persistent_hits')
+        return doc['value']
+    
+    def _store_persistent(self, key: str, kind: str, value: Any) -> None:
+        collection = self.collection
+        if collection is None:
+            return
+        now = datetime.utcnow()
+        try:
+            collection.replace_one({'_id': key}, {
+                '_id': key,
+                'kind': kind,
+                'value': value,
+                'created_at': now,
+                'expires_at': now + timedelta(seconds=config.AI_CACHE_TTL)
+            }, upsert=True)
+        except Exception as e:
+            self._count('persistent_errors')
+            log_error('AICache', f'Error writing cache: {e}')
+    
+    def get_or_generate(self, kind: str, request: Dict, generate: Callable[[], Any]) -> Any:
+        """
+        Return a cached generation for the request, or call `generate`.
+        
+        Empty results (the AI service returns None/'' on failure) are not
+        cached, so the next request retries the model.
+        """
+        if not config.AI_CACHE_ENABLED:
+            with timer('ai', kind):
+                return generate()
+        
+        key = self.make_key(kind, request)
+        value = self._memory.get(key)
+        if value is not None:
+            count_cache('ai', 'hit', kind)
+            return value
+        
+        value = self._load_persistent(key)
+        if value is not None:
+            count_cache('ai', 'persistent_hit', kind)
+            self._memory.set(key, value)
+            return value
+        
+        count_cache('ai', 'miss', kind)
+        with timer('ai', kind):
+            value = generate()
+        if value:
+            self._memory.set(key, value)
+            self._store_persistent(key, kind, value)
+        return value
+    
+    def clear(self) -> None:
+        """Drop every cached generation."""
+        self._memory.clear()
+        collection = self.collection
+        if collection is not None:
+            collection.delete_many({})
+    
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss/eviction counters (memory misses include persistent hits)."""
+        stats = self._memory.stats()
+        stats['persistent_hits'] = self.persistent_hits
+        stats['persistent_errors'] = self.persistent_errors
+        return stats
+
+
+# Global cache instance
+ai_response_cache = AIResponseCache()
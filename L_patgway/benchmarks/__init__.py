@@ -0,0 +1,17 @@
+"""
+ILPG benchmarks.
+
+Standalone timing scripts, run as modules, e.g.
+`python -m L_patgway.benchmarks.bench_cohort`.
+
+Importing L_patgway imports the backend's database, accounts and ai_service
+modules, so run them from the backend directory that holds those modules
+next to L_patgway, or put that directory on PYTHONPATH:
+    
+    cd backend && python -m L_patgway.benchmarks.bench_services
+    PYTHONPATH=/path/to/backend python -m L_patgway.benchmarks.bench_services
+
+Elsewhere the import fails with "No module named 'database'". The
+benchmarks never call database.get_database(); they write to mongomock or
+the --mongo-uri they are given.
+"""
@@ -0,0 +1,100 @@
+"""
+Cohort classification benchmark.
+
+Compares per-student classification (build_performance +
+classify_performance in a Python loop) with the vectorized cohort engine
+on synthetic aggregates, and checks that both produce the same labels and
+reason codes.
+    
+    python -m L_patgway.benchmarks.bench_cohort --students 50000
+"""
+
+import argparse
+import time
+from collections import Counter
+from typing import Optional, List
+
+import numpy as np
+
+from .. import config
+from ..cohort import classify_arrays, performance_arrays, PATHWAY_TYPES, REASON_CODES
+from ..learning_pathway import learning_pathway_service
+
+
+def synthetic_aggregates(students: int, seed: int = 42) -> dict:
+    """Random per-student quiz/task totals with a realistic spread (scores are percentages)."""
+    rng = np.random.default_rng(seed)
+    total_quizzes = rng.integers(0, 60, size=students)
+    score_sums = total_quizzes * rng.beta(4, 2.5, size=students) * config.QUIZ_SCORE_MAX
+    total_tasks = rng.integers(0, 80, size=students)
+    completed_tasks = np.floor(total_tasks * rng.beta(3, 2, size=students)).astype(np.int64)
+    return {
+        'total_quizzes': total_quizzes,
+        'score_sums': score_sums,
+        'total_tasks': total_tasks,
+        'completed_tasks': completed_tasks
+    }
+
+
+def run_per_student(aggregates: dict) -> List[tuple]:
+    results = []
+    for total_quizzes, score_sum, total_tasks, completed_tasks in zip(
+            aggregates['total_quizzes'].tolist(), aggregates['score_sums'].tolist(),
+            aggregates['total_tasks'].tolist(), aggregates['completed_tasks'].tolist()):
+        performance = learning_pathway_service.build_performance(
+            total_quizzes=total_quizzes,
+            total_score=score_sum,
+            total_tasks=total_tasks,
+            completed_tasks=completed_tasks,
+            recent_attempts=0,
+            last_quiz_date=None
+        )
+        pathway = learning_pathway_service.classify_performance(performance)
+        results.append((pathway['pathway_type'], pathway['reason_code']))
+    return results
+
+
+def run_vectorized(aggregates: dict) -> dict:
+    performance = performance_arrays(
+        aggregates['total_quizzes'], aggregates['score_sums'],
+        aggregates['total_tasks'], aggregates['completed_tasks']
+    )
+    return classify_arrays(performance['average_score'], performance['task_completion_rate'], aggregates['total_quizzes'])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark cohort pathway classification')
+    parser.add_argument('--students', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+    
+    aggregates = synthetic_aggregates(args.students)
+    
+    per_student_times = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        expected = run_per_student(aggregates)
+        per_student_times.append(time.perf_counter() - start)
+    
+    vectorized_times = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        result = run_vectorized(aggregates)
+        vectorized_times.append(time.perf_counter() - start)
+    
+    actual = [(PATHWAY_TYPES[label], REASON_CODES[reason]) for label, reason in zip(result['labels'], result['reasons'])]
+    mismatches = sum(1 for left, right in zip(expected, actual) if left != right)
+    branches = Counter(expected)
+    
+    per_student = min(per_student_times)
+    vectorized = min(vectorized_times)
+    print(f'students:    {args.students}')
+    print(f'per-student: {per_student * 1000:.1f} ms')
+    print(f'vectorized:  {vectorized * 1000:.1f} ms ({per_student / vectorized:.0f}x faster)')
+    print('branches:    ' + ', '.join(f'{label}/{reason} {count}' for (label, reason), count in sorted(branches.items())))
+    print(f'mismatches:  {mismatches}')
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,107 @@
+"""
+Response serialization benchmark.
+
+Times encoding a concept mastery response with N concepts three ways:
+Flask jsonify over pre-formatted ISO strings (the previous path), the
+json module fallback of serialization.dumps and orjson (ILPG_FAST_JSON),
+then reports gzip/brotli sizes and times for the encoded body.
+    
+    python -m L_patgway.benchmarks.bench_serialization --concepts 1000
+"""
+
+import argparse
+import gzip
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Optional, List, Callable
+
+from flask import Flask, jsonify
+
+from .. import config, serialization
+from ..concept_mastery import concept_mastery_service
+
+
+def synthetic_payload(concepts: int, seed: int = 42) -> dict:
+    """A get_concept_mastery-shaped response with raw datetimes."""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    entries = []
+    for index in range(concepts):
+        state = concept_mastery_service.new_concept_state(f'concept_{index}')
+        for _ in range(rng.randint(0, 12)):
+            concept_mastery_service.apply_quiz(state, rng.uniform(20, 100), now - timedelta(minutes=rng.randint(0, 90000)))
+        for _ in range(rng.randint(0, 6)):
+            source = rng.choice(['lesson', 'assignment', 'structured_content'])
+            concept_mastery_service.apply_engagement(state, source, now - timedelta(minutes=rng.randint(0, 90000)))
+        entries.append(concept_mastery_service.build_concept_entry(state))
+    return {
+        'success': True,
+        'data': {
+            'student_id': 'benchmark',
+            'concepts': entries,
+            'total_concepts': len(entries),
+            'last_updated': now
+        }
+    }
+
+
+def preformatted(payload: dict) -> dict:
+    """The same payload with every datetime already converted by .isoformat()."""
+    return json.loads(json.dumps(payload, default=lambda value: value.isoformat()))
+
+
+def best_of(repeat: int, run: Callable[[], object]) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark ILPG response serialization')
+    parser.add_argument('--concepts', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args(argv)
+    
+    payload = synthetic_payload(args.concepts)
+    formatted = preformatted(payload)
+    app = Flask(__name__)
+    
+    with app.app_context():
+        jsonify_time = best_of(args.repeat, lambda: jsonify(formatted).get_data())
+    
+    config.FAST_JSON = False
+    fallback_body = serialization.dumps(payload)
+    fallback_time = best_of(args.repeat, lambda: serialization.dumps(payload))
+    
+    print(f'concepts:     {args.concepts}')
+    print(f'jsonify:      {jsonify_time * 1000:.2f} ms')
+    print(f'json module:  {fallback_time * 1000:.2f} ms')
+    
+    body = fallback_body
+    if serialization.orjson is not None:
+        config.FAST_JSON = True
+        body = serialization.dumps(payload)
+        fast_time = best_of(args.repeat, lambda: serialization.dumps(payload))
+        print(f'orjson:       {fast_time * 1000:.2f} ms ({jsonify_time / fast_time:.1f}x faster than jsonify)')
+        if json.loads(body) != json.loads(fallback_body):
+            print('orjson output differs from the json module output')
+            return 1
+    else:
+        print('orjson:       not installed')
+    
+    gzip_time = best_of(args.repeat, lambda: gzip.compress(body, compresslevel=min(config.COMPRESS_LEVEL, 9)))
+    print(f'body:         {len(body)} bytes')
+    print(f'gzip:         {len(gzip.compress(body, compresslevel=min(config.COMPRESS_LEVEL, 9)))} bytes in {gzip_time * 1000:.2f} ms')
+    if serialization.brotli is not None:
+        brotli_time = best_of(args.repeat, lambda: serialization.brotli.compress(body, quality=config.COMPRESS_LEVEL))
+        print(f'brotli:       {len(serialization.brotli.compress(body, quality=config.COMPRESS_LEVEL))} bytes in {brotli_time * 1000:.2f} ms')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,194 @@
+"""
+ILPG service benchmark.
+
+Generates a synthetic dataset (see synthetic.py) into mongomock, or into
+the mongod given with --mongo-uri, then times the per-student read paths and
+reports p50/p95/p99 latency and database round trips (find/find_one/aggregate
+calls) per call:
+    get_student_performance, calculate_concept_mastery,
+    identify_weak_areas, generate_roadmap_guidance
+
+ai_service is replaced by a stub with a fixed latency, and the result and
+AI caches are disabled, so every call does the full work. mongomock has
+no indexes and runs aggregations in Python, so compare modes on a mongod;
+round-trip counts are the same on both.
+
+The services log errors and return empty results rather than raising, so
+the benchmark stops on any logged error instead of timing the error path.
+In aggregation mode it first checks the pipelines against the Python path
+(pipelines.verify_parity) for every sampled student.
+
+Run it where the backend's database/accounts/ai_service modules are
+importable (see the package docstring for the working directory and
+PYTHONPATH):
+    
+    python -m L_patgway.benchmarks.bench_services --students 200 --activities 300
+    python -m L_patgway.benchmarks.bench_services --mongo-uri mongodb://localhost:27017 --backend materialized
+"""
+
+import argparse
+import importlib
+import random
+import time
+from typing import Optional, Dict, List, Callable
+
+from .. import config, pipelines
+from ..concept_mastery import concept_mastery_service
+from ..indexes import ensure_indexes, _RecordingDatabase
+from ..learning_pathway import learning_pathway_service
+from ..mastery_store import concept_mastery_store
+from ..metrics import registry
+from ..roadmap_service import roadmap_service
+from ..rollups import performance_rollup_store
+from .synthetic import SyntheticScale, generate
+
+SERVICES = (concept_mastery_service, learning_pathway_service, concept_mastery_store,
+            roadmap_service, performance_rollup_store)
+
+
+class StubAIService:
+    """Stands in for ai_service: fixed latency, canned text."""
+    
+    def __init__(self, latency_ms: float = 0):
+        self.latency = latency_ms / 1000
+        self.calls = 0
+    
+    def generate_recommendation(self, prompt: str, max_tokens: int = 200) -> Optional[str]:
+        self.calls += 1
+        time.sleep(self.latency)
+        return 'Review the weakest concepts first and practise them a little every day.'
+    
+    def generate_action_items(self, concept_name: str, mastery_percentage: float,
+                              pathway_type: str, max_items: int = 5) -> List[str]:
+        self.calls += 1
+        time.sleep(self.latency)
+        return [f'Practise {concept_name}', f'Review notes on {concept_name}'][:max_items]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def open_database(mongo_uri: Optional[str], db_name: str):
+    if mongo_uri:
+        from pymongo import MongoClient
+        return MongoClient(mongo_uri)[db_name]
+    try:
+        import mongomock
+    except ImportError:
+        raise SystemExit('mongomock is not installed; pass --mongo-uri to use a mongod')
+    return mongomock.MongoClient()[db_name]
+
+
+def operations() -> Dict[str, Callable[[str], object]]:
+    return {
+        'get_student_performance': learning_pathway_service.get_student_performance,
+        'calculate_concept_mastery': concept_mastery_service.calculate_concept_mastery,
+        'identify_weak_areas': roadmap_service.identify_weak_areas,
+        'generate_roadmap_guidance': roadmap_service.generate_roadmap_guidance
+    }
+
+
+def check_parity(db, student_ids: List[str]) -> None:
+    """Exit if the aggregation pipelines disagree with the Python path for any student."""
+    for student_id in student_ids:
+        differences = pipelines.verify_parity(student_id, db)
+        if differences:
+            raise SystemExit(f'aggregation mode differs from python mode for {student_id}: {differences[0]}')
+
+
+def run(recorder: _RecordingDatabase, student_ids: List[str], repeat: int) -> Dict[str, Dict[str, List[float]]]:
+    """
+    Time every operation for every sampled student; each call gets a fresh context.
+    
+    Exits as soon as an operation logs an error (ilpg_errors_total grows).
+    """
+    results = {name: {'latency': [], 'round_trips': []} for name in operations()}
+    for _ in range(repeat):
+        for student_id in student_ids:
+            for name, operation in operations().items():
+                del recorder.queries[:]
+                errors = registry.counter_total('ilpg_errors_total')
+                start = time.perf_counter()
+                operation(student_id)
+                results[name]['latency'].append(time.perf_counter() - start)
+                results[name]['round_trips'].append(len(recorder.queries))
+                if registry.counter_total('ilpg_errors_total') != errors:
+                    raise SystemExit(f'{name} logged an error for {student_id}; not timing a failing read path')
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark the ILPG per-student services')
+    parser.add_argument('--students', type=int, default=200)
+    parser.add_argument('--activities', type=int, default=300, help='Activities per student')
+    parser.add_argument('--concepts', type=int, default=60)
+    parser.add_argument('--modules', type=int, default=6)
+    parser.add_argument('--sample', type=int, default=50, help='Students timed per repeat')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--mongo-uri', help='Benchmark against a mongod instead of mongomock')
+    parser.add_argument('--db-name', default='ilpg_benchmark')
+    parser.add_argument('--keep-data', action='store_true', help='Reuse the data already in --db-name')
+    parser.add_argument('--backend', choices=['recompute', 'materialized'], default=config.MASTERY_BACKEND)
+    parser.add_argument('--query-mode', choices=['python', 'aggregation'], default=config.QUERY_MODE)
+    parser.add_argument('--performance-backend', choices=['recompute', 'rollup'], default=config.PERFORMANCE_BACKEND)
+    parser.add_argument('--ai-latency-ms', type=float, default=0)
+    args = parser.parse_args(argv)
+    
+    db = open_database(args.mongo_uri, args.db_name)
+    scale = SyntheticScale(students=args.students, activities=args.activities,
+                           concepts=args.concepts, modules=args.modules)
+    start = time.perf_counter()
+    if args.keep_data:
+        student_ids = [str(student_oid) for student_oid in db.enrollments.distinct('student_id')]
+    else:
+        student_ids = generate(db, scale)
+    print(f'data:     {len(student_ids)} students x {args.activities} activities '
+          f'({time.perf_counter() - start:.1f} s)')
+    
+    config.MASTERY_BACKEND = args.backend
+    config.QUERY_MODE = args.query_mode
+    config.PERFORMANCE_BACKEND = args.performance_backend
+    config.RESULT_CACHE_ENABLED = False
+    config.AI_CACHE_ENABLED = False
+    # Logged errors are counted in ilpg_errors_total, which run() watches
+    config.METRICS_ENABLED = True
+    
+    recorder = _RecordingDatabase(db)
+    for service in SERVICES:
+        service._db = recorder
+    ai_stub = StubAIService(args.ai_latency_ms)
+    importlib.import_module('..roadmap_service', __package__).ai_service = ai_stub
+    
+    if args.mongo_uri:
+        ensure_indexes(db)
+    if args.backend == 'materialized':
+        concept_mastery_store.rebuild(student_ids)
+    if args.performance_backend == 'rollup':
+        performance_rollup_store.rebuild(student_ids)
+    
+    sample = random.Random(0).sample(student_ids, k=min(args.sample, len(student_ids)))
+    if args.query_mode == 'aggregation':
+        check_parity(recorder, sample)
+    results = run(recorder, sample, args.repeat)
+    
+    print(f'modes:    backend={args.backend} query_mode={args.query_mode} '
+          f'performance={args.performance_backend} ai_latency={args.ai_latency_ms:g} ms')
+    print(f"{'operation':<28}{'calls':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'round trips':>13}")
+    for name, result in results.items():
+        latency = result['latency']
+        round_trips = sum(result['round_trips']) / len(result['round_trips'])
+        print(f'{name:<28}{len(latency):>7}'
+              f'{percentile(latency, 50) * 1000:>10.2f}{percentile(latency, 95) * 1000:>10.2f}'
+              f'{percentile(latency, 99) * 1000:>10.2f}{round_trips:>13.1f}')
+    print(f'ai calls: {ai_stub.calls}')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
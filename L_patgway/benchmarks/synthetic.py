@@ -0,0 +1,132 @@
+"""
+Synthetic ILPG data.
+
+Writes students' learning_activities, engagement_logs, enrollments and the
+structured_contents they are enrolled in, at a configurable scale, into any
+pymongo-compatible database (a local mongod or mongomock).
+
+Each student has a hidden ability per concept that drifts upward with
+practice, so quiz scores, weak areas and pathways spread the way real
+cohorts do. Concepts are named in every format extract_concepts()
+understands (metadata.concepts, metadata.concept, metadata.topic,
+structured content fields and lesson ids).
+"""
+
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from bson import ObjectId
+
+COLLECTIONS = ('learning_activities', 'engagement_logs', 'enrollments', 'structured_contents')
+
+
+@dataclass
+class SyntheticScale:
+    """How much data to generate."""
+    students: int = 200
+    activities: int = 300  # per student
+    concepts: int = 60  # in total, split across modules
+    modules: int = 6
+    days: int = 120  # history length
+    seed: int = 42
+
+
+def _concept_catalog(scale: SyntheticScale) -> Dict[str, List[Dict]]:
+    """Module name -> topic descriptors (topic, unit, module)."""
+    catalog = {}
+    per_module = max(1, scale.concepts // scale.modules)
+    for module_index in range(scale.modules):
+        module_name = f'Module {module_index + 1}'
+        catalog[module_name] = [
+            {
+                'topic_name': f'Topic {module_index + 1}.{topic_index + 1}',
+                'unit_name': f'Unit {module_index + 1}.{topic_index // 5 + 1}',
+                'module_name': module_name
+            }
+            for topic_index in range(per_module)
+        ]
+    return catalog
+
+
+def _concept_fields(rng: random.Random, topic: Dict) -> Dict:
+    """Activity fields naming the topic in one of the supported formats."""
+    style = rng.random()
+    if style < 0.35:
+        return {'metadata': {'concepts': [topic['topic_name']]}}
+    if style < 0.55:
+        return {'metadata': {'concept': topic['topic_name']}}
+    if style < 0.7:
+        return {'metadata': {'topic': topic['topic_name']}}
+    if style < 0.9:
+        return dict(topic)
+    # No concept metadata: falls back to the lesson id
+    return {'lesson_id': ObjectId()}
+
+
+def _insert(db, collection_name: str, documents: List[Dict], batch_size: int = 1000) -> None:
+    for start in range(0, len(documents), batch_size):
+        db[collection_name].insert_many(documents[start:start + batch_size], ordered=False)
+
+
+def generate(db, scale: SyntheticScale, drop: bool = True) -> List[str]:
+    """Write a synthetic dataset into `db`. Returns the student ids."""
+    rng = random.Random(scale.seed)
+    if drop:
+        for collection_name in COLLECTIONS:
+            db[collection_name].delete_many({})
+    
+    catalog = _concept_catalog(scale)
+    module_names = list(catalog)
+    now = datetime.utcnow()
+    
+    _insert(db, 'structured_contents', [
+        dict(topic, approved=True, status=rng.choice(['approved', 'published']), created_at=now)
+        for topics in catalog.values() for topic in topics
+    ])
+    
+    student_ids = []
+    for _ in range(scale.students):
+        student_oid = ObjectId()
+        student_ids.append(str(student_oid))
+        modules = rng.sample(module_names, k=min(len(module_names), rng.randint(1, 3)))
+        topics = [topic for module_name in modules for topic in catalog[module_name]]
+        base_ability = rng.betavariate(4, 3)
+        ability = {topic['topic_name']: min(0.98, max(0.02, rng.gauss(base_ability, 0.15))) for topic in topics}
+        
+        enrollments = [
+            {'student_id': student_oid, 'module_name': module_name, 'enrolled_at': now - timedelta(days=scale.days)}
+            for module_name in modules
+        ]
+        activities = []
+        engagement = []
+        for _ in range(scale.activities):
+            topic = rng.choice(topics)
+            created_at = now - timedelta(days=rng.uniform(0, scale.days))
+            document = dict(_concept_fields(rng, topic), user_id=student_oid, created_at=created_at)
+            kind = rng.random()
+            if kind < 0.45:
+                skill = ability[topic['topic_name']]
+                score = min(1.0, max(0.0, rng.gauss(skill, 0.12)))
+                # Practice helps a little
+                ability[topic['topic_name']] = min(0.98, skill + 0.01)
+                document.update(activity_type='quiz_complete', score=round(score * 100, 1), quiz_id=ObjectId())
+                activities.append(document)
+            elif kind < 0.7:
+                document.update(activity_type='lesson_complete')
+                activities.append(document)
+            else:
+                completed = rng.random() < 0.4 + 0.5 * base_ability
+                document.update(
+                    activity_type=rng.choice(['assignment_submit', 'lesson_complete']),
+                    points_earned=rng.randint(1, 10) if completed else 0
+                )
+                if completed and rng.random() < 0.5:
+                    document.setdefault('metadata', {})['status'] = 'completed'
+                engagement.append(document)
+        
+        _insert(db, 'enrollments', enrollments)
+        _insert(db, 'learning_activities', activities)
+        _insert(db, 'engagement_logs', engagement)
+    return student_ids
@@ -0,0 +1,278 @@
+"""
+Bayesian Knowledge Tracing Module.
+
+BKT mastery model used when ILPG_MASTERY_MODEL=bkt. Each concept has four
+parameters: p(L0) (initial knowledge), p(T) (learning transition), p(G)
+(guess) and p(S) (slip). Every quiz attempt is an observation (correct when
+the score reaches BKT_CORRECT_THRESHOLD) and updates the knowledge estimate
+p(L) in constant time, so the materialized store can fold new quizzes in
+without reading history.
+
+Full histories are replayed with replay_batch(), which steps many
+sequences (all concepts of a student, or a whole cohort) at once with
+NumPy. Recompute stored estimates, e.g. after changing parameters, with:
+    python -m L_patgway.bkt replay [--student <id> ...]
+"""
+
+import argparse
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Iterable, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; replay_batch falls back to the scalar loop
+    np = None
+from bson import ObjectId
+
+import sys
+from pathlib import Path
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from database import get_database
+from . import config
+from .cache import LRUTTLCache
+
+
+class BKTParams:
+    """The four BKT parameters for one concept."""
+    
+    FIELDS = ('p_init', 'p_transit', 'p_guess', 'p_slip')
+    
+    def __init__(self, p_init: float, p_transit: float, p_guess: float, p_slip: float):
+        for name, value in zip(self.FIELDS, (p_init, p_transit, p_guess, p_slip)):
+            if not 0 < value < 1:
+                raise ValueError(f'BKT parameter {name} must be between 0 and 1, got {value}')
+        self.p_init = p_init
+        self.p_transit = p_transit
+        self.p_guess = p_guess
+        self.p_slip = p_slip
+    
+    @classmethod
+    def default(cls) -> 'BKTParams':
+        return cls(config.BKT_P_INIT, config.BKT_P_TRANSIT, config.BKT_P_GUESS, config.BKT_P_SLIP)
+    
+    @classmethod
+    def from_document(cls, doc: Dict, default: 'BKTParams') -> 'BKTParams':
+        """Parameters from a bkt_params document, defaulting missing fields."""
+        return cls(*(float(doc.get(field, getattr(default, field))) for field in cls.FIELDS))
+
+
+def is_correct(score: float) -> bool:
+    """Whether a quiz score (a percentage, see config.QUIZ_SCORE_MAX) counts as a correct observation."""
+    return score / config.QUIZ_SCORE_MAX >= config.BKT_CORRECT_THRESHOLD
+
+
+def update_knowledge(p_known: float, correct: bool, params: BKTParams) -> float:
+    """One BKT step: condition p(L) on the observation, then apply learning."""
+    if correct:
+        known = p_known * (1 - params.p_slip)
+        unknown = (1 - p_known) * params.p_guess
+    else:
+        known = p_known * params.p_slip
+        unknown = (1 - p_known) * (1 - params.p_guess)
+    posterior = known / (known + unknown)
+    return posterior + (1 - posterior) * params.p_transit
+
+
+def replay(observations: Iterable[bool], params: BKTParams, p_known: Optional[float] = None) -> float:
+    """Fold a sequence of observations into p(L), starting from p(L0) unless given."""
+    p_known = params.p_init if p_known is None else p_known
+    for correct in observations:
+        p_known = update_knowledge(p_known, correct, params)
+    return p_known
+
+
+def replay_batch(sequences: List[List[bool]], params: List[BKTParams]) -> List[float]:
+    """
+    Replay many observation sequences at once.
+    
+    Sequences are padded into a (sequences x steps) matrix and advanced one
+    step at a time across all rows, so the Python loop runs once per step
+    of the longest sequence rather than once per observation.
+    """
+    if not sequences:
+        return []
+    if np is None:
+        return [replay(sequence, sequence_params) for sequence, sequence_params in zip(sequences, params)]
+    
+    lengths = np.fromiter((len(sequence) for sequence in sequences), dtype=np.int64, count=len(sequences))
+    steps = int(lengths.max())
+    observed = np.zeros((len(sequences), steps), dtype=bool)
+    for row, sequence in enumerate(sequences):
+        observed[row, :len(sequence)] = sequence
+    active = np.arange(steps) < lengths[:, None]
+    
+    p_init, p_transit, p_guess, p_slip = (
+        np.fromiter((getattr(p, field) for p in params), dtype=np.float64, count=len(params))
+        for field in BKTParams.FIELDS
+    )
+    p_known = p_init.copy()
+    for step in range(steps):
+        correct = observed[:, step]
+        known = np.where(correct, p_known * (1 - p_slip), p_known * p_slip)
+        unknown = np.where(correct, (1 - p_known) * p_guess, (1 - p_known) * (1 - p_guess))
+        posterior = known / (known + unknown)
+        p_known = np.where(active[:, step], posterior + (1 - posterior) * p_transit, p_known)
+    return p_known.tolist()
+
+
+def update_expression(observations: List[bool], params: BKTParams, field: str = '$p_known') -> Dict:
+    """
+    The BKT steps for `observations` as an aggregation expression over `field`.
+    
+    Used in pipeline-style updates so the store advances p(L) server-side
+    without reading the current value first.
+    """
+    expression = {'$ifNull': [field, params.p_init]}
+    for correct in observations:
+        if correct:
+            known = {'$multiply': ['$$p', 1 - params.p_slip]}
+            unknown = {'$multiply': [{'$subtract': [1, '$$p']}, params.p_guess]}
+        else:
+            known = {'$multiply': ['$$p', params.p_slip]}
+            unknown = {'$multiply': [{'$subtract': [1, '$$p']}, 1 - params.p_guess]}
+        expression = {'$let': {
+            'vars': {'p': expression},
+            'in': {'$let': {
+                'vars': {'posterior': {'$divide': [known, {'$add': [known, unknown]}]}},
+                'in': {'$add': ['$$posterior', {'$multiply': [{'$subtract': [1, '$$posterior']}, params.p_transit]}]}
+            }}
+        }}
+    return expression
+
+
+class BKTEngine:
+    """Per-concept parameters and history replay for the BKT mastery model."""
+    
+    def __init__(self):
+        self._db = None
+        self._params_cache = LRUTTLCache(max_entries=1, ttl_seconds=config.BKT_PARAMS_TTL)
+    
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = get_database()
+        return self._db
+    
+    def _load_params(self) -> Dict[str, BKTParams]:
+        """All per-concept parameter overrides (cached for BKT_PARAMS_TTL seconds)."""
+        overrides = self._params_cache.get('params')
+        if overrides is None:
+            overrides = {}
+            if self.db is not None:
+                default = BKTParams.default()
+                for doc in self.db[config.BKT_PARAMS_COLLECTION].find({}, {'_id': 0}):
+                    try:
+                        overrides[doc['concept_name']] = BKTParams.from_document(doc, default)
+                    except (KeyError, ValueError) as e:
+                        print(f'[BKT] Ignoring invalid parameters {doc}: {e}')
+            self._params_cache.set('params', overrides)
+        return overrides
+    
+    def params_for(self, concept_name: str) -> BKTParams:
+        """Parameters for a concept, falling back to the configured defaults."""
+        return self._load_params().get(concept_name) or BKTParams.default()
+    
+    def clear_params(self) -> None:
+        """Drop cached parameters so the next read reloads them."""
+        self._params_cache.clear()
+    
+    def concept_sequences(self, quizzes: List[Dict]) -> Dict[str, List[bool]]:
+        """Chronological correct/incorrect observations per concept."""
+        from .concept_mastery import concept_mastery_service
+        
+        sequences = {}
+        for quiz in sorted(quizzes, key=lambda q: q.get('created_at') or datetime.min):
+            if quiz.get('score') is None:
+                continue
+            correct = is_correct(quiz['score'])
+            for concept in concept_mastery_service.extract_concepts(quiz, 'quiz'):
+                sequences.setdefault(concept, []).append(correct)
+        return sequences
+    
+    def estimate(self, quizzes: List[Dict]) -> Dict[str, float]:
+        """p(L) per concept from a student's quiz history."""
+        sequences = self.concept_sequences(quizzes)
+        concepts = list(sequences)
+        estimates = replay_batch([sequences[c] for c in concepts], [self.params_for(c) for c in concepts])
+        return dict(zip(concepts, estimates))
+    
+    def _iter_student_quizzes(self, student_ids: Optional[List[str]]) -> Iterable[Tuple[ObjectId, List[Dict]]]:
+        """Stream quizzes grouped by student, in (student, date) order."""
+        query = {'activity_type': 'quiz_complete', 'score': {'$exists': True, '$ne': None}}
+        if student_ids is not None:
+            query['user_id'] = {'$in': [ObjectId(student_id) for student_id in student_ids]}
+        cursor = self.db.learning_activities.find(query).sort([('user_id', 1), ('created_at', 1)])
+        
+        current_student = None
+        quizzes = []
+        for quiz in cursor:
+            if quiz['user_id'] != current_student:
+                if quizzes:
+                    yield current_student, quizzes
+                current_student = quiz['user_id']
+                quizzes = []
+            quizzes.append(quiz)
+        if quizzes:
+            yield current_student, quizzes
+    
+    def replay_cohort(self, student_ids: Optional[List[str]] = None,
+                      batch_size: int = 500) -> Dict[str, Dict[str, float]]:
+        """
+        Replay the quiz history of many students, `batch_size` students per
+        vectorized batch. Returns p(L) per concept keyed by student id.
+        """
+        if self.db is None:
+            return {}
+        
+        results = {}
+        keys = []
+        sequences = []
+        params = []
+        
+        def flush():
+            for (student_id, concept), p_known in zip(keys, replay_batch(sequences, params)):
+                results.setdefault(student_id, {})[concept] = p_known
+            keys.clear()
+            sequences.clear()
+            params.clear()
+        
+        students_in_batch = 0
+        for student_oid, quizzes in self._iter_student_quizzes(student_ids):
+            for concept, sequence in self.concept_sequences(quizzes).items():
+                keys.append((str(student_oid), concept))
+                sequences.append(sequence)
+                params.append(self.params_for(concept))
+            students_in_batch += 1
+            if students_in_batch >= batch_size:
+                flush()
+                students_in_batch = 0
+        flush()
+        return results
+
+
+# Global engine instance
+bkt_engine = BKTEngine()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from .mastery_store import concept_mastery_store
+    
+    parser = argparse.ArgumentParser(description='Bayesian Knowledge Tracing tools')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    replay_parser = subparsers.add_parser('replay', help='Recompute stored p(L) from full quiz history')
+    replay_parser.add_argument('--student', action='append', dest='students', help='Student id (repeatable)')
+    replay_parser.add_argument('--batch-size', type=int, default=500, help='Students per vectorized batch')
+    args = parser.parse_args(argv)
+    
+    if args.command == 'replay':
+        estimates = bkt_engine.replay_cohort(args.students, args.batch_size)
+        concepts = 0
+        for student_id, knowledge in estimates.items():
+            concepts += concept_mastery_store.set_knowledge(student_id, knowledge)
+        print(f'[BKT] Updated {concepts} concepts for {len(estimates)} students')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
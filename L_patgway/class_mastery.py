@@ -0,0 +1,224 @@
+"""
+Class Mastery Module.
+
+Students x concepts mastery matrix for a module's class (teacher heatmaps).
+All enrolled students' activities (or, with the materialized backend,
+their concept states) are read in bulk, each student's concepts go through
+the same build_concept_entry as the per-student endpoints, and the cells
+are placed into a dense NumPy matrix over an interned concept index.
+Per-concept averages, medians and level distributions are computed on
+the matrix.
+
+A cell is empty (NaN, null in JSON) when the student has no quiz score or
+engagement for the concept. Content-only concepts (the module's topics,
+units and module name) still get a column, so untouched material shows up
+in the heatmap.
+"""
+
+from datetime import datetime
+from typing import Optional, Dict, Any, List
+
+import numpy as np
+from bson import ObjectId
+
+import sys
+from pathlib import Path
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from database import get_database
+from . import config
+from .bkt import bkt_engine
+from .concept_mastery import concept_mastery_service, ConceptMasteryError, MASTERY_LEVELS
+from .mastery_store import concept_mastery_store
+from .metrics import timed
+from .student_context import LEARNING_ACTIVITY_TYPES, TASK_ACTIVITY_TYPES
+
+
+# Fields extract_concepts() and the running totals read from an activity
+ACTIVITY_PROJECTION = {
+    'user_id': 1, 'activity_type': 1, 'score': 1, 'created_at': 1,
+    'metadata.concepts': 1, 'metadata.concept': 1, 'metadata.topic': 1,
+    'topic_name': 1, 'unit_name': 1, 'module_name': 1,
+    'lesson_id': 1, 'course_id': 1, 'quiz_id': 1
+}
+
+
+def _column_lists(matrix: np.ndarray, decimals: int = 2) -> List[List[Optional[float]]]:
+    """Concept-major lists of a students x concepts matrix, NaN as None."""
+    rounded = np.round(matrix.T, decimals)
+    return [[None if np.isnan(value) else value for value in column] for column in rounded.tolist()]
+
+
+def _optional_list(values: np.ndarray, decimals: int = 2) -> List[Optional[float]]:
+    return [None if np.isnan(value) else value for value in np.round(values, decimals).tolist()]
+
+
+class ClassMasteryService:
+    """Builds class-wide concept mastery matrices."""
+    
+    def __init__(self):
+        self._db = None
+    
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = get_database()
+        return self._db
+    
+    def load_roster(self, module_name: str) -> List[str]:
+        """Ids of the students enrolled in a module."""
+        return sorted(str(student_oid) for student_oid in self.db.enrollments.distinct(
+            'student_id', {'module_name': module_name}
+        ))
+    
+    def load_module_contents(self, module_name: str) -> List[Dict]:
+        """Approved structured content of the module."""
+        return list(self.db.structured_contents.find({
+            'module_name': module_name,
+            'approved': True,
+            'status': {'$in': ['approved', 'published']}
+        }))
+    
+    def load_class_states(self, student_ids: List[str], contents: List[Dict]) -> Dict[str, Dict[str, Dict]]:
+        """
+        Concept running totals for every student, keyed by student id.
+        
+        Only the module's content marks content-only concepts, so columns
+        are not added for the other modules the students are enrolled in.
+        """
+        content_concepts = set(concept_mastery_service.extract_content_concepts(contents))
+        
+        if config.MASTERY_BACKEND == 'materialized':
+            states = concept_mastery_store.load_class_states(student_ids)
+            return {
+                student_id: {
+                    concept: state for concept, state in student_states.items()
+                    if state['score_count'] or state['engagement_count'] or concept in content_concepts
+                }
+                for student_id, student_states in states.items()
+            }
+        
+        # Two bulk reads for the whole class, grouped by student in Python
+        student_oids = [ObjectId(student_id) for student_id in student_ids]
+        learning_activities = {student_id: [] for student_id in student_ids}
+        for activity in self.db.learning_activities.find(
+            {'user_id': {'$in': student_oids}, 'activity_type': {'$in': LEARNING_ACTIVITY_TYPES}},
+            ACTIVITY_PROJECTION
+        ):
+            learning_activities[str(activity['user_id'])].append(activity)
+        tasks = {student_id: [] for student_id in student_ids}
+        for task in self.db.engagement_logs.find(
+            {'user_id': {'$in': student_oids}, 'activity_type': {'$in': TASK_ACTIVITY_TYPES}},
+            ACTIVITY_PROJECTION
+        ):
+            tasks[str(task['user_id'])].append(task)
+        
+        states = {}
+        for student_id in student_ids:
+            activities = learning_activities[student_id]
+            quizzes = [
+                a for a in activities
+                if a.get('activity_type') == 'quiz_complete' and a.get('score') is not None
+            ]
+            student_states = concept_mastery_service.aggregate_concept_states(
+                quizzes=quizzes,
+                lessons=[a for a in activities if a.get('activity_type') == 'lesson_complete'],
+                assignments=tasks[student_id],
+                structured_contents=contents
+            )
+            if config.MASTERY_MODEL == 'bkt':
+                for concept, p_known in bkt_engine.estimate(quizzes).items():
+                    if concept in student_states:
+                        student_states[concept]['p_known'] = p_known
+            states[student_id] = student_states
+        return states
+    
+    def build_matrix(self, student_ids: List[str], states: Dict[str, Dict[str, Dict]]) -> Dict[str, Any]:
+        """
+        Place every student's concept entries into students x concepts arrays.
+        
+        Returns the concept names (interned column order), a float matrix of
+        mastery percentages (NaN = no evidence) and an int8 matrix of
+        MASTERY_LEVELS indexes (-1 = no evidence).
+        """
+        concept_index = {}
+        rows, columns, values, levels = [], [], [], []
+        level_index = {level: index for index, level in enumerate(MASTERY_LEVELS)}
+        for row, student_id in enumerate(student_ids):
+            for concept, state in states.get(student_id, {}).items():
+                column = concept_index.setdefault(concept, len(concept_index))
+                if not (state['score_count'] or state['engagement_count']):
+                    continue
+                entry = concept_mastery_service.build_concept_entry(state)
+                rows.append(row)
+                columns.append(column)
+                values.append(entry['mastery_percentage'])
+                levels.append(level_index[entry['mastery_level']])
+        
+        mastery = np.full((len(student_ids), len(concept_index)), np.nan)
+        level_matrix = np.full(mastery.shape, -1, dtype=np.int8)
+        mastery[rows, columns] = values
+        level_matrix[rows, columns] = levels
+        return {'concepts': list(concept_index), 'mastery': mastery, 'levels': level_matrix}
+    
+    @timed('class_mastery.get_class_mastery')
+    def get_class_mastery(self, module_name: str) -> Dict[str, Any]:
+        """
+        Mastery matrix and per-concept statistics for a module's class.
+        
+        Concept columns are ordered weakest class average first (concepts
+        nobody has evidence for last), then by name. Array fields are
+        aligned with `concepts`, except `student_average` which is aligned
+        with `students`; `mastery` holds one list per concept.
+        """
+        if self.db is None:
+            raise ConceptMasteryError('Database unavailable', 503)
+        
+        student_ids = self.load_roster(module_name)
+        if len(student_ids) > config.CLASS_MATRIX_MAX_STUDENTS:
+            raise ConceptMasteryError(
+                f'Class has {len(student_ids)} students; the matrix is limited to {config.CLASS_MATRIX_MAX_STUDENTS}', 400
+            )
+        states = self.load_class_states(student_ids, self.load_module_contents(module_name))
+        matrix = self.build_matrix(student_ids, states)
+        mastery = matrix['mastery']
+        assessed = ~np.isnan(mastery)
+        
+        with np.errstate(invalid='ignore', divide='ignore'):
+            assessed_count = assessed.sum(axis=0)
+            concept_average = np.where(assessed_count > 0, np.nansum(mastery, axis=0) / assessed_count, np.nan)
+            student_count = assessed.sum(axis=1)
+            student_average = np.where(student_count > 0, np.nansum(mastery, axis=1) / student_count, np.nan)
+        concept_median = np.array([
+            np.median(mastery[assessed[:, column], column]) if assessed_count[column] else np.nan
+            for column in range(mastery.shape[1])
+        ])
+        
+        # Weakest first; NaN averages sort last
+        names = matrix['concepts']
+        sort_average = np.nan_to_num(concept_average, nan=np.inf)
+        order = np.array(sorted(range(len(names)), key=lambda column: (sort_average[column], names[column])), dtype=np.intp)
+        mastery = mastery[:, order]
+        levels = matrix['levels'][:, order]
+        
+        return {
+            'module_name': module_name,
+            'student_count': len(student_ids),
+            'concept_count': len(order),
+            'students': student_ids,
+            'concepts': [names[column] for column in order],
+            'class_average': round(float(np.nanmean(mastery)), 2) if assessed.any() else 0,
+            'concept_average': _optional_list(concept_average[order]),
+            'concept_median': _optional_list(concept_median[order]),
+            'assessed_count': assessed_count[order].tolist(),
+            'level_distribution': {
+                level: (levels == index).sum(axis=0).tolist() for index, level in enumerate(MASTERY_LEVELS)
+            },
+            'student_average': _optional_list(student_average),
+            'mastery': _column_lists(mastery),
+            'last_updated': datetime.utcnow().isoformat()
+        }
+
+
+# Global service instance
+class_mastery_service = ClassMasteryService()
@@ -0,0 +1,165 @@
+"""
+Cohort Pathway Module.
+
+Vectorized pathway classification for whole cohorts (e.g. nightly
+re-classification of every student). Per-student quiz/task aggregates are
+loaded with one grouped aggregation per collection into NumPy arrays, and
+the BASIC/BALANCED/ACCELERATION thresholds plus the low-completion
+downgrade are applied as boolean masks. Labels and reason codes match
+LearningPathwayService.classify_performance.
+"""
+
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List
+
+import numpy as np
+from bson import ObjectId
+
+import sys
+from pathlib import Path
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from database import get_database
+from . import pipelines
+from .learning_pathway import LearningPathwayService, PathwayError
+
+
+# Index order used in the label/reason arrays
+PATHWAY_TYPES = [
+    LearningPathwayService.PATHWAY_BASIC,
+    LearningPathwayService.PATHWAY_BALANCED,
+    LearningPathwayService.PATHWAY_ACCELERATION
+]
+REASON_CODES = [
+    LearningPathwayService.REASON_INSUFFICIENT_DATA,
+    LearningPathwayService.REASON_FOUNDATIONAL_SUPPORT,
+    LearningPathwayService.REASON_NORMAL_PROGRESSION,
+    LearningPathwayService.REASON_ADVANCED_READY,
+    LearningPathwayService.REASON_LOW_COMPLETION
+]
+
+_BASIC, _BALANCED, _ACCELERATION = range(3)
+_INSUFFICIENT, _FOUNDATIONAL, _NORMAL, _ADVANCED, _LOW_COMPLETION = range(5)
+
+
+def classify_arrays(average_scores: np.ndarray, completion_rates: np.ndarray,
+                    total_quizzes: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Classify a cohort from aligned per-student arrays.
+    
+    `average_scores` and `completion_rates` must already be rounded to two
+    decimals, as build_performance does. Returns integer index arrays into
+    PATHWAY_TYPES/REASON_CODES plus a `low_confidence` mask.
+    """
+    average_scores = np.asarray(average_scores, dtype=np.float64)
+    completion_rates = np.asarray(completion_rates, dtype=np.float64)
+    total_quizzes = np.asarray(total_quizzes)
+    
+    # Primary rule: average score classification
+    basic = average_scores < LearningPathwayService.BALANCED_MIN
+    acceleration = average_scores >= LearningPathwayService.ACCELERATION_MIN
+    labels = np.select([basic, acceleration], [_BASIC, _ACCELERATION], _BALANCED).astype(np.int8)
+    reasons = np.select([basic, acceleration], [_FOUNDATIONAL, _ADVANCED], _NORMAL).astype(np.int8)
+    
+    # Secondary rule: task completion adjustment
+    downgrade = (
+        (completion_rates < LearningPathwayService.LOW_COMPLETION_RATE) &
+        (average_scores < LearningPathwayService.LOW_COMPLETION_SCORE_MAX) &
+        (labels != _BASIC)
+    )
+    labels[downgrade] = _BASIC
+    reasons[downgrade] = _LOW_COMPLETION
+    
+    # Edge case: no quiz data
+    no_data = total_quizzes < 1
+    labels[no_data] = _BALANCED
+    reasons[no_data] = _INSUFFICIENT
+    
+    return {'labels': labels, 'reasons': reasons, 'low_confidence': no_data}
+
+
+def performance_arrays(total_quizzes: np.ndarray, score_sums: np.ndarray,
+                       total_tasks: np.ndarray, completed_tasks: np.ndarray) -> Dict[str, np.ndarray]:
+    """Vectorized build_performance: rounded average score and completion rate."""
+    total_quizzes = np.asarray(total_quizzes, dtype=np.float64)
+    total_tasks = np.asarray(total_tasks, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        average_scores = np.where(total_quizzes > 0, np.asarray(score_sums, dtype=np.float64) / total_quizzes, 0.0)
+        completion_rates = np.where(total_tasks > 0, np.asarray(completed_tasks, dtype=np.float64) / total_tasks, 0.0)
+    return {
+        'average_score': np.round(average_scores, 2),
+        'task_completion_rate': np.round(completion_rates, 2)
+    }
+
+
+class CohortPathwayEngine:
+    """Classifies many students at once from grouped aggregates."""
+    
+    def __init__(self):
+        self._db = None
+    
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = get_database()
+        return self._db
+    
+    def load_aggregates(self, student_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Load per-student quiz and task totals into aligned arrays.
+        
+        With no `student_ids`, every student with quiz or task activity is
+        included.
+        """
+        if self.db is None:
+            raise PathwayError('Database unavailable', 503)
+        
+        match = {}
+        if student_ids is not None:
+            match['user_id'] = {'$in': [ObjectId(student_id) for student_id in student_ids]}
+        cutoff_date = datetime.utcnow() - timedelta(days=7)
+        
+        quiz_rows = {str(row['_id']): row for row in self.db.learning_activities.aggregate(
+            pipelines.quiz_stats_pipeline(match, cutoff_date), allowDiskUse=True)}
+        task_rows = {str(row['_id']): row for row in self.db.engagement_logs.aggregate(
+            pipelines.task_stats_pipeline(match), allowDiskUse=True)}
+        
+        ids = list(student_ids) if student_ids is not None else sorted(set(quiz_rows) | set(task_rows))
+        empty = {}
+        return {
+            'student_ids': ids,
+            'total_quizzes': np.array([quiz_rows.get(i, empty).get('total_quizzes', 0) for i in ids], dtype=np.int64),
+            'score_sums': np.array([quiz_rows.get(i, empty).get('score_sum', 0) for i in ids], dtype=np.float64),
+            'total_tasks': np.array([task_rows.get(i, empty).get('total_tasks', 0) for i in ids], dtype=np.int64),
+            'completed_tasks': np.array([task_rows.get(i, empty).get('completed_tasks', 0) for i in ids], dtype=np.int64)
+        }
+    
+    def classify(self, aggregates: Dict[str, Any]) -> Dict[str, Dict]:
+        """Classify loaded aggregates, keyed by student id."""
+        performance = performance_arrays(
+            aggregates['total_quizzes'], aggregates['score_sums'],
+            aggregates['total_tasks'], aggregates['completed_tasks']
+        )
+        result = classify_arrays(performance['average_score'], performance['task_completion_rate'], aggregates['total_quizzes'])
+        
+        return {
+            student_id: {
+                'pathway_type': PATHWAY_TYPES[label],
+                'reason_code': REASON_CODES[reason],
+                'confidence': 'low' if low_confidence else 'high',
+                'average_score': float(average_score),
+                'task_completion_rate': float(completion_rate)
+            }
+            for student_id, label, reason, low_confidence, average_score, completion_rate in zip(
+                aggregates['student_ids'], result['labels'], result['reasons'], result['low_confidence'],
+                performance['average_score'], performance['task_completion_rate']
+            )
+        }
+    
+    def classify_students(self, student_ids: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """Load and classify the given students, or the whole school."""
+        return self.classify(self.load_aggregates(student_ids))
+
+
+# Global engine instance
+cohort_pathway_engine = CohortPathwayEngine()
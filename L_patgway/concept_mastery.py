@@ -5,8 +5,11 @@ Calculates and tracks concept mastery for students based on performance
 across all content types (quizzes, lessons, assignments, structured content).
 """
 
+import base64
+import json
+from collections import Counter
 from datetime import datetime
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Iterable
 from bson import ObjectId
 
 import sys
@@ -14,6 +17,26 @@ from pathlib import Path
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from database import get_database
+from . import config, pipelines
+from .bkt import bkt_engine
+from .mastery_store import concept_mastery_store
+from .metrics import timed, log_error
+from .result_cache import student_result_cache
+from .student_context import StudentContext, resolve_context, LEARNING_ACTIVITY_TYPES, TASK_ACTIVITY_TYPES
+
+
+MASTERY_LEVELS = ('mastered', 'proficient', 'developing', 'beginner', 'needs_improvement')
+
+# Fields of a concept entry selectable with ?fields= (concept_name is always included)
+CONCEPT_FIELDS = (
+    'concept_name', 'mastery_percentage', 'mastery_level', 'total_attempts',
+    'engagement_count', 'last_attempt', 'recent_scores', 'sources'
+)
+
+
+def normalize_concept_key(concept_name: str) -> str:
+    """Case- and whitespace-insensitive lookup key for a concept name."""
+    return ' '.join(concept_name.split()).casefold()
 
 
 class ConceptMasteryError(Exception):
@@ -24,6 +47,27 @@ class ConceptMasteryError(Exception):
         super().__init__(self.message)
 
 
+def _sort_key(entry: Dict) -> tuple:
+    # Highest mastery first; ties broken by name so pages are stable
+    return (-entry['mastery_percentage'], entry['concept_name'])
+
+
+def encode_cursor(entry: Dict) -> str:
+    """Opaque cursor pointing just past `entry` in the concept listing."""
+    raw = json.dumps([entry['mastery_percentage'], entry['concept_name']], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """Sort key encoded by encode_cursor; raises ConceptMasteryError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        mastery_percentage, concept_name = json.loads(raw)
+        return (-float(mastery_percentage), str(concept_name))
+    except Exception:
+        raise ConceptMasteryError('Invalid cursor', 400)
+
+
 class ConceptMasteryService:
     """Main concept mastery service."""
     
@@ -80,7 +124,12 @@ class ConceptMasteryService:
         # Remove duplicates and empty strings
         return list(set([c for c in concepts if c and c.strip()]))
     
-    def calculate_concept_mastery(self, student_id: str) -> List[Dict]:
+    def extract_concept_keys(self, activity: Dict, source_type: str = 'quiz') -> List[str]:
+        """Normalized keys of an activity's concepts (the `concept_keys` activity tag)."""
+        return sorted(set(normalize_concept_key(c) for c in self.extract_concepts(activity, source_type)))
+    
+    @timed('concept_mastery.calculate_concept_mastery')
+    def calculate_concept_mastery(self, student_id: str, context: Optional[StudentContext] = None) -> List[Dict]:
         """
         Calculate concept mastery from ALL content sources.
         
@@ -94,194 +143,245 @@ class ConceptMasteryService:
         if self.db is None:
             return []
         
+        context = resolve_context(student_id, context, self.db)
+        return context.memoize('concept_mastery', lambda: self._calculate_from_context(context))
+    
+    def _calculate_from_context(self, context: StudentContext) -> List[Dict]:
+        """Calculate concept mastery using the configured backend."""
         try:
-            student_oid = ObjectId(student_id)
-            
-            # 1. Fetch all quiz completions with concept data
-            quizzes = list(self.db.learning_activities.find({
-                'user_id': student_oid,
-                'activity_type': 'quiz_complete',
-                'score': {'$exists': True, '$ne': None}
-            }))
-            
-            # 2. Fetch all lesson completions
-            lessons = list(self.db.learning_activities.find({
-                'user_id': student_oid,
-                'activity_type': 'lesson_complete'
-            }))
-            
-            # 3. Fetch all assignment submissions
-            assignments = list(self.db.engagement_logs.find({
-                'user_id': student_oid,
-                'activity_type': {'$in': ['assignment_submit', 'lesson_complete']}
-            }))
-            
-            # 4. Fetch structured content the student has accessed
-            # Get enrollments first
-            enrollments = list(self.db.enrollments.find({'student_id': student_oid}))
-            module_names = [e['module_name'] for e in enrollments]
-            
-            # Get structured content from enrolled modules
-            structured_contents = []
-            if module_names:
-                structured_contents = list(self.db.structured_contents.find({
-                    'module_name': {'$in': module_names},
-                    'approved': True,
-                    'status': {'$in': ['approved', 'published']}
-                }))
-            
-            # Group all activities by concept
-            concept_scores = {}
-            concept_engagement = {}
-            
-            # Process quizzes (with scores)
-            for quiz in quizzes:
-                concepts = self.extract_concepts(quiz, 'quiz')
-                for concept in concepts:
-                    if concept not in concept_scores:
-                        concept_scores[concept] = {
-                            'concept_name': concept,
-                            'scores': [],
-                            'total_attempts': 0,
-                            'last_attempt': None
-                        }
-                    
-                    concept_scores[concept]['scores'].append(quiz['score'])
-                    concept_scores[concept]['total_attempts'] += 1
-                    
-                    quiz_date = quiz.get('created_at', datetime.utcnow())
-                    if not concept_scores[concept]['last_attempt'] or quiz_date > concept_scores[concept]['last_attempt']:
-                        concept_scores[concept]['last_attempt'] = quiz_date
-            
-            # Process lessons (engagement tracking)
-            for lesson in lessons:
-                concepts = self.extract_concepts(lesson, 'lesson')
-                for concept in concepts:
-                    if concept not in concept_engagement:
-                        concept_engagement[concept] = {
-                            'concept_name': concept,
-                            'engagement_count': 0,
-                            'last_engagement': None,
-                            'sources': []
-                        }
-                    
-                    concept_engagement[concept]['engagement_count'] += 1
-                    concept_engagement[concept]['sources'].append('lesson')
-                    
-                    lesson_date = lesson.get('created_at', datetime.utcnow())
-                    if not concept_engagement[concept]['last_engagement'] or lesson_date > concept_engagement[concept]['last_engagement']:
-                        concept_engagement[concept]['last_engagement'] = lesson_date
-            
-            # Process assignments
-            for assignment in assignments:
-                concepts = self.extract_concepts(assignment, 'assignment')
-                for concept in concepts:
-                    if concept not in concept_engagement:
-                        concept_engagement[concept] = {
-                            'concept_name': concept,
-                            'engagement_count': 0,
-                            'last_engagement': None,
-                            'sources': []
-                        }
-                    
-                    concept_engagement[concept]['engagement_count'] += 1
-                    concept_engagement[concept]['sources'].append('assignment')
-                    
-                    assign_date = assignment.get('created_at', datetime.utcnow())
-                    if not concept_engagement[concept]['last_engagement'] or assign_date > concept_engagement[concept]['last_engagement']:
-                        concept_engagement[concept]['last_engagement'] = assign_date
+            if config.MASTERY_BACKEND == 'materialized':
+                # Read the incrementally maintained per-concept state
+                states = context.load('mastery_state', lambda: concept_mastery_store.load_states(context.student_id))
+            elif config.QUERY_MODE == 'aggregation':
+                # Group server-side; only per-concept rows cross the wire
+                states = self._aggregate_states_in_db(context)
+            else:
+                states = self.aggregate_concept_states(
+                    quizzes=context.get_quizzes(),
+                    lessons=context.get_lessons(),
+                    assignments=context.get_tasks(),
+                    structured_contents=context.get_structured_contents()
+                )
             
-            # Process structured content (all topics/units/modules)
-            for content in structured_contents:
-                concepts = []
-                if content.get('topic_name'):
-                    concepts.append(content['topic_name'])
-                if content.get('unit_name'):
-                    concepts.append(content['unit_name'])
-                if content.get('module_name'):
-                    concepts.append(content['module_name'])
-                
-                for concept in concepts:
-                    if concept not in concept_engagement:
-                        concept_engagement[concept] = {
-                            'concept_name': concept,
-                            'engagement_count': 0,
-                            'last_engagement': None,
-                            'sources': []
-                        }
-                    
-                    if 'content' not in concept_engagement[concept]['sources']:
-                        concept_engagement[concept]['sources'].append('content')
+            if config.MASTERY_MODEL == 'bkt' and config.MASTERY_BACKEND != 'materialized':
+                # Replay quiz history; the materialized store keeps p_known up to date itself
+                for concept, p_known in bkt_engine.estimate(context.get_quizzes()).items():
+                    if concept in states:
+                        states[concept]['p_known'] = p_known
             
-            # Merge quiz scores and engagement data
-            all_concepts = set(list(concept_scores.keys()) + list(concept_engagement.keys()))
+            mastery_data = [self.build_concept_entry(state) for state in states.values()]
             
-            # Calculate mastery for each concept
-            mastery_data = []
-            for concept_name in all_concepts:
-                score_data = concept_scores.get(concept_name)
-                engagement_data = concept_engagement.get(concept_name)
-                
-                # Calculate average score from quizzes
-                average_score = None
-                if score_data and score_data['scores']:
-                    average_score = sum(score_data['scores']) / len(score_data['scores'])
-                
-                # If no quiz scores, use engagement as indicator (lower weight)
-                mastery_percentage = 0
-                if average_score is not None:
-                    # Primary: Use quiz scores
-                    mastery_percentage = average_score
-                elif engagement_data and engagement_data['engagement_count'] > 0:
-                    # Secondary: Estimate from engagement (max 50% without quiz)
-                    mastery_percentage = min(50, engagement_data['engagement_count'] * 10)
-                
-                # Determine mastery level
-                if mastery_percentage >= 90:
-                    mastery_level = 'mastered'
-                elif mastery_percentage >= 75:
-                    mastery_level = 'proficient'
-                elif mastery_percentage >= 60:
-                    mastery_level = 'developing'
-                elif mastery_percentage >= 40:
-                    mastery_level = 'beginner'
-                else:
-                    mastery_level = 'needs_improvement'
-                
-                sources = []
-                if score_data:
-                    sources.append('quiz')
-                if engagement_data:
-                    sources.extend(engagement_data['sources'])
-                sources = list(set(sources))  # Remove duplicates
-                
-                mastery_data.append({
-                    'concept_name': concept_name,
-                    'mastery_percentage': round(mastery_percentage, 2),
-                    'mastery_level': mastery_level,
-                    'total_attempts': score_data['total_attempts'] if score_data else 0,
-                    'engagement_count': engagement_data['engagement_count'] if engagement_data else 0,
-                    'last_attempt': (score_data['last_attempt'].isoformat() if score_data and score_data['last_attempt'] else None) or 
-                                   (engagement_data['last_engagement'].isoformat() if engagement_data and engagement_data['last_engagement'] else None),
-                    'recent_scores': score_data['scores'][-5:] if score_data and score_data['scores'] else [],
-                    'sources': sources
-                })
-            
-            # Sort by mastery percentage (descending)
-            mastery_data.sort(key=lambda x: x['mastery_percentage'], reverse=True)
+            # Sort by mastery percentage (descending), then name
+            mastery_data.sort(key=_sort_key)
             
             return mastery_data
             
         except Exception as e:
-            print(f'[ConceptMastery] Error calculating mastery: {e}')
+            log_error('ConceptMastery', f'Error calculating mastery: {e}')
             return []
     
-    def get_concept_mastery(self, student_id: str) -> Dict:
+    def new_concept_state(self, concept_name: str) -> Dict:
+        """Empty running totals for one concept."""
+        return {
+            'concept_name': concept_name,
+            'score_sum': 0,
+            'score_count': 0,
+            'last_attempt': None,
+            'recent_scores': [],
+            'engagement_count': 0,
+            'last_engagement': None,
+            'engagement_sources': [],
+            'has_content': False,
+            'p_known': None
+        }
+    
+    def aggregate_concept_states(self, quizzes: List[Dict], lessons: List[Dict],
+                                 assignments: List[Dict], structured_contents: List[Dict]) -> Dict[str, Dict]:
+        """
+        Group activities by concept into running totals.
+        
+        The totals (score sum/count, last attempt, last few scores, engagement
+        count and sources) are the same fields the materialized mastery store
+        keeps, so both backends produce entries through build_concept_entry.
+        """
+        states = {}
+        
+        def state_for(concept: str) -> Dict:
+            if concept not in states:
+                states[concept] = self.new_concept_state(concept)
+            return states[concept]
+        
+        # Process quizzes (with scores)
+        for quiz in quizzes:
+            for concept in self.extract_concepts(quiz, 'quiz'):
+                self.apply_quiz(state_for(concept), quiz['score'], quiz.get('created_at', datetime.utcnow()))
+        
+        # Process lessons (engagement tracking)
+        for lesson in lessons:
+            for concept in self.extract_concepts(lesson, 'lesson'):
+                self.apply_engagement(state_for(concept), 'lesson', lesson.get('created_at', datetime.utcnow()))
+        
+        # Process assignments
+        for assignment in assignments:
+            for concept in self.extract_concepts(assignment, 'assignment'):
+                self.apply_engagement(state_for(concept), 'assignment', assignment.get('created_at', datetime.utcnow()))
+        
+        # Process structured content (all topics/units/modules)
+        for concept in self.extract_content_concepts(structured_contents):
+            state_for(concept)['has_content'] = True
+        
+        return states
+    
+    def _aggregate_states_in_db(self, context: StudentContext) -> Dict[str, Dict]:
+        """Build the same running totals as aggregate_concept_states with aggregation pipelines."""
+        states = {}
+        
+        def state_for(concept: str) -> Dict:
+            if concept not in states:
+                states[concept] = self.new_concept_state(concept)
+            return states[concept]
+        
+        def add_engagement(state: Dict, source: str, count: int, last_date: datetime) -> None:
+            state['engagement_count'] += count
+            if source not in state['engagement_sources']:
+                state['engagement_sources'].append(source)
+            if not state['last_engagement'] or last_date > state['last_engagement']:
+                state['last_engagement'] = last_date
+        
+        activity_rows = context.aggregate(
+            'concept_activity_rows', 'learning_activities',
+            pipelines.learning_activity_concepts_pipeline(context.student_oid)
+        )
+        for row in activity_rows:
+            state = state_for(row['_id']['concept'])
+            if row['_id']['activity_type'] == 'quiz_complete':
+                state['score_sum'] = row['score_sum']
+                state['score_count'] = row['count']
+                state['recent_scores'] = row['recent_scores']
+                state['last_attempt'] = row['last_date']
+            else:
+                add_engagement(state, 'lesson', row['count'], row['last_date'])
+        
+        engagement_rows = context.aggregate(
+            'concept_engagement_rows', 'engagement_logs',
+            pipelines.engagement_concepts_pipeline(context.student_oid)
+        )
+        for row in engagement_rows:
+            add_engagement(state_for(row['_id']), 'assignment', row['count'], row['last_date'])
+        
+        module_names = [e['module_name'] for e in context.get_enrollments()]
+        if module_names:
+            content_rows = context.aggregate(
+                'concept_content_rows', 'structured_contents',
+                pipelines.content_concepts_pipeline(module_names)
+            )
+            for row in content_rows:
+                state_for(row['_id'])['has_content'] = True
+        
+        return states
+    
+    def extract_content_concepts(self, structured_contents: List[Dict]) -> List[str]:
+        """Topic, unit and module names from structured content."""
+        concepts = []
+        for content in structured_contents:
+            if content.get('topic_name'):
+                concepts.append(content['topic_name'])
+            if content.get('unit_name'):
+                concepts.append(content['unit_name'])
+            if content.get('module_name'):
+                concepts.append(content['module_name'])
+        return concepts
+    
+    def apply_quiz(self, state: Dict, score: float, quiz_date: datetime) -> None:
+        """Add one quiz score to a concept's running totals."""
+        state['score_sum'] += score
+        state['score_count'] += 1
+        state['recent_scores'] = (state['recent_scores'] + [score])[-config.RECENT_SCORES_LIMIT:]
+        if not state['last_attempt'] or quiz_date > state['last_attempt']:
+            state['last_attempt'] = quiz_date
+    
+    def apply_engagement(self, state: Dict, source: str, engagement_date: datetime) -> None:
+        """Add one lesson/assignment engagement to a concept's running totals."""
+        state['engagement_count'] += 1
+        if source not in state['engagement_sources']:
+            state['engagement_sources'].append(source)
+        if not state['last_engagement'] or engagement_date > state['last_engagement']:
+            state['last_engagement'] = engagement_date
+    
+    def get_mastery_level(self, mastery_percentage: float) -> str:
+        """Map a mastery percentage to its level."""
+        if mastery_percentage >= 90:
+            return 'mastered'
+        elif mastery_percentage >= 75:
+            return 'proficient'
+        elif mastery_percentage >= 60:
+            return 'developing'
+        elif mastery_percentage >= 40:
+            return 'beginner'
+        else:
+            return 'needs_improvement'
+    
+    def build_concept_entry(self, state: Dict) -> Dict:
+        """Turn a concept's running totals into a mastery entry."""
+        has_scores = state['score_count'] > 0
+        has_engagement = state['engagement_count'] > 0 or state['has_content']
+        
+        # Calculate average score from quizzes
+        average_score = None
+        if has_scores:
+            average_score = state['score_sum'] / state['score_count']
+        
+        # If no quiz scores, use engagement as indicator (lower weight)
+        mastery_percentage = 0
+        if has_scores and config.MASTERY_MODEL == 'bkt' and state.get('p_known') is not None:
+            # BKT: probability the concept is known
+            mastery_percentage = state['p_known'] * 100
+        elif average_score is not None:
+            # Primary: Use quiz scores
+            mastery_percentage = average_score
+        elif state['engagement_count'] > 0:
+            # Secondary: Estimate from engagement (max 50% without quiz)
+            mastery_percentage = min(50, state['engagement_count'] * 10)
+        
+        sources = []
+        if has_scores:
+            sources.append('quiz')
+        if has_engagement:
+            sources.extend(state['engagement_sources'])
+            if state['has_content']:
+                sources.append('content')
+        sources = list(set(sources))  # Remove duplicates
+        
+        last_attempt = state['last_attempt'] if has_scores else None
+        last_engagement = state['last_engagement'] if has_engagement else None
+        last_activity = last_attempt or last_engagement
+        
+        return {
+            'concept_name': state['concept_name'],
+            'mastery_percentage': round(mastery_percentage, 2),
+            'mastery_level': self.get_mastery_level(mastery_percentage),
+            'total_attempts': state['score_count'],
+            'engagement_count': state['engagement_count'],
+            'last_attempt': last_activity.isoformat() if last_activity else None,
+            'recent_scores': list(state['recent_scores']) if has_scores else [],
+            'sources': sources
+        }
+    
+    @timed('concept_mastery.get_concept_mastery')
+    def get_concept_mastery(self, student_id: str, context: Optional[StudentContext] = None) -> Dict:
         """
         Get concept mastery for a student.
         
-        Returns summary with all concepts and statistics.
+        Returns summary with all concepts and statistics. Calls without a
+        request context are served from the student result cache.
         """
+        if context is None and config.RESULT_CACHE_ENABLED:
+            return student_result_cache.get_or_compute(
+                'concept_mastery', student_id, lambda: self._get_concept_mastery(student_id, None)
+            )
+        return self._get_concept_mastery(student_id, context)
+    
+    def _get_concept_mastery(self, student_id: str, context: Optional[StudentContext]) -> Dict:
         if self.db is None:
             return {
                 'student_id': student_id,
@@ -297,39 +397,181 @@ class ConceptMasteryService:
             }
         
         try:
-            # Calculate current mastery
-            mastery_data = self.calculate_concept_mastery(student_id)
-            
-            mastery_summary = {
-                'student_id': student_id,
-                'concepts': mastery_data,
-                'total_concepts': len(mastery_data),
-                'mastered_count': len([c for c in mastery_data if c['mastery_level'] == 'mastered']),
-                'proficient_count': len([c for c in mastery_data if c['mastery_level'] == 'proficient']),
-                'developing_count': len([c for c in mastery_data if c['mastery_level'] == 'developing']),
-                'beginner_count': len([c for c in mastery_data if c['mastery_level'] == 'beginner']),
-                'needs_improvement_count': len([c for c in mastery_data if c['mastery_level'] == 'needs_improvement']),
-                'average_mastery': round(sum(c['mastery_percentage'] for c in mastery_data) / len(mastery_data), 2) if mastery_data else 0,
-                'last_updated': datetime.utcnow().isoformat()
-            }
-            
-            return mastery_summary
-            
+            context = resolve_context(student_id, context, self.db)
+            return context.memoize('concept_mastery_summary', lambda: self._summarize(student_id, context))
         except Exception as e:
-            print(f'[ConceptMastery] Error getting mastery: {e}')
+            log_error('ConceptMastery', f'Error getting mastery: {e}')
             raise ConceptMasteryError(f'Failed to get concept mastery: {str(e)}', 500)
     
-    def get_concept_mastery_by_name(self, student_id: str, concept_name: str) -> Optional[Dict]:
-        """Get mastery for a specific concept."""
-        try:
-            mastery_data = self.get_concept_mastery(student_id)
-            for concept in mastery_data['concepts']:
-                if concept['concept_name'].lower() == concept_name.lower():
-                    return concept
+    def _summarize(self, student_id: str, context: StudentContext) -> Dict:
+        """Build the mastery summary for a student."""
+        # Calculate current mastery
+        mastery_data = self.calculate_concept_mastery(student_id, context)
+        
+        # Level counts and mastery total in one pass
+        level_counts = Counter()
+        mastery_total = 0
+        for concept in mastery_data:
+            level_counts[concept['mastery_level']] += 1
+            mastery_total += concept['mastery_percentage']
+        
+        summary = {
+            'student_id': student_id,
+            'concepts': mastery_data,
+            'total_concepts': len(mastery_data)
+        }
+        for level in MASTERY_LEVELS:
+            summary[f'{level}_count'] = level_counts[level]
+        summary['average_mastery'] = round(mastery_total / len(mastery_data), 2) if mastery_data else 0
+        summary['last_updated'] = datetime.utcnow().isoformat()
+        return summary
+    
+    def get_concept_mastery_page(self, student_id: str, limit: Optional[int] = None,
+                                 cursor: Optional[str] = None, fields: Optional[Iterable[str]] = None,
+                                 level: Optional[str] = None) -> Dict:
+        """
+        Get concept mastery with the concept list filtered, paged and trimmed.
+        
+        Summary counts always cover every concept. `level` keeps one mastery
+        level, `limit`/`cursor` page through the (mastery desc, name) order
+        with keyset cursors, and `fields` selects the entry fields returned.
+        Without any of them the response equals get_concept_mastery().
+        """
+        if level is not None and level not in MASTERY_LEVELS:
+            raise ConceptMasteryError(f"level must be one of: {', '.join(MASTERY_LEVELS)}", 400)
+        if limit is not None and not 1 <= limit <= config.CONCEPT_PAGE_MAX_LIMIT:
+            raise ConceptMasteryError(f'limit must be between 1 and {config.CONCEPT_PAGE_MAX_LIMIT}', 400)
+        selected = self.select_fields(fields)
+        after = decode_cursor(cursor) if cursor else None
+        
+        summary = self.get_concept_mastery(student_id)
+        if level is None and limit is None and after is None and selected is None:
+            return summary
+        
+        concepts = summary['concepts']
+        if level is not None:
+            concepts = [c for c in concepts if c['mastery_level'] == level]
+        matched = len(concepts)
+        if after is not None:
+            concepts = [c for c in concepts if _sort_key(c) > after]
+        
+        next_cursor = None
+        if limit is not None and len(concepts) > limit:
+            concepts = concepts[:limit]
+            next_cursor = encode_cursor(concepts[-1])
+        if selected is not None:
+            concepts = [{field: c[field] for field in selected} for c in concepts]
+        
+        # The summary may be shared with the result cache, so build a new dict
+        page = dict(summary, concepts=concepts)
+        page['matched_concepts'] = matched
+        page['next_cursor'] = next_cursor
+        return page
+    
+    def select_fields(self, fields: Optional[Iterable[str]]) -> Optional[List[str]]:
+        """Validate a ?fields= selection; concept_name is always kept."""
+        if fields is None:
             return None
+        fields = [field.strip() for field in fields if field.strip()]
+        unknown = [field for field in fields if field not in CONCEPT_FIELDS]
+        if unknown:
+            raise ConceptMasteryError(f"Unknown fields: {', '.join(unknown)}", 400)
+        return [field for field in CONCEPT_FIELDS if field == 'concept_name' or field in fields]
+    
+    @timed('concept_mastery.get_concept_mastery_by_name')
+    def get_concept_mastery_by_name(self, student_id: str, concept_name: str,
+                                    context: Optional[StudentContext] = None) -> Optional[Dict]:
+        """
+        Get mastery for a specific concept.
+        
+        Only the requested concept is computed. Names are matched on
+        normalize_concept_key, so lookups ignore case and extra whitespace.
+        """
+        try:
+            concept_key = normalize_concept_key(concept_name)
+            if not concept_key or self.db is None:
+                return None
+            
+            context = resolve_context(student_id, context, self.db)
+            if config.MASTERY_BACKEND == 'materialized':
+                states = concept_mastery_store.load_concept_states(student_id, concept_key)
+            else:
+                states = self._concept_states_for_key(context, concept_key)
+            
+            entries = [self.build_concept_entry(state) for state in states.values()]
+            if not entries:
+                return None
+            # Several spellings can share a key; prefer the best mastered, as the full listing would
+            return max(entries, key=lambda x: x['mastery_percentage'])
         except Exception as e:
-            print(f'[ConceptMastery] Error getting concept mastery: {e}')
+            log_error('ConceptMastery', f'Error getting concept mastery: {e}')
             return None
+    
+    def _concept_states_for_key(self, context: StudentContext, concept_key: str) -> Dict[str, Dict]:
+        """
+        Running totals for the concepts matching `concept_key`.
+        
+        With ILPG_CONCEPT_KEYS_TAGGED, only activities whose `concept_keys`
+        tag contains the key are read, plus any written since the backfill
+        without a tag, which are matched on their extracted keys; otherwise
+        the student's activities are read once and filtered before grouping.
+        """
+        if config.CONCEPT_KEYS_TAGGED:
+            learning_activities = context.load(f'concept_key:{concept_key}:learning_activities', lambda: list(
+                self.db.learning_activities.find(self._concept_key_query(
+                    context, concept_key, LEARNING_ACTIVITY_TYPES
+                ))
+            ))
+            quizzes = [
+                a for a in learning_activities
+                if a.get('activity_type') == 'quiz_complete' and a.get('score') is not None
+                and self._has_concept_key(a, concept_key, 'quiz')
+            ]
+            lessons = [
+                a for a in learning_activities
+                if a.get('activity_type') == 'lesson_complete' and self._has_concept_key(a, concept_key, 'lesson')
+            ]
+            assignments = [
+                a for a in context.load(f'concept_key:{concept_key}:engagement_logs', lambda: list(
+                    self.db.engagement_logs.find(self._concept_key_query(context, concept_key, TASK_ACTIVITY_TYPES))
+                ))
+                if self._has_concept_key(a, concept_key, 'assignment')
+            ]
+        else:
+            quizzes = [q for q in context.get_quizzes() if concept_key in self.extract_concept_keys(q, 'quiz')]
+            lessons = [l for l in context.get_lessons() if concept_key in self.extract_concept_keys(l, 'lesson')]
+            assignments = [
+                a for a in context.get_tasks() if concept_key in self.extract_concept_keys(a, 'assignment')
+            ]
+        
+        states = self.aggregate_concept_states(
+            quizzes=quizzes,
+            lessons=lessons,
+            assignments=assignments,
+            structured_contents=context.get_structured_contents()
+        )
+        states = {name: state for name, state in states.items() if normalize_concept_key(name) == concept_key}
+        
+        if config.MASTERY_MODEL == 'bkt':
+            for concept, p_known in bkt_engine.estimate(quizzes).items():
+                if concept in states:
+                    states[concept]['p_known'] = p_known
+        
+        return states
+    
+    def _concept_key_query(self, context: StudentContext, concept_key: str, activity_types: List[str]) -> Dict:
+        """Activities tagged with `concept_key`, or not tagged at all."""
+        return {
+            'user_id': context.student_oid,
+            '$or': [{'concept_keys': concept_key}, {'concept_keys': {'$exists': False}}],
+            'activity_type': {'$in': activity_types}
+        }
+    
+    def _has_concept_key(self, activity: Dict, concept_key: str, source_type: str) -> bool:
+        """Whether an activity read by _concept_key_query is about `concept_key`."""
+        if 'concept_keys' in activity:
+            return True
+        return concept_key in self.extract_concept_keys(activity, source_type)
 
 
 # Global service instance
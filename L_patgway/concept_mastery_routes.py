@@ -9,8 +9,18 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from accounts import account_service, AccountError
 from .concept_mastery import concept_mastery_service, ConceptMasteryError
+from .class_mastery import class_mastery_service
+from .serialization import json_response, compress_response
+from .etag import conditional_student_response, current_student, path_student
+from .metrics import add_server_timing
+from .indexes import ensure_indexes_on_startup
+from .result_cache import start_watcher_on_startup
 
 concept_mastery_bp = Blueprint('concept_mastery', __name__, url_prefix='/api/concept-mastery')
+concept_mastery_bp.record_once(ensure_indexes_on_startup)
+concept_mastery_bp.record_once(start_watcher_on_startup)
+concept_mastery_bp.after_request(add_server_timing)
+concept_mastery_bp.after_request(compress_response)
 
 def token_required(f):
     @wraps(f)
@@ -27,16 +37,37 @@ def token_required(f):
         return f(*args, **kwargs)
     return decorated
 
+def int_arg(name):
+    """An integer query parameter (None when absent); anything else is a 400."""
+    value = request.args.get(name)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ConceptMasteryError(f'{name} must be an integer', 400)
+
+def page_args():
+    """Paging/filter query parameters (?limit=&cursor=&fields=&level=)."""
+    fields = request.args.get('fields')
+    return {
+        'limit': int_arg('limit'),
+        'cursor': request.args.get('cursor') or None,
+        'fields': fields.split(',') if fields is not None else None,
+        'level': request.args.get('level') or None
+    }
+
 @concept_mastery_bp.route('/me', methods=['GET'])
 @token_required
+@conditional_student_response(current_student)
 def get_my_mastery():
-    """Get concept mastery for current user."""
+    """Get concept mastery for current user (?limit=&cursor=&fields=&level=)."""
     try:
-        result = concept_mastery_service.get_concept_mastery(g.user_id)
-        return jsonify({
+        result = concept_mastery_service.get_concept_mastery_page(g.user_id, **page_args())
+        return json_response({
             'success': True,
             'data': result
-        }), 200
+        })
     except ConceptMasteryError as e:
         return jsonify({'error': e.message}), e.status_code
     except Exception as e:
@@ -44,6 +75,7 @@ def get_my_mastery():
 
 @concept_mastery_bp.route('/student/<student_id>', methods=['GET'])
 @token_required
+@conditional_student_response(path_student)
 def get_student_mastery(student_id):
     """Get concept mastery for a specific student (teacher/admin only)."""
     try:
@@ -51,27 +83,50 @@ def get_student_mastery(student_id):
         if g.user_role not in ['teacher', 'admin']:
             return jsonify({'error': 'Access denied'}), 403
         
-        result = concept_mastery_service.get_concept_mastery(student_id)
-        return jsonify({
+        result = concept_mastery_service.get_concept_mastery_page(student_id, **page_args())
+        return json_response({
             'success': True,
             'data': result
-        }), 200
+        })
     except ConceptMasteryError as e:
         return jsonify({'error': e.message}), e.status_code
     except Exception as e:
         return jsonify({'error': 'Failed to get concept mastery'}), 500
 
+@concept_mastery_bp.route('/class/<module_name>', methods=['GET'])
+@token_required
+def get_class_mastery(module_name):
+    """Students x concepts mastery matrix for a module's class (teacher/admin only)."""
+    try:
+        # Check if user is teacher or admin
+        if g.user_role not in ['teacher', 'admin']:
+            return jsonify({'error': 'Access denied'}), 403
+        
+        result = class_mastery_service.get_class_mastery(module_name)
+        return json_response({
+            'success': True,
+            'data': result
+        })
+    except ConceptMasteryError as e:
+        return jsonify({'error': e.message}), e.status_code
+    except Exception as e:
+        return jsonify({'error': 'Failed to get class mastery'}), 500
+
 @concept_mastery_bp.route('/concept/<concept_name>', methods=['GET'])
 @token_required
+@conditional_student_response(current_student)
 def get_concept_mastery(concept_name):
-    """Get mastery for a specific concept for current user."""
+    """Get mastery for a specific concept for current user (?fields=)."""
     try:
+        selected = concept_mastery_service.select_fields(page_args()['fields'])
         result = concept_mastery_service.get_concept_mastery_by_name(g.user_id, concept_name)
         if result:
-            return jsonify({
+            if selected is not None:
+                result = {field: result[field] for field in selected}
+            return json_response({
                 'success': True,
                 'data': result
-            }), 200
+            })
         else:
             return jsonify({
                 'error': 'Concept mastery not found',
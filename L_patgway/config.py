@@ -0,0 +1,169 @@
+"""
+ILPG Configuration.
+
+Runtime settings for the Python ILPG services, read from environment
+variables so they can be set in the backend `.env` file.
+"""
+
+import os
+
+
+def _get_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+# Concept mastery backend:
+# - 'recompute': rebuild mastery from the full activity history on every request
+# - 'materialized': read the incrementally maintained concept_mastery_state collection
+MASTERY_BACKEND = os.getenv('ILPG_MASTERY_BACKEND', 'recompute')
+
+# How recompute-mode reads are executed:
+# - 'python': fetch activity documents and group them in Python
+# - 'aggregation': group and count server-side with aggregation pipelines
+QUERY_MODE = os.getenv('ILPG_QUERY_MODE', 'python')
+
+# Collection holding the materialized per-student/per-concept mastery state
+MASTERY_STATE_COLLECTION = os.getenv('ILPG_MASTERY_STATE_COLLECTION', 'concept_mastery_state')
+
+# Pathway performance backend:
+# - 'recompute': derive performance from the student's quiz and task documents
+# - 'rollup': sum the per-student daily buckets maintained on ingest
+PERFORMANCE_BACKEND = os.getenv('ILPG_PERFORMANCE_BACKEND', 'recompute')
+PERFORMANCE_ROLLUP_COLLECTION = os.getenv('ILPG_PERFORMANCE_ROLLUP_COLLECTION', 'performance_daily_rollups')
+
+# Number of recent quiz scores kept per concept
+RECENT_SCORES_LIMIT = 5
+
+# Quiz scores are percentages (0 to QUIZ_SCORE_MAX) everywhere: stored
+# activities, concept mastery and the pathway average_score. Bulk ingestion
+# rejects scores outside this range.
+QUIZ_SCORE_MAX = 100
+
+# Concurrent AI generation for roadmap recommendations. Calls that outlive
+# AI_CALL_TIMEOUT keep their worker until the AI client returns; when all
+# workers are held that way, roadmaps use template text without waiting.
+AI_MAX_WORKERS = int(os.getenv('ILPG_AI_MAX_WORKERS', '8'))
+# Seconds to wait for AI calls before using template text
+AI_CALL_TIMEOUT = float(os.getenv('ILPG_AI_CALL_TIMEOUT', '15'))
+
+# Cache for AI-generated recommendation text
+AI_CACHE_ENABLED = _get_bool('ILPG_AI_CACHE_ENABLED', True)
+# 'memory' (per process) or 'mongo' (shared and persistent)
+AI_CACHE_BACKEND = os.getenv('ILPG_AI_CACHE_BACKEND', 'mongo')
+AI_CACHE_COLLECTION = os.getenv('ILPG_AI_CACHE_COLLECTION', 'ai_response_cache')
+AI_CACHE_TTL = int(os.getenv('ILPG_AI_CACHE_TTL', str(7 * 24 * 3600)))
+AI_CACHE_MAX_ENTRIES = int(os.getenv('ILPG_AI_CACHE_MAX_ENTRIES', '2048'))
+# Round percentages in AI prompts to this step (0 disables) to raise hit rates
+AI_PROMPT_BUCKET = float(os.getenv('ILPG_AI_PROMPT_BUCKET', '0'))
+
+# Roadmap AI generation mode:
+# - 'per_section': one model call per recommendation (run concurrently)
+# - 'batched': one structured call for all recommendations, parsed from JSON
+ROADMAP_AI_MODE = os.getenv('ILPG_ROADMAP_AI_MODE', 'per_section')
+AI_BATCH_MAX_TOKENS = int(os.getenv('ILPG_AI_BATCH_MAX_TOKENS', '1200'))
+# Regenerate only the roadmap recommendations whose inputs changed since the
+# previous snapshot; percentages in those inputs are compared in
+# ROADMAP_SECTION_BUCKET-point steps (0 compares exact values)
+ROADMAP_INCREMENTAL = _get_bool('ILPG_ROADMAP_INCREMENTAL', True)
+ROADMAP_SECTION_BUCKET = float(os.getenv('ILPG_ROADMAP_SECTION_BUCKET', '5'))
+
+# Serve roadmaps from versioned per-student snapshots (stale-while-revalidate).
+# A snapshot is regenerated in the background once it is older than
+# ROADMAP_SNAPSHOT_MAX_AGE seconds, or when a check (at most every
+# ROADMAP_SNAPSHOT_CHECK_INTERVAL seconds per student) finds a concept whose
+# mastery moved by ROADMAP_REFRESH_THRESHOLD percentage points or more.
+ROADMAP_SNAPSHOTS = _get_bool('ILPG_ROADMAP_SNAPSHOTS', False)
+ROADMAP_SNAPSHOT_COLLECTION = os.getenv('ILPG_ROADMAP_SNAPSHOT_COLLECTION', 'roadmap_snapshots')
+ROADMAP_SNAPSHOT_MAX_AGE = int(os.getenv('ILPG_ROADMAP_SNAPSHOT_MAX_AGE', str(7 * 24 * 3600)))
+ROADMAP_SNAPSHOT_CHECK_INTERVAL = int(os.getenv('ILPG_ROADMAP_SNAPSHOT_CHECK_INTERVAL', '300'))
+ROADMAP_REFRESH_THRESHOLD = float(os.getenv('ILPG_ROADMAP_REFRESH_THRESHOLD', '10'))
+# Snapshot versions kept per student
+ROADMAP_SNAPSHOT_KEEP = int(os.getenv('ILPG_ROADMAP_SNAPSHOT_KEEP', '5'))
+ROADMAP_REFRESH_WORKERS = int(os.getenv('ILPG_ROADMAP_REFRESH_WORKERS', '2'))
+
+# Maximum students per POST /api/pathway/batch request
+PATHWAY_BATCH_MAX_STUDENTS = int(os.getenv('ILPG_PATHWAY_BATCH_MAX_STUDENTS', '200'))
+
+# Concept mastery model:
+# - 'average': mastery is the mean quiz score
+# - 'bkt': mastery is the Bayesian Knowledge Tracing estimate p(L) after each quiz
+# Rebuild the materialized store after switching (python -m L_patgway.mastery_store rebuild)
+MASTERY_MODEL = os.getenv('ILPG_MASTERY_MODEL', 'average')
+
+# Default BKT parameters; per-concept overrides live in BKT_PARAMS_COLLECTION
+BKT_P_INIT = float(os.getenv('ILPG_BKT_P_INIT', '0.2'))
+BKT_P_TRANSIT = float(os.getenv('ILPG_BKT_P_TRANSIT', '0.15'))
+BKT_P_GUESS = float(os.getenv('ILPG_BKT_P_GUESS', '0.2'))
+BKT_P_SLIP = float(os.getenv('ILPG_BKT_P_SLIP', '0.1'))
+# Quiz scores at or above this fraction of QUIZ_SCORE_MAX count as a correct observation
+BKT_CORRECT_THRESHOLD = float(os.getenv('ILPG_BKT_CORRECT_THRESHOLD', '0.6'))
+BKT_PARAMS_COLLECTION = os.getenv('ILPG_BKT_PARAMS_COLLECTION', 'bkt_params')
+# Seconds the per-concept parameters are cached in process
+BKT_PARAMS_TTL = int(os.getenv('ILPG_BKT_PARAMS_TTL', '300'))
+
+# Set once learning_activities/engagement_logs carry a `concept_keys` tag
+# (backfill with: python -m L_patgway.mastery_store tag-concepts) so
+# single-concept lookups read only the activities tagged with that concept
+# (untagged activities written since the backfill are still read and matched)
+CONCEPT_KEYS_TAGGED = _get_bool('ILPG_CONCEPT_KEYS_TAGGED', False)
+
+# Create missing ILPG indexes in a background thread when the blueprints are
+# registered. Off by default: index builds on large collections belong in the
+# deploy step (python -m L_patgway.indexes ensure), not in every worker's boot.
+ENSURE_INDEXES_ON_STARTUP = _get_bool('ILPG_ENSURE_INDEXES_ON_STARTUP', False)
+
+# Follow a MongoDB change stream (replica set required) to invalidate on writes from
+# other services; it also keeps the materialized mastery store and rollups current
+RESULT_CACHE_WATCH = _get_bool('ILPG_RESULT_CACHE_WATCH', False)
+# Read-through cache for per-student mastery, pathway and roadmap results. Only
+# IngestionService invalidates on its own, so without the watcher a write made by
+# another service would be served stale; the cache defaults to on only with it.
+RESULT_CACHE_ENABLED = _get_bool('ILPG_RESULT_CACHE_ENABLED', RESULT_CACHE_WATCH)
+RESULT_CACHE_TTL = int(os.getenv('ILPG_RESULT_CACHE_TTL', '60'))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv('ILPG_RESULT_CACHE_MAX_ENTRIES', '5000'))
+RESULT_CACHE_MAX_BYTES = int(os.getenv('ILPG_RESULT_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+# Every worker process runs a watcher; each change is folded into the stores by
+# the one worker that claims it here. Also holds the last resume token.
+WATCHER_STATE_COLLECTION = os.getenv('ILPG_WATCHER_STATE_COLLECTION', 'ilpg_change_watcher')
+# Seconds a claimed change is remembered (replays older than this are applied again)
+WATCHER_CLAIM_TTL = int(os.getenv('ILPG_WATCHER_CLAIM_TTL', str(7 * 24 * 3600)))
+
+# Strong ETags and 304 responses on the per-student GET endpoints
+ETAG_ENABLED = _get_bool('ILPG_ETAG_ENABLED', True)
+
+# Largest page /api/roadmap/weak-areas serves
+WEAK_AREAS_MAX_LIMIT = int(os.getenv('ILPG_WEAK_AREAS_MAX_LIMIT', '100'))
+
+# Page size cap for ?limit= on the concept mastery endpoints
+CONCEPT_PAGE_MAX_LIMIT = int(os.getenv('ILPG_CONCEPT_PAGE_MAX_LIMIT', '200'))
+
+# Encode ILPG responses with orjson (if installed) instead of the json module
+FAST_JSON = _get_bool('ILPG_FAST_JSON', False)
+# gzip/brotli-encode JSON responses of at least COMPRESS_MIN_BYTES
+COMPRESS_RESPONSES = _get_bool('ILPG_COMPRESS_RESPONSES', True)
+COMPRESS_MIN_BYTES = int(os.getenv('ILPG_COMPRESS_MIN_BYTES', '1024'))
+COMPRESS_LEVEL = int(os.getenv('ILPG_COMPRESS_LEVEL', '5'))
+
+# Largest class returned by GET /api/concept-mastery/class/<module_name>
+CLASS_MATRIX_MAX_STUDENTS = int(os.getenv('ILPG_CLASS_MATRIX_MAX_STUDENTS', '2000'))
+
+# Offline recompute job (python -m L_patgway.recompute_job run): results per
+# student, run checkpoints, worker processes and students per worker task
+RECOMPUTE_RESULTS_COLLECTION = os.getenv('ILPG_RECOMPUTE_RESULTS_COLLECTION', 'student_recompute_results')
+RECOMPUTE_RUNS_COLLECTION = os.getenv('ILPG_RECOMPUTE_RUNS_COLLECTION', 'recompute_job_runs')
+RECOMPUTE_WORKERS = int(os.getenv('ILPG_RECOMPUTE_WORKERS', str(os.cpu_count() or 2)))
+RECOMPUTE_BATCH_SIZE = int(os.getenv('ILPG_RECOMPUTE_BATCH_SIZE', '200'))
+
+# Largest batch accepted by POST /api/ilpg/events/bulk
+INGEST_MAX_EVENTS = int(os.getenv('ILPG_INGEST_MAX_EVENTS', '1000'))
+
+# In-process timings and counters, served in Prometheus text format at /api/ilpg/metrics
+METRICS_ENABLED = _get_bool('ILPG_METRICS_ENABLED', True)
+# Token for scrapers ('Authorization: Bearer <token>'); /api/ilpg/metrics
+# otherwise only accepts teacher and admin account tokens
+METRICS_TOKEN = os.getenv('ILPG_METRICS_TOKEN', '')
+# Add per-request Server-Timing headers to ILPG responses
+SERVER_TIMING = _get_bool('ILPG_SERVER_TIMING', False)
@@ -0,0 +1,140 @@
+"""
+ETag Module.
+
+Conditional GET support for the ILPG blueprints. A student's ETag is a
+hash of their activity watermark (the latest _id in learning_activities,
+engagement_logs, enrollments and structured_contents, each read with an
+indexed find_one), the UTC date (recency windows move daily), the
+request path and the settings that change results. Roadmap views served
+from snapshots (ILPG_ROADMAP_SNAPSHOTS) also include the latest snapshot
+version, which background refreshes change without new activity. A poll whose
+If-None-Match still matches is answered with 304 before any mastery,
+pathway or roadmap computation runs.
+
+Compressed responses carry the weak form of the ETag (see serialization),
+so If-None-Match uses weak comparison.
+
+The watermark tracks inserts; documents edited in place by other services
+are picked up by the next insert or the next day. Forced refreshes
+(?refresh=true) are never answered with 304.
+"""
+
+import hashlib
+from datetime import datetime
+from functools import wraps
+from typing import Optional, Callable
+
+from bson import ObjectId
+from flask import request, g, make_response
+
+import sys
+from pathlib import Path
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from database import get_database
+from . import config
+from .cache import LRUTTLCache
+from .metrics import log_error
+from .result_cache import student_result_cache
+
+
+# Last watermark seen per student; a change also invalidates cached results
+_last_watermarks = LRUTTLCache(max_entries=config.RESULT_CACHE_MAX_ENTRIES)
+
+# Source collection -> field holding the student id (None: shared by all students)
+WATERMARK_SOURCES = {
+    'learning_activities': 'user_id',
+    'engagement_logs': 'user_id',
+    'enrollments': 'student_id',
+    'structured_contents': None
+}
+
+
+def student_watermark(student_id: str, db=None) -> str:
+    """Latest source document ids for a student (one (student, _id) index key per collection)."""
+    db = db if db is not None else get_database()
+    student_oid = ObjectId(student_id)
+    parts = []
+    for collection, field in WATERMARK_SOURCES.items():
+        latest = db[collection].find_one(
+            {field: student_oid} if field else {},
+            projection={'_id': 1},
+            sort=[('_id', -1)]
+        )
+        if latest is not None:
+            parts.append(f"{collection}:{latest['_id']}")
+    watermark = '|'.join(parts)
+    
+    previous = _last_watermarks.get(student_id)
+    if previous is not None and previous != watermark:
+        # Written by a component that did not go through the ILPG ingestion hooks
+        student_result_cache.invalidate_student(student_id)
+    _last_watermarks.set(student_id, watermark)
+    return watermark
+
+
+def student_etag(student_id: str, db=None, roadmap_snapshot: bool = False) -> str:
+    """Strong ETag for the current request's view of a student."""
+    parts = [
+        student_watermark(student_id, db),
+        datetime.utcnow().date().isoformat(),
+        request.full_path,
+        config.MASTERY_BACKEND,
+        config.MASTERY_MODEL,
+        config.PERFORMANCE_BACKEND,
+        config.QUERY_MODE,
+        config.ROADMAP_AI_MODE,
+        str(config.ROADMAP_SNAPSHOTS)
+    ]
+    if roadmap_snapshot and config.ROADMAP_SNAPSHOTS:
+        from .roadmap_snapshots import roadmap_snapshot_store
+        parts.append(f'snapshot:{roadmap_snapshot_store.current_version(student_id)}')
+    return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+def conditional_student_response(get_student_id: Callable[..., Optional[str]], roadmap_snapshot: bool = False):
+    """
+    Route decorator (applied after token_required) adding ETag/304 handling.
+    
+    `get_student_id` receives the view's keyword arguments and returns the
+    student whose data the response shows. Set `roadmap_snapshot` on views
+    that serve RoadmapService.get_roadmap().
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if not config.ETAG_ENABLED or request.args.get('refresh', '').lower() in ('1', 'true', 'yes'):
+                return f(*args, **kwargs)
+            
+            student_id = get_student_id(**kwargs)
+            if student_id != g.user_id and g.user_role not in ['teacher', 'admin']:
+                # Let the view deny access; never confirm ETags for other students
+                return f(*args, **kwargs)
+            
+            try:
+                etag = student_etag(student_id, roadmap_snapshot=roadmap_snapshot)
+            except Exception as e:
+                log_error('ETag', f'Error computing ETag: {e}')
+                return f(*args, **kwargs)
+            
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return decorated
+    return decorator
+
+
+def current_student(**kwargs) -> str:
+    """The signed-in user (for /me-style routes)."""
+    return g.user_id
+
+
+def path_student(student_id: str = None, **kwargs) -> str:
+    """The <student_id> URL parameter (for teacher views)."""
+    return student_id
@@ -0,0 +1,301 @@
+"""
+Index Management Module.
+
+Declares the MongoDB indexes the ILPG services rely on and checks that
+their queries actually use them. Create the indexes as a deploy step,
+before the new code serves traffic:
+    python -m L_patgway.indexes ensure
+    python -m L_patgway.indexes verify --student <id>
+
+`verify` runs the pathway, concept mastery and roadmap services for a
+student in every query mode while recording the queries they issue, then
+explains each one and fails if any winning plan is a COLLSCAN.
+
+With ILPG_ENSURE_INDEXES_ON_STARTUP, each worker also runs ensure_indexes()
+in a background thread when the blueprints are registered, so a long index
+build never blocks boot (existing indexes make it a no-op).
+"""
+
+import argparse
+import threading
+from typing import Optional, Dict, Any, List, Tuple
+from pymongo import IndexModel, ASCENDING, DESCENDING
+
+import sys
+from pathlib import Path
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from database import get_database
+from . import config
+
+
+def _index(keys: List[Tuple[str, int]], **options) -> IndexModel:
+    name = 'ilpg_' + '_'.join(field.replace('.', '_').strip('_') for field, _ in keys)
+    return IndexModel(keys, name=name, **options)
+
+
+def index_specs() -> Dict[str, List[IndexModel]]:
+    """Indexes per collection, keyed by collection name."""
+    return {
+        'learning_activities': [
+            # Per-student quiz/lesson reads and per-student quiz stats
+            _index([('user_id', ASCENDING), ('activity_type', ASCENDING), ('score', ASCENDING)]),
+            # Single-concept lookups on tagged activities
+            _index([('user_id', ASCENDING), ('concept_keys', ASCENDING)]),
+            # Cohort BKT replay: all quizzes in (student, date) order
+            _index([('activity_type', ASCENDING), ('user_id', ASCENDING), ('created_at', ASCENDING)]),
+            # ETag watermark: a student's latest activity
+            _index([('user_id', ASCENDING), ('_id', DESCENDING)])
+        ],
+        'engagement_logs': [
+            _index([('user_id', ASCENDING), ('activity_type', ASCENDING)]),
+            _index([('user_id', ASCENDING), ('concept_keys', ASCENDING)]),
+            _index([('user_id', ASCENDING), ('_id', DESCENDING)])
+        ],
+        'enrollments': [
+            # Also serves the ETag watermark (latest enrollment)
+            _index([('student_id', ASCENDING), ('_id', DESCENDING)])
+        ],
+        'structured_contents': [
+            _index([('module_name', ASCENDING), ('approved', ASCENDING), ('status', ASCENDING)])
+        ],
+        config.MASTERY_STATE_COLLECTION: [
+            _index([('student_id', ASCENDING), ('concept_name', ASCENDING)], unique=True),
+            _index([('student_id', ASCENDING), ('concept_key', ASCENDING)])
+        ],
+        config.PERFORMANCE_ROLLUP_COLLECTION: [
+            _index([('student_id', ASCENDING), ('day', ASCENDING)], unique=True)
+        ],
+        config.RECOMPUTE_RESULTS_COLLECTION: [
+            _index([('student_id', ASCENDING)], unique=True)
+        ],
+        config.ROADMAP_SNAPSHOT_COLLECTION: [
+            # Latest snapshot per student; also rejects two writers storing the same version
+            _index([('student_id', ASCENDING), ('version', DESCENDING)], unique=True)
+        ],
+        config.BKT_PARAMS_COLLECTION: [
+            _index([('concept_name', ASCENDING)], unique=True)
+        ],
+        config.AI_CACHE_COLLECTION: [
+            # Mongo removes entries once expires_at has passed
+            _index([('expires_at', ASCENDING)], expireAfterSeconds=0)
+        ],
+        config.WATCHER_STATE_COLLECTION: [
+            # Claimed changes expire; the resume token document has no expires_at
+            _index([('expires_at', ASCENDING)], expireAfterSeconds=0)
+        ]
+    }
+
+
+def ensure_indexes(db=None) -> Dict[str, List[str]]:
+    """Create any missing indexes. Returns the index names per collection."""
+    db = db if db is not None else get_database()
+    if db is None:
+        return {}
+    
+    created = {}
+    for collection_name, indexes in index_specs().items():
+        try:
+            created[collection_name] = db[collection_name].create_indexes(indexes)
+        except Exception as e:
+            print(f'[Indexes] Error creating indexes on {collection_name}: {e}')
+    return created
+
+
+_startup_lock = threading.Lock()
+_startup_done = False
+
+
+def ensure_indexes_on_startup(state=None) -> Optional[threading.Thread]:
+    """Blueprint record_once hook: create indexes once per process, in the background."""
+    global _startup_done
+    if not config.ENSURE_INDEXES_ON_STARTUP:
+        return None
+    with _startup_lock:
+        if _startup_done:
+            return None
+        _startup_done = True
+    thread = threading.Thread(target=ensure_indexes, name='ilpg-ensure-indexes', daemon=True)
+    thread.start()
+    return thread
+
+
+class _RecordingCollection:
+    """Collection proxy that records the reads issued through it."""
+    
+    def __init__(self, collection, queries: List[Dict]):
+        self._collection = collection
+        self._queries = queries
+    
+    def find(self, filter=None, *args, **kwargs):
+        self._queries.append({'collection': self._collection.name, 'find': filter or {}})
+        return self._collection.find(filter, *args, **kwargs)
+    
+    def find_one(self, filter=None, *args, **kwargs):
+        self._queries.append({'collection': self._collection.name, 'find': filter or {}})
+        return self._collection.find_one(filter, *args, **kwargs)
+    
+    def aggregate(self, pipeline, *args, **kwargs):
+        self._queries.append({'collection': self._collection.name, 'aggregate': pipeline})
+        return self._collection.aggregate(pipeline, *args, **kwargs)
+    
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+
+class _RecordingDatabase:
+    """Database proxy handing out recording collections."""
+    
+    def __init__(self, db):
+        self._db = db
+        self.queries = []
+    
+    def __getitem__(self, name):
+        return _RecordingCollection(self._db[name], self.queries)
+    
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
+
+
+def _verify_modes() -> List[Tuple[Tuple[str, str, bool, str], List[Tuple[str, str]]]]:
+    """
+    (MASTERY_BACKEND, QUERY_MODE, CONCEPT_KEYS_TAGGED, PERFORMANCE_BACKEND)
+    combinations `verify` runs, each with the (collection, operation) reads
+    that show the mode's own read path was taken.
+    """
+    return [
+        (('recompute', 'python', False, 'recompute'),
+         [('learning_activities', 'find'), ('engagement_logs', 'find')]),
+        (('recompute', 'python', True, 'recompute'),
+         [('learning_activities', 'find'), ('engagement_logs', 'find')]),
+        (('recompute', 'aggregation', False, 'recompute'),
+         [('learning_activities', 'aggregate'), ('engagement_logs', 'aggregate')]),
+        (('materialized', 'python', False, 'rollup'),
+         [(config.MASTERY_STATE_COLLECTION, 'find'), (config.PERFORMANCE_ROLLUP_COLLECTION, 'aggregate')])
+    ]
+
+
+def record_service_queries(student_id: str, db=None) -> List[Dict]:
+    """
+    Run the ILPG read paths for a student in every mode and return the queries issued.
+    
+    The result cache is disabled while recording, so every mode reads the
+    database itself. Raises RuntimeError if a mode did not issue its
+    expected reads.
+    """
+    from .concept_mastery import concept_mastery_service
+    from .learning_pathway import learning_pathway_service
+    from .mastery_store import concept_mastery_store
+    from .roadmap_service import roadmap_service
+    from .rollups import performance_rollup_store
+    
+    db = db if db is not None else get_database()
+    services = [concept_mastery_service, learning_pathway_service, concept_mastery_store, roadmap_service, performance_rollup_store]
+    original_dbs = [service._db for service in services]
+    original_modes = (config.MASTERY_BACKEND, config.QUERY_MODE, config.CONCEPT_KEYS_TAGGED, config.PERFORMANCE_BACKEND)
+    original_result_cache = config.RESULT_CACHE_ENABLED
+    
+    queries = []
+    try:
+        config.RESULT_CACHE_ENABLED = False
+        for modes, expected_reads in _verify_modes():
+            # A recorder per mode, so each mode's reads can be checked on their own
+            recorder = _RecordingDatabase(db)
+            for service in services:
+                service._db = recorder
+            config.MASTERY_BACKEND, config.QUERY_MODE, config.CONCEPT_KEYS_TAGGED, config.PERFORMANCE_BACKEND = modes
+            mastery = concept_mastery_service.get_concept_mastery(student_id)
+            concept_name = mastery['concepts'][0]['concept_name'] if mastery['concepts'] else 'unknown concept'
+            concept_mastery_service.get_concept_mastery_by_name(student_id, concept_name)
+            learning_pathway_service.get_student_pathway(student_id)
+            learning_pathway_service.get_student_pathways([student_id])
+            roadmap_service.identify_weak_areas(student_id)
+            roadmap_service.get_weak_areas(student_id, 20)
+            
+            issued = {(query['collection'], 'find' if 'find' in query else 'aggregate') for query in recorder.queries}
+            missing = [read for read in expected_reads if read not in issued]
+            if missing:
+                raise RuntimeError(f'Mode {modes} issued no {missing} reads; its read path was not exercised')
+            queries.extend(recorder.queries)
+    finally:
+        for service, original_db in zip(services, original_dbs):
+            service._db = original_db
+        config.MASTERY_BACKEND, config.QUERY_MODE, config.CONCEPT_KEYS_TAGGED, config.PERFORMANCE_BACKEND = original_modes
+        config.RESULT_CACHE_ENABLED = original_result_cache
+    
+    unique = {}
+    for query in queries:
+        unique.setdefault(repr(sorted(query.items())), query)
+    return list(unique.values())
+
+
+def _collection_scans(explain: Any) -> List[str]:
+    """Stages named COLLSCAN inside any winning plan of an explain result."""
+    found = []
+    
+    def walk(node: Any, in_winning_plan: bool) -> None:
+        if isinstance(node, dict):
+            if in_winning_plan and node.get('stage') == 'COLLSCAN':
+                found.append(str(node.get('filter', {})))
+            for key, value in node.items():
+                if key == 'rejectedPlans':
+                    continue
+                walk(value, in_winning_plan or key in ('winningPlan', 'queryPlan'))
+        elif isinstance(node, list):
+            for item in node:
+                walk(item, in_winning_plan)
+    
+    walk(explain, False)
+    return found
+
+
+def verify_query_plans(student_id: str, db=None) -> List[str]:
+    """Explain every recorded service query and describe the ones that scan a collection."""
+    db = db if db is not None else get_database()
+    problems = []
+    for query in record_service_queries(student_id, db):
+        if 'find' in query:
+            command = {'find': query['collection'], 'filter': query['find']}
+            shape = query['find']
+        else:
+            command = {'aggregate': query['collection'], 'pipeline': query['aggregate'], 'cursor': {}}
+            shape = query['aggregate'][:1]
+        explain = db.command({'explain': command, 'verbosity': 'queryPlanner'})
+        if _collection_scans(explain):
+            problems.append(f"COLLSCAN on {query['collection']}: {shape}")
+    return problems
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='ILPG index management')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('ensure', help='Create the ILPG indexes')
+    verify_parser = subparsers.add_parser('verify', help='Fail if any service query is a COLLSCAN')
+    verify_parser.add_argument('--student', action='append', dest='students', required=True, help='Student id (repeatable)')
+    verify_parser.add_argument('--no-ensure', action='store_true', help='Do not create indexes before verifying')
+    args = parser.parse_args(argv)
+    
+    if args.command == 'ensure' or not args.no_ensure:
+        for collection_name, names in ensure_indexes().items():
+            print(f"[Indexes] {collection_name}: {', '.join(names)}")
+    if args.command == 'ensure':
+        return 0
+    
+    failed = False
+    for student_id in args.students:
+        try:
+            problems = verify_query_plans(student_id)
+        except RuntimeError as e:
+            problems = [str(e)]
+        for problem in problems:
+            print(f'[Indexes] {student_id}: {problem}')
+        failed = failed or bool(problems)
+        if not problems:
+            print(f'[Indexes] {student_id}: every query uses an index')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,229 @@
+"""
+Activity Ingestion Module.
+
+Batched writes of quiz, lesson and assignment events. A batch is validated
+event by event, written with one unordered insert_many per collection, and
+folded into the derived per-student state once per batch:
+- the materialized concept mastery store gets one bulk_write covering
+  every (student, concept) pair in the batch;
+- the daily performance rollups get one upsert per (student, day);
+- each student's cached mastery, pathway and roadmap results are
+  invalidated once, however many events they had.
+
+Event types map to the collections the ILPG services read:
+    quiz       -> learning_activities (quiz_complete, requires a 0-100 score)
+    lesson     -> learning_activities (lesson_complete)
+    assignment -> engagement_logs     (assignment_submit)
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Tuple
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+import sys
+from pathlib import Path
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from database import get_database
+from . import config
+from .mastery_store import concept_mastery_store
+from .rollups import performance_rollup_store
+from .metrics import timed, log_error
+from .result_cache import student_result_cache
+
+
+# Event type -> (collection, activity_type, concept source type)
+EVENT_TYPES = {
+    'quiz': ('learning_activities', 'quiz_complete', 'quiz'),
+    'lesson': ('learning_activities', 'lesson_complete', 'lesson'),
+    'assignment': ('engagement_logs', 'assignment_submit', 'assignment')
+}
+
+# `source` of the activities written here; the change watcher skips them
+# because ingest_events() has already folded them into the derived state
+INGESTION_SOURCE = 'ilpg_bulk'
+
+# Reference fields copied onto the activity (ObjectId when the value is one)
+REFERENCE_FIELDS = ('quiz_id', 'lesson_id', 'course_id', 'assignment_id')
+# Structured content fields copied as-is
+CONTENT_FIELDS = ('topic_name', 'unit_name', 'module_name')
+
+
+class IngestionError(Exception):
+    """Base exception for ingestion errors."""
+    def __init__(self, message: str, status_code: int = 400):
+        self.message = message
+        self.status_code = status_code
+        super().__init__(self.message)
+
+
+def _parse_timestamp(value: Any) -> datetime:
+    """ISO 8601 string (or datetime) as a naive UTC datetime, like stored activities."""
+    if isinstance(value, datetime):
+        timestamp = value
+    elif isinstance(value, str):
+        timestamp = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    else:
+        raise ValueError('occurred_at must be an ISO 8601 string')
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def _reference(value: Any) -> Any:
+    if isinstance(value, str) and ObjectId.is_valid(value):
+        return ObjectId(value)
+    if isinstance(value, (str, int)) and not isinstance(value, bool):
+        return value
+    raise ValueError('ids must be strings')
+
+
+class IngestionService:
+    """Validates and writes batches of learning events."""
+    
+    def __init__(self):
+        self._db = None
+    
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = get_database()
+        return self._db
+    
+    def build_activity(self, event: Any) -> Tuple[str, Dict]:
+        """
+        Validate one event and build its activity document.
+        
+        Returns (collection name, document); raises ValueError describing
+        the first problem found.
+        """
+        from .concept_mastery import concept_mastery_service
+        
+        if not isinstance(event, dict):
+            raise ValueError('event must be an object')
+        event_type = event.get('type')
+        if event_type not in EVENT_TYPES:
+            raise ValueError(f"type must be one of: {', '.join(EVENT_TYPES)}")
+        collection_name, activity_type, source_type = EVENT_TYPES[event_type]
+        
+        student_id = event.get('student_id')
+        if not isinstance(student_id, str) or not ObjectId.is_valid(student_id):
+            raise ValueError('student_id must be a valid id')
+        
+        activity = {
+            'user_id': ObjectId(student_id),
+            'activity_type': activity_type,
+            'created_at': _parse_timestamp(event['occurred_at']) if event.get('occurred_at') else datetime.utcnow(),
+            'source': INGESTION_SOURCE
+        }
+        
+        if event_type == 'quiz':
+            score = event.get('score')
+            if isinstance(score, bool) or not isinstance(score, (int, float)) or not 0 <= score <= config.QUIZ_SCORE_MAX:
+                raise ValueError(f'quiz events need a score between 0 and {config.QUIZ_SCORE_MAX} (a percentage)')
+            activity['score'] = score
+        
+        for field in REFERENCE_FIELDS:
+            if event.get(field) is not None:
+                activity[field] = _reference(event[field])
+        for field in CONTENT_FIELDS:
+            if event.get(field) is not None:
+                if not isinstance(event[field], str):
+                    raise ValueError(f'{field} must be a string')
+                activity[field] = event[field]
+        
+        metadata = {}
+        concepts = event.get('concepts')
+        if concepts is not None:
+            if not isinstance(concepts, list) or not all(isinstance(c, str) for c in concepts):
+                raise ValueError('concepts must be a list of strings')
+            metadata['concepts'] = concepts
+        for field in ('topic', 'status'):
+            if event.get(field) is not None:
+                if not isinstance(event[field], str):
+                    raise ValueError(f'{field} must be a string')
+                metadata[field] = event[field]
+        if metadata:
+            activity['metadata'] = metadata
+        if event.get('points_earned') is not None:
+            points = event['points_earned']
+            if isinstance(points, bool) or not isinstance(points, (int, float)):
+                raise ValueError('points_earned must be a number')
+            activity['points_earned'] = points
+        
+        activity['concept_keys'] = concept_mastery_service.extract_concept_keys(activity, source_type)
+        return collection_name, activity
+    
+    def _insert(self, collection_name: str, indexed: List[Tuple[int, Dict]],
+                rejected: List[Dict]) -> List[Dict]:
+        """Unordered insert_many; returns the documents that were written."""
+        documents = [activity for _, activity in indexed]
+        try:
+            self.db[collection_name].insert_many(documents, ordered=False)
+            return documents
+        except BulkWriteError as e:
+            failed = {error['index']: error.get('errmsg', 'write failed') for error in e.details.get('writeErrors', [])}
+            for position, message in failed.items():
+                rejected.append({'index': indexed[position][0], 'error': message})
+            return [activity for position, activity in enumerate(documents) if position not in failed]
+    
+    @timed('ingestion.ingest_events')
+    def ingest_events(self, events: List[Any]) -> Dict:
+        """
+        Validate and write a batch of events.
+        
+        Invalid events are reported and skipped; the rest are written.
+        Returns counts, the rejected events (by position in the batch) and
+        the number of students whose state was updated.
+        """
+        if self.db is None:
+            raise IngestionError('Database unavailable', 503)
+        if not isinstance(events, list) or not events:
+            raise IngestionError('events must be a non-empty list')
+        if len(events) > config.INGEST_MAX_EVENTS:
+            raise IngestionError(f'At most {config.INGEST_MAX_EVENTS} events per batch', 413)
+        
+        rejected = []
+        by_collection = {}
+        for index, event in enumerate(events):
+            try:
+                collection_name, activity = self.build_activity(event)
+            except (ValueError, TypeError) as e:
+                rejected.append({'index': index, 'error': str(e)})
+                continue
+            by_collection.setdefault(collection_name, []).append((index, activity))
+        
+        inserted = 0
+        students = set()
+        invalidated = set()
+        for collection_name, indexed in by_collection.items():
+            written = self._insert(collection_name, indexed, rejected)
+            inserted += len(written)
+            students.update(activity['user_id'] for activity in written)
+            try:
+                # One bulk_write per collection for every (student, concept) in the batch;
+                # it also invalidates the cached results of the students it changed
+                invalidated.update(concept_mastery_store.apply_activities(collection_name, written))
+            except Exception as e:
+                # The activities are stored; `mastery_store rebuild` repairs the derived state
+                log_error('Ingestion', f'Error updating concept mastery state: {e}')
+            try:
+                # Likewise one upsert per (student, day)
+                invalidated.update(performance_rollup_store.apply_activities(collection_name, written))
+            except Exception as e:
+                log_error('Ingestion', f'Error updating performance rollups: {e}')
+        
+        # Students whose events touched neither store still have stale results
+        student_result_cache.invalidate_students(students - invalidated)
+        
+        return {
+            'received': len(events),
+            'inserted': inserted,
+            'rejected': sorted(rejected, key=lambda r: r['index']),
+            'students': len(students)
+        }
+
+
+# Global service instance
+ingestion_service = IngestionService()
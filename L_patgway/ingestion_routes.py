@@ -0,0 +1,85 @@
+"""Ingestion Routes - API endpoint for bulk learning event ingestion"""
+
+from functools import wraps
+from flask import Blueprint, request, jsonify, g
+
+import sys
+from pathlib import Path
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from accounts import account_service, AccountError
+from .ingestion import ingestion_service, IngestionError, REFERENCE_FIELDS
+from .serialization import json_response
+from .metrics import add_server_timing, log_error
+from .indexes import ensure_indexes_on_startup
+from .result_cache import start_watcher_on_startup
+
+ingestion_bp = Blueprint('ingestion', __name__, url_prefix='/api/ilpg')
+ingestion_bp.record_once(ensure_indexes_on_startup)
+ingestion_bp.record_once(start_watcher_on_startup)
+ingestion_bp.after_request(add_server_timing)
+
+# Roles that may submit graded events and events for any student; other
+# callers may only self-report ungraded events (lessons and assignments)
+TRUSTED_ROLES = ['teacher', 'admin']
+SELF_REPORTED_TYPES = ['lesson', 'assignment']
+# The only fields a self-reported event may carry. Scores, completion status,
+# points, concepts/topics, content placement and occurred_at are set by
+# trusted callers only; self-reported events are stamped with the server time.
+SELF_REPORTED_FIELDS = ['type', 'student_id'] + list(REFERENCE_FIELDS)
+
+def token_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        auth = request.headers.get('Authorization')
+        if not auth or not auth.startswith('Bearer '):
+            return jsonify({'error': 'Token required'}), 401
+        try:
+            payload = account_service.verify_token(auth.split(' ')[1])
+            g.user_id = payload['user_id']
+            g.user_role = payload['role']
+        except AccountError as e:
+            return jsonify({'error': e.message}), e.status_code
+        return f(*args, **kwargs)
+    return decorated
+
+@ingestion_bp.route('/events/bulk', methods=['POST'])
+@token_required
+def ingest_events():
+    """
+    Ingest a batch of quiz/lesson/assignment events ({"events": [...]}).
+    
+    Students may only submit their own ungraded events: lesson and
+    assignment events carrying just their type, student_id (defaulting to
+    the signed-in user) and reference ids. Scores, status, points, concepts
+    and timestamps come from teachers and admins, who may submit events for
+    anyone. Scores are percentages (0-100).
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        events = data.get('events')
+        if not isinstance(events, list) or not events:
+            return jsonify({'error': 'events must be a non-empty list'}), 400
+        
+        if g.user_role not in TRUSTED_ROLES:
+            for event in events:
+                if isinstance(event, dict):
+                    event.setdefault('student_id', g.user_id)
+                    if event['student_id'] != g.user_id:
+                        return jsonify({'error': 'Access denied'}), 403
+                    if event.get('type') not in SELF_REPORTED_TYPES:
+                        return jsonify({'error': 'Only lesson and assignment events can be self-reported'}), 403
+                    extra = sorted(field for field in event if field not in SELF_REPORTED_FIELDS)
+                    if extra:
+                        return jsonify({'error': f"Self-reported events cannot set: {', '.join(extra)}"}), 403
+        
+        result = ingestion_service.ingest_events(events)
+        return json_response({
+            'success': True,
+            'data': result
+        })
+    except IngestionError as e:
+        return jsonify({'error': e.message}), e.status_code
+    except Exception as e:
+        log_error('Ingestion', f'Error ingesting events: {e}')
+        return jsonify({'error': 'Failed to ingest events'}), 500
@@ -5,8 +5,8 @@ Rule-based learning pathway generation for students.
 Categorizes students into BASIC, BALANCED, or ACCELERATION pathways.
 """
 
-from datetime import datetime
-from typing import Optional, Dict, Any
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List
 from bson import ObjectId
 
 import sys
@@ -14,6 +14,11 @@ from pathlib import Path
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from database import get_database
+from . import config, pipelines
+from .metrics import timed, log_error
+from .result_cache import student_result_cache
+from .rollups import performance_rollup_store
+from .student_context import StudentContext, resolve_context, TASK_ACTIVITY_TYPES
 
 
 class PathwayError(Exception):
@@ -38,6 +43,17 @@ class LearningPathwayService:
     BALANCED_MAX = 74
     ACCELERATION_MIN = 75
     
+    # Secondary rule: low task completion moves low scorers down to BASIC
+    LOW_COMPLETION_RATE = 0.5
+    LOW_COMPLETION_SCORE_MAX = 60
+    
+    # Reason codes (machine-readable counterpart of `reasoning`)
+    REASON_INSUFFICIENT_DATA = 'insufficient_data'
+    REASON_FOUNDATIONAL_SUPPORT = 'foundational_support'
+    REASON_NORMAL_PROGRESSION = 'normal_progression'
+    REASON_ADVANCED_READY = 'advanced_ready'
+    REASON_LOW_COMPLETION = 'low_completion_adjustment'
+    
     def __init__(self):
         self._db = None
     
@@ -47,79 +63,116 @@ class LearningPathwayService:
             self._db = get_database()
         return self._db
     
-    def get_student_performance(self, student_id: str) -> Dict:
+    @timed('pathway.get_student_performance')
+    def get_student_performance(self, student_id: str, context: Optional[StudentContext] = None) -> Dict:
         """Get student performance data for pathway calculation."""
         if self.db is None:
-            return {
-                'average_score': 0,
-                'task_completion_rate': 0,
-                'total_quizzes': 0,
-                'total_tasks': 0,
-                'completed_tasks': 0,
-                'recent_attempts': 0,
-                'last_quiz_date': None
-            }
+            return self.empty_performance()
         
+        context = resolve_context(student_id, context, self.db)
+        return context.memoize('performance', lambda: self._calculate_performance(context))
+    
+    def _calculate_performance(self, context: StudentContext) -> Dict:
+        """Calculate performance from the documents loaded by the context."""
         try:
-            student_oid = ObjectId(student_id)
-            
-            # Get quiz scores
-            quizzes = list(self.db.learning_activities.find({
-                'user_id': student_oid,
-                'activity_type': 'quiz_complete',
-                'score': {'$exists': True, '$ne': None}
-            }))
-            
-            # Calculate average score
-            average_score = 0
-            if quizzes:
-                total_score = sum(q.get('score', 0) for q in quizzes)
-                average_score = (total_score / len(quizzes)) * 100
-            
-            # Get task completion
-            tasks = list(self.db.engagement_logs.find({
-                'user_id': student_oid,
-                'activity_type': {'$in': ['lesson_complete', 'assignment_submit']}
-            }))
-            
-            total_tasks = len(tasks)
-            completed_tasks = len([t for t in tasks if t.get('metadata', {}).get('status') == 'completed' or t.get('points_earned', 0) > 0])
-            task_completion_rate = (completed_tasks / total_tasks) if total_tasks > 0 else 0
+            if config.PERFORMANCE_BACKEND == 'rollup':
+                # Sum the student's daily buckets instead of reading their history
+                stats = context.load('performance_rollup', lambda: performance_rollup_store.performance_stats([context.student_id]))
+                row = stats.get(context.student_id, {})
+                return self._performance_from_stats(row, row)
+            if config.QUERY_MODE == 'aggregation':
+                return self._aggregate_performance(context)
             
-            # Recent attempts (last 7 days)
-            from datetime import timedelta
-            cutoff_date = datetime.utcnow() - timedelta(days=7)
-            recent_attempts = len([q for q in quizzes if q.get('created_at', datetime.utcnow()) >= cutoff_date])
-            
-            # Get last quiz date
-            last_quiz_date = None
-            if quizzes:
-                quiz_dates = [q.get('created_at') for q in quizzes if q.get('created_at')]
-                if quiz_dates:
-                    last_quiz_date = max(quiz_dates)
-            
-            return {
-                'average_score': round(average_score, 2),
-                'task_completion_rate': round(task_completion_rate, 2),
-                'total_quizzes': len(quizzes),
-                'total_tasks': total_tasks,
-                'completed_tasks': completed_tasks,
-                'recent_attempts': recent_attempts,
-                'last_quiz_date': last_quiz_date.isoformat() if last_quiz_date else None
-            }
+            return self._performance_from_documents(context.get_quizzes(), context.get_tasks())
         except Exception as e:
-            print(f'[Pathway] Error getting performance: {e}')
-            return {
-                'average_score': 0,
-                'task_completion_rate': 0,
-                'total_quizzes': 0,
-                'total_tasks': 0,
-                'completed_tasks': 0,
-                'recent_attempts': 0,
-                'last_quiz_date': None
-            }
+            log_error('Pathway', f'Error getting performance: {e}')
+            return self.empty_performance()
     
-    def determine_pathway(self, student_id: str) -> Dict:
+    def _performance_from_documents(self, quizzes: List[Dict], tasks: List[Dict]) -> Dict:
+        """Calculate performance from a student's quiz and task documents."""
+        # Get quiz scores
+        total_score = sum(q.get('score', 0) for q in quizzes)
+        
+        # Get task completion
+        completed_tasks = len([t for t in tasks if t.get('metadata', {}).get('status') == 'completed' or t.get('points_earned', 0) > 0])
+        
+        # Recent attempts (last 7 days)
+        cutoff_date = datetime.utcnow() - timedelta(days=7)
+        recent_attempts = len([q for q in quizzes if q.get('created_at', datetime.utcnow()) >= cutoff_date])
+        
+        # Get last quiz date
+        quiz_dates = [q.get('created_at') for q in quizzes if q.get('created_at')]
+        last_quiz_date = max(quiz_dates) if quiz_dates else None
+        
+        return self.build_performance(
+            total_quizzes=len(quizzes),
+            total_score=total_score,
+            total_tasks=len(tasks),
+            completed_tasks=completed_tasks,
+            recent_attempts=recent_attempts,
+            last_quiz_date=last_quiz_date
+        )
+    
+    def _performance_from_stats(self, quiz_stats: Dict, task_stats: Dict) -> Dict:
+        """Calculate performance from quiz_stats/task_stats pipeline rows."""
+        return self.build_performance(
+            total_quizzes=quiz_stats.get('total_quizzes', 0),
+            total_score=quiz_stats.get('score_sum', 0),
+            total_tasks=task_stats.get('total_tasks', 0),
+            completed_tasks=task_stats.get('completed_tasks', 0),
+            recent_attempts=quiz_stats.get('recent_attempts', 0),
+            last_quiz_date=quiz_stats.get('last_quiz_date')
+        )
+    
+    def _aggregate_performance(self, context: StudentContext) -> Dict:
+        """Calculate performance with server-side aggregation pipelines."""
+        match = {'user_id': context.student_oid}
+        cutoff_date = datetime.utcnow() - timedelta(days=7)
+        quiz_rows = context.aggregate('quiz_stats', 'learning_activities', pipelines.quiz_stats_pipeline(match, cutoff_date))
+        task_rows = context.aggregate('task_stats', 'engagement_logs', pipelines.task_stats_pipeline(match))
+        return self._performance_from_stats(quiz_rows[0] if quiz_rows else {}, task_rows[0] if task_rows else {})
+    
+    def build_performance(self, total_quizzes: int, total_score: float, total_tasks: int,
+                          completed_tasks: int, recent_attempts: int,
+                          last_quiz_date: Optional[datetime]) -> Dict:
+        """
+        Build the performance dict from quiz and task totals.
+        
+        Quiz scores are stored as percentages (0-QUIZ_SCORE_MAX), so the average
+        is used as-is. Earlier releases multiplied it by 100, which put every
+        student with a score above 1% on the acceleration pathway; average_score
+        and the pathway thresholds are both on the 0-100 scale.
+        """
+        # Calculate average score (scores are already percentages)
+        average_score = 0
+        if total_quizzes:
+            average_score = total_score / total_quizzes
+        
+        task_completion_rate = (completed_tasks / total_tasks) if total_tasks > 0 else 0
+        
+        return {
+            'average_score': round(average_score, 2),
+            'task_completion_rate': round(task_completion_rate, 2),
+            'total_quizzes': total_quizzes,
+            'total_tasks': total_tasks,
+            'completed_tasks': completed_tasks,
+            'recent_attempts': recent_attempts,
+            'last_quiz_date': last_quiz_date.isoformat() if last_quiz_date else None
+        }
+    
+    def empty_performance(self) -> Dict:
+        """Performance for a student with no data."""
+        return {
+            'average_score': 0,
+            'task_completion_rate': 0,
+            'total_quizzes': 0,
+            'total_tasks': 0,
+            'completed_tasks': 0,
+            'recent_attempts': 0,
+            'last_quiz_date': None
+        }
+    
+    def determine_pathway(self, student_id: str, context: Optional[StudentContext] = None) -> Dict:
         """
         Determine learning pathway for a student.
         
@@ -130,7 +183,10 @@ class LearningPathwayService:
         
         Secondary factor: Task completion rate may adjust pathway downward.
         """
-        performance = self.get_student_performance(student_id)
+        return self.classify_performance(self.get_student_performance(student_id, context))
+    
+    def classify_performance(self, performance: Dict) -> Dict:
+        """Apply the pathway rules to a performance dict."""
         average_score = performance['average_score']
         task_completion_rate = performance['task_completion_rate']
         total_quizzes = performance['total_quizzes']
@@ -141,6 +197,7 @@ class LearningPathwayService:
                 'pathway_type': self.PATHWAY_BALANCED,
                 'pathway_label': 'Balanced',
                 'reasoning': 'Insufficient quiz data - defaulting to BALANCED pathway',
+                'reason_code': self.REASON_INSUFFICIENT_DATA,
                 'confidence': 'low',
                 'performance': performance
             }
@@ -150,61 +207,148 @@ class LearningPathwayService:
             pathway_type = self.PATHWAY_BASIC
             pathway_label = 'Basic'
             reasoning = f'Average score of {average_score}% indicates need for foundational support'
+            reason_code = self.REASON_FOUNDATIONAL_SUPPORT
         elif average_score < self.ACCELERATION_MIN:
             pathway_type = self.PATHWAY_BALANCED
             pathway_label = 'Balanced'
             reasoning = f'Average score of {average_score}% indicates normal progression'
+            reason_code = self.REASON_NORMAL_PROGRESSION
         else:
             pathway_type = self.PATHWAY_ACCELERATION
             pathway_label = 'Acceleration'
             reasoning = f'Average score of {average_score}% indicates readiness for advanced content'
+            reason_code = self.REASON_ADVANCED_READY
         
         # Secondary rule: Task completion adjustment
-        if (task_completion_rate < 0.5 and average_score < 60 and 
+        if (task_completion_rate < self.LOW_COMPLETION_RATE and average_score < self.LOW_COMPLETION_SCORE_MAX and 
             pathway_type != self.PATHWAY_BASIC):
             pathway_type = self.PATHWAY_BASIC
             pathway_label = 'Basic'
+            reason_code = self.REASON_LOW_COMPLETION
             reasoning += f'. Low task completion rate ({task_completion_rate*100:.0f}%) indicates need for additional support'
         
         return {
             'pathway_type': pathway_type,
             'pathway_label': pathway_label,
             'reasoning': reasoning,
+            'reason_code': reason_code,
             'confidence': 'high',
             'performance': performance
         }
     
+    @timed('pathway.get_student_pathway')
     def get_student_pathway(self, student_id: str) -> Dict:
-        """Get current pathway for a student."""
+        """Get current pathway for a student (served from the student result cache)."""
+        if config.RESULT_CACHE_ENABLED:
+            return student_result_cache.get_or_compute('pathway', student_id, lambda: self._get_student_pathway(student_id))
+        return self._get_student_pathway(student_id)
+    
+    def _get_student_pathway(self, student_id: str) -> Dict:
         try:
             pathway = self.determine_pathway(student_id)
-            performance = pathway.get('performance', {})
-            
-            # Flatten the pathway data for frontend compatibility
-            flattened_pathway = {
-                'pathway_type': pathway.get('pathway_type'),
-                'pathway_label': pathway.get('pathway_label'),
-                'reasoning': pathway.get('reasoning'),
-                'confidence': pathway.get('confidence'),
-                # Flatten performance fields to top level for frontend
-                'average_score': performance.get('average_score', 0),
-                'task_completion_rate': performance.get('task_completion_rate', 0),
-                'total_quizzes': performance.get('total_quizzes', 0),
-                'total_tasks': performance.get('total_tasks', 0),
-                'completed_tasks': performance.get('completed_tasks', 0),
-                'recent_attempts': performance.get('recent_attempts', 0),
-                'last_quiz_date': performance.get('last_quiz_date'),
-                # Keep performance object for backward compatibility
-                'performance': performance
-            }
             
             return {
                 'success': True,
-                'data': flattened_pathway
+                'data': self._flatten_pathway(pathway)
             }
         except Exception as e:
-            print(f'[Pathway] Error getting pathway: {e}')
+            log_error('Pathway', f'Error getting pathway: {e}')
             raise PathwayError(f'Failed to get pathway: {str(e)}', 500)
+    
+    def _flatten_pathway(self, pathway: Dict) -> Dict:
+        """Flatten the pathway data for frontend compatibility."""
+        performance = pathway.get('performance', {})
+        
+        return {
+            'pathway_type': pathway.get('pathway_type'),
+            'pathway_label': pathway.get('pathway_label'),
+            'reasoning': pathway.get('reasoning'),
+            'reason_code': pathway.get('reason_code'),
+            'confidence': pathway.get('confidence'),
+            # Flatten performance fields to top level for frontend
+            'average_score': performance.get('average_score', 0),
+            'task_completion_rate': performance.get('task_completion_rate', 0),
+            'total_quizzes': performance.get('total_quizzes', 0),
+            'total_tasks': performance.get('total_tasks', 0),
+            'completed_tasks': performance.get('completed_tasks', 0),
+            'recent_attempts': performance.get('recent_attempts', 0),
+            'last_quiz_date': performance.get('last_quiz_date'),
+            # Keep performance object for backward compatibility
+            'performance': performance
+        }
+    
+    def _parse_student_ids(self, student_ids: List[str]) -> List[str]:
+        """De-duplicate student ids (keeping order) and reject invalid ones."""
+        unique_ids = list(dict.fromkeys(str(student_id) for student_id in student_ids))
+        invalid_ids = [student_id for student_id in unique_ids if not ObjectId.is_valid(student_id)]
+        if invalid_ids:
+            raise PathwayError(f'Invalid student ids: {", ".join(invalid_ids)}', 400)
+        if len(unique_ids) > config.PATHWAY_BATCH_MAX_STUDENTS:
+            raise PathwayError(f'At most {config.PATHWAY_BATCH_MAX_STUDENTS} students per batch', 400)
+        return unique_ids
+    
+    def get_student_performances(self, student_ids: List[str]) -> Dict[str, Dict]:
+        """
+        Get performance for many students with one query per collection.
+        
+        Quizzes and tasks for every student are fetched with a single `$in`
+        query each (or one aggregation each in aggregation mode) and then
+        split by student.
+        """
+        student_ids = self._parse_student_ids(student_ids)
+        if self.db is None or not student_ids:
+            return {student_id: self.empty_performance() for student_id in student_ids}
+        
+        if config.PERFORMANCE_BACKEND == 'rollup':
+            stats = performance_rollup_store.performance_stats(student_ids)
+            return {
+                student_id: self._performance_from_stats(stats.get(student_id, {}), stats.get(student_id, {}))
+                for student_id in student_ids
+            }
+        
+        match = {'user_id': {'$in': [ObjectId(student_id) for student_id in student_ids]}}
+        
+        if config.QUERY_MODE == 'aggregation':
+            cutoff_date = datetime.utcnow() - timedelta(days=7)
+            quiz_stats = {str(row['_id']): row for row in self.db.learning_activities.aggregate(pipelines.quiz_stats_pipeline(match, cutoff_date))}
+            task_stats = {str(row['_id']): row for row in self.db.engagement_logs.aggregate(pipelines.task_stats_pipeline(match))}
+            return {
+                student_id: self._performance_from_stats(quiz_stats.get(student_id, {}), task_stats.get(student_id, {}))
+                for student_id in student_ids
+            }
+        
+        quizzes_by_student = {student_id: [] for student_id in student_ids}
+        for quiz in self.db.learning_activities.find(dict(match, activity_type='quiz_complete', score={'$exists': True, '$ne': None})):
+            quizzes_by_student[str(quiz['user_id'])].append(quiz)
+        
+        tasks_by_student = {student_id: [] for student_id in student_ids}
+        for task in self.db.engagement_logs.find(dict(match, activity_type={'$in': TASK_ACTIVITY_TYPES})):
+            tasks_by_student[str(task['user_id'])].append(task)
+        
+        return {
+            student_id: self._performance_from_documents(quizzes_by_student[student_id], tasks_by_student[student_id])
+            for student_id in student_ids
+        }
+    
+    def determine_pathways(self, student_ids: List[str]) -> Dict[str, Dict]:
+        """Determine pathways for many students in one pass, keyed by student id."""
+        performances = self.get_student_performances(student_ids)
+        return {student_id: self.classify_performance(performance) for student_id, performance in performances.items()}
+    
+    @timed('pathway.get_student_pathways')
+    def get_student_pathways(self, student_ids: List[str]) -> Dict:
+        """Get current pathways for many students (class dashboards)."""
+        try:
+            pathways = self.determine_pathways(student_ids)
+            return {
+                'success': True,
+                'data': {student_id: self._flatten_pathway(pathway) for student_id, pathway in pathways.items()}
+            }
+        except PathwayError:
+            raise
+        except Exception as e:
+            log_error('Pathway', f'Error getting pathways: {e}')
+            raise PathwayError(f'Failed to get pathways: {str(e)}', 500)
 
 
 # Global service instance
@@ -9,8 +9,17 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from accounts import account_service, AccountError
 from .learning_pathway import learning_pathway_service, PathwayError
+from .serialization import json_response, compress_response
+from .etag import conditional_student_response, current_student, path_student
+from .metrics import add_server_timing
+from .indexes import ensure_indexes_on_startup
+from .result_cache import start_watcher_on_startup
 
 pathway_bp = Blueprint('pathway', __name__, url_prefix='/api/pathway')
+pathway_bp.record_once(ensure_indexes_on_startup)
+pathway_bp.record_once(start_watcher_on_startup)
+pathway_bp.after_request(add_server_timing)
+pathway_bp.after_request(compress_response)
 
 def token_required(f):
     @wraps(f)
@@ -29,11 +38,12 @@ def token_required(f):
 
 @pathway_bp.route('/me', methods=['GET'])
 @token_required
+@conditional_student_response(current_student)
 def get_my_pathway():
     """Get learning pathway for current user."""
     try:
         result = learning_pathway_service.get_student_pathway(g.user_id)
-        return jsonify(result), 200
+        return json_response(result)
     except PathwayError as e:
         return jsonify({'error': e.message}), e.status_code
     except Exception as e:
@@ -41,6 +51,7 @@ def get_my_pathway():
 
 @pathway_bp.route('/student/<student_id>', methods=['GET'])
 @token_required
+@conditional_student_response(path_student)
 def get_student_pathway(student_id):
     """Get learning pathway for a specific student (teacher/admin only)."""
     try:
@@ -49,9 +60,29 @@ def get_student_pathway(student_id):
             return jsonify({'error': 'Access denied'}), 403
         
         result = learning_pathway_service.get_student_pathway(student_id)
-        return jsonify(result), 200
+        return json_response(result)
     except PathwayError as e:
         return jsonify({'error': e.message}), e.status_code
     except Exception as e:
         return jsonify({'error': 'Failed to get pathway'}), 500
 
+@pathway_bp.route('/batch', methods=['POST'])
+@token_required
+def get_student_pathways():
+    """Get learning pathways for many students at once (teacher/admin only)."""
+    try:
+        if g.user_role not in ['teacher', 'admin']:
+            return jsonify({'error': 'Access denied'}), 403
+        
+        data = request.get_json(silent=True) or {}
+        student_ids = data.get('student_ids')
+        if not isinstance(student_ids, list) or not student_ids:
+            return jsonify({'error': 'student_ids must be a non-empty list'}), 400
+        
+        result = learning_pathway_service.get_student_pathways(student_ids)
+        return json_response(result)
+    except PathwayError as e:
+        return jsonify({'error': e.message}), e.status_code
+    except Exception as e:
+        return jsonify({'error': 'Failed to get pathways'}), 500
+
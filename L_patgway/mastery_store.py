@@ -0,0 +1,401 @@
+"""
+Concept Mastery Store Module.
+
+Materialized per-student/per-concept mastery state. Each document keeps the
+running totals ConceptMasteryService needs (score sum and count, last
+attempt, the last few scores, engagement count and sources, plus the BKT
+p(L) estimate when ILPG_MASTERY_MODEL=bkt), updated
+incrementally as activities are ingested, so reading a student's mastery
+no longer scans their full activity history.
+
+IngestionService folds its own writes in. Activities, enrollments and
+structured content written by the other backend components reach the store
+through the change-stream watcher (ILPG_RESULT_CACHE_WATCH, replica sets
+only, see result_cache.ActivityChangeWatcher). Without the watcher, or after
+deletes (which a change stream reports without the document), refresh or
+rebuild the affected students:
+    python -m L_patgway.mastery_store refresh [--student <id> ...] [--module <name> ...]
+    python -m L_patgway.mastery_store rebuild [--student <id> ...]
+
+State documents also carry a normalized `concept_key` for single-concept
+lookups. Tag existing activities with their concept keys with:
+    python -m L_patgway.mastery_store tag-concepts
+"""
+
+import argparse
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Iterable, Tuple
+from bson import ObjectId
+from pymongo import UpdateOne, ReplaceOne
+
+import sys
+from pathlib import Path
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from database import get_database
+from . import config, pipelines
+from .bkt import bkt_engine, is_correct, update_expression
+from .indexes import ensure_indexes
+from .result_cache import student_result_cache
+from .student_context import StudentContext, LEARNING_ACTIVITY_TYPES, TASK_ACTIVITY_TYPES
+
+
+class ConceptMasteryStore:
+    """Incrementally maintained concept mastery state."""
+    
+    def __init__(self):
+        self._db = None
+    
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = get_database()
+        return self._db
+    
+    @property
+    def collection(self):
+        return self.db[config.MASTERY_STATE_COLLECTION]
+    
+    def load_states(self, student_id: str) -> Dict[str, Dict]:
+        """Load a student's concept states keyed by concept name."""
+        return self._load({'student_id': ObjectId(student_id)})
+    
+    def load_concept_states(self, student_id: str, concept_key: str) -> Dict[str, Dict]:
+        """Load the states of the concepts whose normalized key is `concept_key`."""
+        return self._load({'student_id': ObjectId(student_id), 'concept_key': concept_key})
+    
+    def load_class_states(self, student_ids: List[str]) -> Dict[str, Dict[str, Dict]]:
+        """Concept states of many students in one query, keyed by student id then concept name."""
+        states = {student_id: {} for student_id in student_ids}
+        for doc in self.collection.find({'student_id': {'$in': [ObjectId(student_id) for student_id in student_ids]}}):
+            if not (doc.get('score_count') or doc.get('engagement_count') or doc.get('has_content')):
+                continue
+            states.setdefault(str(doc['student_id']), {})[doc['concept_name']] = self._state_from(doc)
+        return states
+    
+    def _load(self, query: Dict) -> Dict[str, Dict]:
+        states = {}
+        for doc in self.collection.find(query):
+            if not (doc.get('score_count') or doc.get('engagement_count') or doc.get('has_content')):
+                continue
+            states[doc['concept_name']] = self._state_from(doc)
+        return states
+    
+    def _state_from(self, doc: Dict) -> Dict:
+        from .concept_mastery import concept_mastery_service
+        
+        state = concept_mastery_service.new_concept_state(doc['concept_name'])
+        for field in state:
+            if doc.get(field) is not None:
+                state[field] = doc[field]
+        return state
+    
+    def load_weakest_states(self, student_id: str, threshold: float, skip: int, limit: int) -> Tuple[List[Dict], int]:
+        """
+        States of the student's weakest concepts below `threshold` mastery
+        (weakest first), plus how many concepts are below it in total.
+        """
+        rows = list(self.collection.aggregate(pipelines.weakest_concepts_pipeline(
+            ObjectId(student_id), threshold, skip, limit, config.MASTERY_MODEL == 'bkt'
+        )))
+        if not rows:
+            return [], 0
+        total = rows[0]['total'][0]['count'] if rows[0]['total'] else 0
+        return [self._state_from(doc) for doc in rows[0]['page']], total
+    
+    def _collect_deltas(self, collection_name: str, activities: Iterable[Dict]) -> Dict[tuple, Dict]:
+        """Group activities into per-(student, concept) running-total deltas."""
+        from .concept_mastery import concept_mastery_service
+        
+        deltas = {}
+        
+        def delta_for(student_oid: ObjectId, concept: str) -> Dict:
+            key = (student_oid, concept)
+            if key not in deltas:
+                deltas[key] = concept_mastery_service.new_concept_state(concept)
+            return deltas[key]
+        
+        for activity in activities:
+            student_oid = activity.get('user_id')
+            activity_type = activity.get('activity_type')
+            if student_oid is None:
+                continue
+            activity_date = activity.get('created_at', datetime.utcnow())
+            
+            if collection_name == 'learning_activities' and activity_type == 'quiz_complete':
+                if activity.get('score') is None:
+                    continue
+                for concept in concept_mastery_service.extract_concepts(activity, 'quiz'):
+                    delta = delta_for(student_oid, concept)
+                    concept_mastery_service.apply_quiz(delta, activity['score'], activity_date)
+                    delta.setdefault('observations', []).append((activity_date, is_correct(activity['score'])))
+            elif collection_name == 'learning_activities' and activity_type == 'lesson_complete':
+                for concept in concept_mastery_service.extract_concepts(activity, 'lesson'):
+                    concept_mastery_service.apply_engagement(delta_for(student_oid, concept), 'lesson', activity_date)
+            elif collection_name == 'engagement_logs' and activity_type in TASK_ACTIVITY_TYPES:
+                for concept in concept_mastery_service.extract_concepts(activity, 'assignment'):
+                    concept_mastery_service.apply_engagement(delta_for(student_oid, concept), 'assignment', activity_date)
+        
+        return deltas
+    
+    def _delta_update(self, student_oid: ObjectId, delta: Dict) -> UpdateOne:
+        """Build the upsert that folds a delta into the stored state."""
+        from .concept_mastery import normalize_concept_key
+        
+        update = {
+            '$inc': {
+                'score_sum': delta['score_sum'],
+                'score_count': delta['score_count'],
+                'engagement_count': delta['engagement_count']
+            },
+            '$set': {'updated_at': datetime.utcnow()},
+            '$setOnInsert': {'has_content': False, 'concept_key': normalize_concept_key(delta['concept_name'])}
+        }
+        if delta['recent_scores']:
+            update['$push'] = {'recent_scores': {
+                '$each': delta['recent_scores'],
+                '$slice': -config.RECENT_SCORES_LIMIT
+            }}
+        if delta['engagement_sources']:
+            update['$addToSet'] = {'engagement_sources': {'$each': delta['engagement_sources']}}
+        latest = {}
+        if delta['last_attempt']:
+            latest['last_attempt'] = delta['last_attempt']
+        if delta['last_engagement']:
+            latest['last_engagement'] = delta['last_engagement']
+        if latest:
+            update['$max'] = latest
+        
+        return UpdateOne({'student_id': student_oid, 'concept_name': delta['concept_name']}, update, upsert=True)
+    
+    def _knowledge_update(self, student_oid: ObjectId, delta: Dict) -> UpdateOne:
+        """Pipeline update advancing the stored BKT p(L) by the delta's quiz observations."""
+        observations = [correct for _, correct in sorted(delta['observations'], key=lambda o: o[0])]
+        expression = update_expression(observations, bkt_engine.params_for(delta['concept_name']))
+        return UpdateOne(
+            {'student_id': student_oid, 'concept_name': delta['concept_name']},
+            [{'$set': {'p_known': expression}}],
+            upsert=True
+        )
+    
+    def apply_activities(self, collection_name: str, activities: Iterable[Dict]) -> List[ObjectId]:
+        """
+        Fold newly written learning_activities/engagement_logs documents into the store.
+        
+        Activities for the same student and concept are combined into a single
+        update. Returns the ids of the students whose state changed.
+        """
+        if self.db is None:
+            return []
+        
+        deltas = self._collect_deltas(collection_name, activities)
+        if not deltas:
+            return []
+        
+        operations = [self._delta_update(student_oid, delta) for (student_oid, _), delta in deltas.items()]
+        knowledge_operations = []
+        if config.MASTERY_MODEL == 'bkt':
+            knowledge_operations = [
+                self._knowledge_update(student_oid, delta)
+                for (student_oid, _), delta in deltas.items() if delta.get('observations')
+            ]
+        # BKT updates must run after the upserts that create their documents
+        self.collection.bulk_write(operations + knowledge_operations, ordered=bool(knowledge_operations))
+        changed = list({student_oid for student_oid, _ in deltas})
+        student_result_cache.invalidate_students(changed)
+        return changed
+    
+    def apply_activity(self, collection_name: str, activity: Dict) -> List[ObjectId]:
+        """Fold a single newly written activity into the store."""
+        return self.apply_activities(collection_name, [activity])
+    
+    def refresh_content(self, student_id: str, context: Optional[StudentContext] = None) -> None:
+        """Re-derive which concepts come from the student's enrolled structured content."""
+        from .concept_mastery import concept_mastery_service, normalize_concept_key
+        
+        if self.db is None:
+            return
+        
+        context = context or StudentContext(student_id, self.db)
+        student_oid = ObjectId(student_id)
+        concepts = list(set(concept_mastery_service.extract_content_concepts(context.get_structured_contents())))
+        
+        operations = [
+            UpdateOne(
+                {'student_id': student_oid, 'concept_name': concept},
+                {
+                    '$set': {'has_content': True, 'updated_at': datetime.utcnow()},
+                    '$setOnInsert': {
+                        'concept_key': normalize_concept_key(concept),
+                        'score_sum': 0,
+                        'score_count': 0,
+                        'recent_scores': [],
+                        'engagement_count': 0,
+                        'engagement_sources': []
+                    }
+                },
+                upsert=True
+            )
+            for concept in concepts
+        ]
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+        self.collection.update_many(
+            {'student_id': student_oid, 'concept_name': {'$nin': concepts}, 'has_content': True},
+            {'$set': {'has_content': False, 'updated_at': datetime.utcnow()}}
+        )
+        student_result_cache.invalidate_student(student_id)
+    
+    def refresh_module(self, module_name: str) -> int:
+        """refresh_content() for every student enrolled in a module. Returns the student count."""
+        if self.db is None:
+            return 0
+        
+        student_ids = [str(student_oid) for student_oid in self.db.enrollments.distinct('student_id', {'module_name': module_name})]
+        for student_id in student_ids:
+            self.refresh_content(student_id)
+        return len(student_ids)
+    
+    def rebuild_student(self, student_id: str) -> int:
+        """Recompute a student's state from their full history. Returns the concept count."""
+        from .concept_mastery import concept_mastery_service, normalize_concept_key
+        
+        if self.db is None:
+            return 0
+        
+        context = StudentContext(student_id, self.db)
+        student_oid = ObjectId(student_id)
+        states = concept_mastery_service.aggregate_concept_states(
+            quizzes=context.get_quizzes(),
+            lessons=context.get_lessons(),
+            assignments=context.get_tasks(),
+            structured_contents=context.get_structured_contents()
+        )
+        if config.MASTERY_MODEL == 'bkt':
+            for concept, p_known in bkt_engine.estimate(context.get_quizzes()).items():
+                states[concept]['p_known'] = p_known
+        
+        now = datetime.utcnow()
+        operations = [
+            ReplaceOne(
+                {'student_id': student_oid, 'concept_name': concept},
+                dict(state, student_id=student_oid, concept_key=normalize_concept_key(concept), updated_at=now),
+                upsert=True
+            )
+            for concept, state in states.items()
+        ]
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+        self.collection.delete_many({'student_id': student_oid, 'concept_name': {'$nin': list(states.keys())}})
+        student_result_cache.invalidate_student(student_id)
+        return len(states)
+    
+    def set_knowledge(self, student_id: str, knowledge: Dict[str, float]) -> int:
+        """Overwrite stored BKT p(L) values for existing concept states. Returns the count updated."""
+        if self.db is None or not knowledge:
+            return 0
+        
+        student_oid = ObjectId(student_id)
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne(
+                {'student_id': student_oid, 'concept_name': concept},
+                {'$set': {'p_known': p_known, 'updated_at': now}}
+            )
+            for concept, p_known in knowledge.items()
+        ]
+        matched = self.collection.bulk_write(operations, ordered=False).matched_count
+        student_result_cache.invalidate_student(student_id)
+        return matched
+    
+    def tag_activities(self, batch_size: int = 1000) -> Dict[str, int]:
+        """Write the `concept_keys` tag on activities that do not have it yet."""
+        from .concept_mastery import concept_mastery_service
+        
+        if self.db is None:
+            return {}
+        
+        sources = {
+            'learning_activities': (LEARNING_ACTIVITY_TYPES, lambda a: 'quiz' if a.get('activity_type') == 'quiz_complete' else 'lesson'),
+            'engagement_logs': (TASK_ACTIVITY_TYPES, lambda a: 'assignment')
+        }
+        tagged = {}
+        for collection_name, (activity_types, source_type) in sources.items():
+            collection = self.db[collection_name]
+            tagged[collection_name] = 0
+            operations = []
+            cursor = collection.find(
+                {'activity_type': {'$in': activity_types}, 'concept_keys': {'$exists': False}}
+            ).batch_size(batch_size)
+            for activity in cursor:
+                keys = concept_mastery_service.extract_concept_keys(activity, source_type(activity))
+                operations.append(UpdateOne({'_id': activity['_id']}, {'$set': {'concept_keys': keys}}))
+                if len(operations) >= batch_size:
+                    tagged[collection_name] += collection.bulk_write(operations, ordered=False).modified_count
+                    operations = []
+            if operations:
+                tagged[collection_name] += collection.bulk_write(operations, ordered=False).modified_count
+        return tagged
+    
+    def iter_student_ids(self) -> Iterable[str]:
+        """Every student with activity or enrollments."""
+        student_ids = set()
+        student_ids.update(self.db.learning_activities.distinct('user_id'))
+        student_ids.update(self.db.engagement_logs.distinct('user_id'))
+        student_ids.update(self.db.enrollments.distinct('student_id'))
+        for student_oid in sorted(student_ids, key=str):
+            yield str(student_oid)
+    
+    def rebuild(self, student_ids: Optional[List[str]] = None) -> Dict[str, int]:
+        """Backfill the store for the given students, or for everyone."""
+        if self.db is None:
+            return {'students': 0, 'concepts': 0}
+        
+        students = 0
+        concepts = 0
+        for student_id in (student_ids or self.iter_student_ids()):
+            try:
+                concepts += self.rebuild_student(student_id)
+                students += 1
+            except Exception as e:
+                print(f'[MasteryStore] Error rebuilding {student_id}: {e}')
+        return {'students': students, 'concepts': concepts}
+
+
+# Global store instance
+concept_mastery_store = ConceptMasteryStore()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Maintain the materialized concept mastery store')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    rebuild_parser = subparsers.add_parser('rebuild', help='Recompute state from full activity history')
+    rebuild_parser.add_argument('--student', action='append', dest='students', help='Student id (repeatable)')
+    refresh_parser = subparsers.add_parser('refresh', help='Re-derive content concepts after enrollment or content changes')
+    refresh_parser.add_argument('--student', action='append', dest='students', help='Student id (repeatable)')
+    refresh_parser.add_argument('--module', action='append', dest='modules', help='Every student enrolled in this module (repeatable)')
+    subparsers.add_parser('tag-concepts', help='Tag activities with normalized concept keys')
+    args = parser.parse_args(argv)
+    
+    ensure_indexes()
+    if args.command == 'refresh':
+        refreshed = 0
+        for module_name in args.modules or []:
+            refreshed += concept_mastery_store.refresh_module(module_name)
+        student_ids = args.students or ([] if args.modules else list(concept_mastery_store.iter_student_ids()))
+        for student_id in student_ids:
+            concept_mastery_store.refresh_content(student_id)
+            refreshed += 1
+        print(f'[MasteryStore] Refreshed content concepts for {refreshed} students')
+    elif args.command == 'tag-concepts':
+        tagged = concept_mastery_store.tag_activities()
+        for collection_name, count in tagged.items():
+            print(f'[MasteryStore] Tagged {count} {collection_name} documents')
+    elif args.command == 'rebuild':
+        result = concept_mastery_store.rebuild(args.students)
+        print(f"[MasteryStore] Rebuilt {result['concepts']} concepts for {result['students']} students")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,233 @@
+"""
+Metrics Module.
+
+In-process instrumentation for the ILPG hot paths:
+- service methods (@timed), database loads (StudentContext.load) and AI
+  generations are timed into latency histograms;
+- documents read, cache hits/misses and errors are counted;
+- cache sizes are reported as gauges when metrics are rendered.
+
+render() produces the Prometheus text exposition format served at
+/api/ilpg/metrics. With ILPG_SERVER_TIMING, timings taken while handling a
+request are also returned in its Server-Timing header.
+
+Errors are still printed as `[Component] message`, via log_error(), which
+also counts them per component.
+"""
+
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Optional, Dict, Any, List, Tuple, Callable, Iterable
+
+from flask import g, has_request_context
+
+import sys
+from pathlib import Path
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from . import config
+
+
+# Histogram bucket upper bounds, in seconds
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HELP = {
+    'ilpg_service_duration_seconds': ('histogram', 'ILPG service method latency'),
+    'ilpg_db_duration_seconds': ('histogram', 'Database load latency per request-context key'),
+    'ilpg_ai_duration_seconds': ('histogram', 'AI generation latency (cache misses only)'),
+    'ilpg_db_documents_total': ('counter', 'Documents (or rows) returned by database loads'),
+    'ilpg_cache_requests_total': ('counter', 'Cache lookups by cache and result'),
+    'ilpg_errors_total': ('counter', 'Errors logged per component'),
+    'ilpg_cache_entries': ('gauge', 'Entries currently held per cache'),
+    'ilpg_cache_bytes': ('gauge', 'Approximate bytes currently held per cache')
+}
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> LabelSet:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: LabelSet) -> str:
+    if not labels:
+        return ''
+    escaped = (
+        f'{key}="' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for key, value in labels
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms with a Prometheus text renderer."""
+    
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = []
+    
+    def increment(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+    
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram['counts'][index] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+    
+    def add_collector(self, collector: Callable[[], Iterable[Tuple[str, Dict[str, Any], float]]]) -> None:
+        """Register a callable returning (gauge name, labels, value) samples at render time."""
+        with self._lock:
+            self._collectors.append(collector)
+    
+    def counter_total(self, name: str) -> float:
+        """Sum of a counter over all its label sets."""
+        with self._lock:
+            return sum(value for (counter, _), value in self._counters.items() if counter == name)
+    
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+    
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: dict(value, counts=list(value['counts'])) for key, value in self._histograms.items()}
+            collectors = list(self._collectors)
+        
+        gauges = {}
+        for collector in collectors:
+            try:
+                for name, labels, value in collector():
+                    gauges[(name, _labels(labels))] = value
+            except Exception as e:
+                log_error('Metrics', f'Error collecting gauges: {e}')
+        
+        # Metric name -> [(labels, lines)], so each series' lines stay together
+        families = {}
+        for (name, labels), value in list(counters.items()) + list(gauges.items()):
+            families.setdefault(name, []).append((labels, [f'{name}{_format_labels(labels)} {_format_value(value)}']))
+        for (name, labels), histogram in histograms.items():
+            lines = [
+                f'{name}_bucket{_format_labels(labels + (("le", repr(bound)),))} {count}'
+                for bound, count in zip(self.buckets, histogram['counts'])
+            ]
+            lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {histogram["count"]}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(histogram["sum"])}')
+            lines.append(f'{name}_count{_format_labels(labels)} {histogram["count"]}')
+            families.setdefault(name, []).append((labels, lines))
+        
+        output = []
+        for name in sorted(families):
+            metric_type, help_text = HELP.get(name, ('untyped', name))
+            output.append(f'# HELP {name} {help_text}')
+            output.append(f'# TYPE {name} {metric_type}')
+            for _, lines in sorted(families[name]):
+                output.extend(lines)
+        return '\n'.join(output) + '\n'
+
+
+# Global registry
+registry = MetricsRegistry()
+
+
+def _record_server_timing(name: str, duration: float) -> None:
+    if not config.SERVER_TIMING or not has_request_context():
+        return
+    timings = g.get('_ilpg_server_timing')
+    if timings is None:
+        timings = g._ilpg_server_timing = {}
+    total, count = timings.get(name, (0.0, 0))
+    timings[name] = (total + duration, count + 1)
+
+
+@contextmanager
+def timer(kind: str, operation: str):
+    """Time a block into ilpg_<kind>_duration_seconds{operation=...}."""
+    if not config.METRICS_ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        registry.observe(f'ilpg_{kind}_duration_seconds', duration, operation=operation)
+        _record_server_timing(f'{kind}.{operation}', duration)
+
+
+def timed(operation: str):
+    """Decorator timing a service method as ilpg_service_duration_seconds{operation=...}."""
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            with timer('service', operation):
+                return f(*args, **kwargs)
+        return decorated
+    return decorator
+
+
+def count_documents(source: str, result: Any) -> None:
+    """Count the documents a database load returned (lists only)."""
+    if config.METRICS_ENABLED and isinstance(result, list):
+        registry.increment('ilpg_db_documents_total', len(result), source=source)
+
+
+def count_cache(cache: str, result: str, kind: Optional[str] = None) -> None:
+    """Count a cache lookup; `result` is e.g. 'hit', 'miss' or 'persistent_hit'."""
+    if not config.METRICS_ENABLED:
+        return
+    if kind is None:
+        registry.increment('ilpg_cache_requests_total', cache=cache, result=result)
+    else:
+        registry.increment('ilpg_cache_requests_total', cache=cache, result=result, kind=kind)
+
+
+def log_error(component: str, message: str) -> None:
+    """Print `[Component] message` and count it in ilpg_errors_total."""
+    print(f'[{component}] {message}')
+    if config.METRICS_ENABLED:
+        registry.increment('ilpg_errors_total', component=component)
+
+
+_TOKEN_UNSAFE = re.compile(r'[^A-Za-z0-9_.\-]')
+
+
+def server_timing_header(timings: Dict[str, Tuple[float, int]]) -> str:
+    """Server-Timing value: one metric per timed operation, durations in ms."""
+    parts = []
+    for name, (total, count) in timings.items():
+        token = _TOKEN_UNSAFE.sub('_', name)
+        part = f'{token};dur={total * 1000:.2f}'
+        if count > 1:
+            part += f';desc="x{count}"'
+        parts.append(part)
+    return ', '.join(parts)
+
+
+def add_server_timing(response):
+    """after_request hook: attach the request's timings as a Server-Timing header."""
+    timings = g.get('_ilpg_server_timing')
+    if config.SERVER_TIMING and timings:
+        response.headers['Server-Timing'] = server_timing_header(timings)
+    return response
@@ -0,0 +1,58 @@
+"""Metrics Routes - Prometheus endpoint for ILPG instrumentation"""
+
+import hmac
+from flask import Blueprint, request, jsonify, Response
+
+import sys
+from pathlib import Path
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from accounts import account_service, AccountError
+from . import config
+from .metrics import registry
+from .ai_cache import ai_response_cache
+from .result_cache import student_result_cache
+
+metrics_bp = Blueprint('ilpg_metrics', __name__, url_prefix='/api/ilpg')
+
+def cache_gauges():
+    """Current size of the ILPG caches."""
+    result_stats = student_result_cache.stats()
+    ai_stats = ai_response_cache.stats()
+    return [
+        ('ilpg_cache_entries', {'cache': 'result'}, result_stats['entries']),
+        ('ilpg_cache_bytes', {'cache': 'result'}, result_stats['bytes']),
+        ('ilpg_cache_entries', {'cache': 'ai'}, ai_stats['entries'])
+    ]
+
+registry.add_collector(cache_gauges)
+
+def metrics_access_error():
+    """
+    None if the caller may read the metrics, otherwise the error response.
+    
+    Scrapers present ILPG_METRICS_TOKEN when it is configured; without it,
+    only teacher and admin account tokens are accepted.
+    """
+    auth = request.headers.get('Authorization', '')
+    if not auth.startswith('Bearer '):
+        return jsonify({'error': 'Token required'}), 401
+    if config.METRICS_TOKEN and hmac.compare_digest(auth, f'Bearer {config.METRICS_TOKEN}'):
+        return None
+    try:
+        payload = account_service.verify_token(auth.split(' ')[1])
+    except AccountError as e:
+        return jsonify({'error': e.message}), e.status_code
+    if payload.get('role') not in ['teacher', 'admin']:
+        return jsonify({'error': 'Access denied'}), 403
+    return None
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus text exposition of the ILPG metrics (ILPG_METRICS_TOKEN or a teacher/admin token)."""
+    if not config.METRICS_ENABLED:
+        return jsonify({'error': 'Metrics disabled'}), 404
+    error = metrics_access_error()
+    if error is not None:
+        return error
+    return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,316 @@
+"""
+Aggregation Pipelines Module.
+
+MongoDB aggregation pipelines used when ILPG_QUERY_MODE=aggregation. They
+express the concept grouping (including every extract_concepts fallback
+rule) and the pathway performance statistics server-side, so only grouped
+rows cross the wire instead of whole activity documents.
+
+Compare the two execution modes for a student with:
+    python -m L_patgway.pipelines verify --student <id>
+"""
+
+import argparse
+from datetime import datetime
+from typing import Optional, Dict, Any, List
+
+import sys
+from pathlib import Path
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from . import config
+from .student_context import StudentContext, LEARNING_ACTIVITY_TYPES, TASK_ACTIVITY_TYPES
+
+
+def _truthy(expr: Any) -> Dict:
+    """Python truthiness in MQL: missing, null, false, 0, '' and [] are all false."""
+    return {'$and': [expr, {'$ne': [expr, '']}, {'$ne': [expr, []]}]}
+
+
+def _is_string(expr: Any) -> Dict:
+    """True for strings: in BSON order they sort after every number and before every object."""
+    return {'$and': [{'$gte': [expr, '']}, {'$lt': [expr, {'$literal': {}}]}]}
+
+
+def _array_or_empty(expr: Any) -> Dict:
+    """expr if it is an array, otherwise [] (so $size never sees a missing or scalar field)."""
+    return {'$cond': [{'$isArray': expr}, expr, []]}
+
+
+def _one(expr: Any) -> Dict:
+    """[expr]; built with $map because mongomock does not evaluate expressions inside array literals."""
+    return {'$map': {'input': [0], 'in': expr}}
+
+
+def _single(expr: Any) -> Dict:
+    """[expr] when expr is truthy, otherwise []."""
+    return {'$cond': [_truthy(expr), _one(expr), []]}
+
+
+def _prefixed_id(prefix: str, field: str) -> Dict:
+    """['<prefix><str(field)>'] when the id field is truthy, otherwise []."""
+    return {'$cond': [_truthy(field), _one({'$concat': [prefix, {'$toString': field}]}), []]}
+
+
+def concepts_expression(is_quiz: Any) -> Dict:
+    """
+    Mirror of ConceptMasteryService.extract_concepts as an aggregation expression.
+    
+    `is_quiz` is an expression (or constant) enabling the quiz_<id>
+    last-resort fallback.
+    """
+    explicit = {'$cond': [
+        {'$gt': [{'$size': _array_or_empty('$metadata.concepts')}, 0]},
+        '$metadata.concepts',
+        _single('$metadata.concept')
+    ]}
+    base = {'$concatArrays': [
+        explicit,
+        _single('$metadata.topic'),
+        _single('$topic_name'),
+        _single('$unit_name'),
+        _single('$module_name'),
+        _prefixed_id('lesson_', '$lesson_id'),
+        _prefixed_id('course_', '$course_id')
+    ]}
+    return {'$let': {
+        'vars': {'base': base},
+        'in': {'$setUnion': [{'$filter': {
+            'input': {'$concatArrays': [
+                '$$base',
+                {'$cond': [
+                    {'$and': [is_quiz, _truthy('$quiz_id'), {'$eq': [{'$size': _array_or_empty('$$base')}, 0]}]},
+                    _one({'$concat': ['quiz_', {'$toString': '$quiz_id'}]}),
+                    []
+                ]}
+            ]},
+            'as': 'concept',
+            # Non-blank strings; $cond (not $and) so the regex only ever sees strings
+            'cond': {'$cond': [_is_string('$$concept'), {'$regexMatch': {'input': '$$concept', 'regex': r'\S'}}, False]}
+        }}, []]}
+    }}
+
+
+def _latest_date() -> Dict:
+    """created_at, defaulting to the current time like the Python path does."""
+    return {'$max': {'$ifNull': ['$created_at', '$$NOW']}}
+
+
+def learning_activity_concepts_pipeline(student_oid) -> List[Dict]:
+    """Quiz and lesson totals grouped by (concept, activity_type)."""
+    return [
+        {'$match': {
+            'user_id': student_oid,
+            'activity_type': {'$in': LEARNING_ACTIVITY_TYPES},
+            '$or': [{'activity_type': 'lesson_complete'}, {'score': {'$ne': None}}]
+        }},
+        {'$project': {
+            '_id': 0,
+            'activity_type': 1,
+            'score': 1,
+            'created_at': 1,
+            'concepts': concepts_expression({'$eq': ['$activity_type', 'quiz_complete']})
+        }},
+        {'$unwind': '$concepts'},
+        {'$group': {
+            '_id': {'concept': '$concepts', 'activity_type': '$activity_type'},
+            'count': {'$sum': 1},
+            'score_sum': {'$sum': '$score'},
+            'scores': {'$push': '$score'},
+            'last_date': _latest_date()
+        }},
+        {'$project': {
+            'count': 1,
+            'score_sum': 1,
+            'last_date': 1,
+            'recent_scores': {'$slice': ['$scores', -config.RECENT_SCORES_LIMIT]}
+        }}
+    ]
+
+
+def engagement_concepts_pipeline(student_oid) -> List[Dict]:
+    """Lesson/assignment engagement totals grouped by concept."""
+    return [
+        {'$match': {'user_id': student_oid, 'activity_type': {'$in': TASK_ACTIVITY_TYPES}}},
+        {'$project': {'_id': 0, 'created_at': 1, 'concepts': concepts_expression(False)}},
+        {'$unwind': '$concepts'},
+        {'$group': {'_id': '$concepts', 'count': {'$sum': 1}, 'last_date': _latest_date()}}
+    ]
+
+
+def content_concepts_pipeline(module_names: List[str]) -> List[Dict]:
+    """Distinct topic/unit/module names from approved structured content."""
+    return [
+        {'$match': {
+            'module_name': {'$in': module_names},
+            'approved': True,
+            'status': {'$in': ['approved', 'published']}
+        }},
+        {'$project': {'_id': 0, 'concepts': {'$concatArrays': [
+            _single('$topic_name'),
+            _single('$unit_name'),
+            _single('$module_name')
+        ]}}},
+        {'$unwind': '$concepts'},
+        {'$group': {'_id': '$concepts'}}
+    ]
+
+
+def quiz_stats_pipeline(match: Dict, cutoff_date: datetime) -> List[Dict]:
+    """Per-student quiz count, score sum, 7-day attempts and last quiz date."""
+    return [
+        {'$match': dict(match, activity_type='quiz_complete', score={'$exists': True, '$ne': None})},
+        {'$group': {
+            '_id': '$user_id',
+            'total_quizzes': {'$sum': 1},
+            'score_sum': {'$sum': '$score'},
+            'recent_attempts': {'$sum': {'$cond': [
+                {'$gte': [{'$ifNull': ['$created_at', '$$NOW']}, cutoff_date]}, 1, 0
+            ]}},
+            'last_quiz_date': {'$max': '$created_at'}
+        }}
+    ]
+
+
+def task_stats_pipeline(match: Dict) -> List[Dict]:
+    """Per-student task count and completed task count."""
+    return [
+        {'$match': dict(match, activity_type={'$in': TASK_ACTIVITY_TYPES})},
+        {'$group': {
+            '_id': '$user_id',
+            'total_tasks': {'$sum': 1},
+            'completed_tasks': {'$sum': {'$cond': [
+                {'$or': [
+                    {'$eq': ['$metadata.status', 'completed']},
+                    {'$gt': ['$points_earned', 0]}
+                ]}, 1, 0
+            ]}}
+        }}
+    ]
+
+
+def stored_mastery_expression(use_bkt: bool) -> Dict:
+    """ConceptMasteryService.build_concept_entry's mastery percentage over a stored concept state."""
+    quiz_mastery = {'$divide': ['$score_sum', '$score_count']}
+    if use_bkt:
+        quiz_mastery = {'$cond': [
+            {'$eq': [{'$ifNull': ['$p_known', None]}, None]},
+            quiz_mastery,
+            {'$multiply': ['$p_known', 100]}
+        ]}
+    return {'$cond': [
+        {'$gt': ['$score_count', 0]},
+        quiz_mastery,
+        {'$min': [50, {'$multiply': [{'$ifNull': ['$engagement_count', 0]}, 10]}]}
+    ]}
+
+
+def weakest_concepts_pipeline(student_oid, threshold: float, skip: int, limit: int, use_bkt: bool) -> List[Dict]:
+    """
+    A page of a student's stored concepts below `threshold` mastery, weakest
+    first, plus the total number of such concepts.
+    
+    The sort is bounded by $limit, so the server keeps only skip + limit
+    documents while scanning.
+    """
+    return [
+        {'$match': {
+            'student_id': student_oid,
+            '$or': [{'score_count': {'$gt': 0}}, {'engagement_count': {'$gt': 0}}, {'has_content': True}]
+        }},
+        {'$addFields': {'mastery': stored_mastery_expression(use_bkt)}},
+        {'$match': {'mastery': {'$lt': threshold}}},
+        {'$facet': {
+            'page': [
+                {'$sort': {'mastery': 1, 'concept_name': 1}},
+                {'$limit': skip + limit},
+                {'$skip': skip}
+            ],
+            'total': [{'$count': 'count'}]
+        }}
+    ]
+
+
+def student_ids_pipeline(after=None, module_names: Optional[List[str]] = None) -> List[Dict]:
+    """
+    Distinct student ids in ascending order, after `after` if given.
+    
+    Without `module_names` this is every student with activity or
+    enrollments (runs on learning_activities and pulls in engagement_logs
+    and enrollments with $unionWith); with it, the students enrolled in
+    those modules (runs on enrollments). Rows are {'_id': student_oid}.
+    """
+    def branch(field: str, match: Dict) -> List[Dict]:
+        if after is not None:
+            match = dict(match, **{field: {'$gt': after}})
+        return [{'$match': match}, {'$group': {'_id': f'${field}'}}]
+    
+    if module_names is not None:
+        stages = branch('student_id', {'module_name': {'$in': module_names}})
+    else:
+        stages = branch('user_id', {}) + [
+            {'$unionWith': {'coll': 'engagement_logs', 'pipeline': branch('user_id', {})}},
+            {'$unionWith': {'coll': 'enrollments', 'pipeline': branch('student_id', {})}},
+            {'$group': {'_id': '$_id'}}
+        ]
+    return stages + [{'$match': {'_id': {'$ne': None}}}, {'$sort': {'_id': 1}}]
+
+
+def verify_parity(student_id: str, db=None) -> List[str]:
+    """Run both query modes for a student and describe any differences."""
+    from .concept_mastery import concept_mastery_service
+    from .learning_pathway import learning_pathway_service
+    
+    results = {}
+    original_mode = config.QUERY_MODE
+    try:
+        for mode in ('python', 'aggregation'):
+            config.QUERY_MODE = mode
+            context = StudentContext(student_id, db)
+            concepts = concept_mastery_service.calculate_concept_mastery(student_id, context)
+            performance = learning_pathway_service.get_student_performance(student_id, context)
+            results[mode] = ({c['concept_name']: c for c in concepts}, performance)
+    finally:
+        config.QUERY_MODE = original_mode
+    
+    differences = []
+    python_concepts, python_performance = results['python']
+    aggregation_concepts, aggregation_performance = results['aggregation']
+    for name in sorted(set(python_concepts) | set(aggregation_concepts)):
+        expected = python_concepts.get(name)
+        actual = aggregation_concepts.get(name)
+        if expected is None or actual is None:
+            differences.append(f'concept {name!r} only in {"aggregation" if expected is None else "python"} mode')
+            continue
+        for field in expected:
+            left, right = expected[field], actual[field]
+            if field == 'sources':
+                left, right = sorted(left), sorted(right)
+            if left != right:
+                differences.append(f'concept {name!r} field {field}: {left!r} != {right!r}')
+    for field in python_performance:
+        if python_performance[field] != aggregation_performance.get(field):
+            differences.append(f'performance {field}: {python_performance[field]!r} != {aggregation_performance.get(field)!r}')
+    return differences
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='ILPG aggregation pipeline tools')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    verify_parser = subparsers.add_parser('verify', help='Compare python and aggregation query modes')
+    verify_parser.add_argument('--student', action='append', dest='students', required=True, help='Student id (repeatable)')
+    args = parser.parse_args(argv)
+    
+    failed = False
+    for student_id in args.students:
+        differences = verify_parity(student_id)
+        for difference in differences:
+            print(f'[Pipelines] {student_id}: {difference}')
+        failed = failed or bool(differences)
+        if not differences:
+            print(f'[Pipelines] {student_id}: python and aggregation modes match')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,259 @@
+"""
+Recompute Job Module.
+
+Offline recomputation of concept mastery, pathway and weak areas for every
+student (or the students given / enrolled in given modules), for nightly
+runs outside the request path. Results are upserted one document per
+student into RECOMPUTE_RESULTS_COLLECTION.
+
+Student ids are streamed from Mongo in ascending order with a cursor and
+cut into contiguous batches (shards of the id range), which a
+ProcessPoolExecutor computes in parallel; each batch is written with one
+bulk upsert. The run document in RECOMPUTE_RUNS_COLLECTION records the
+last student id below which every batch has finished, so a crashed or
+interrupted run resumes from there instead of from zero:
+    python -m L_patgway.recompute_job run [--workers 8] [--module <name> ...] [--student <id> ...]
+    python -m L_patgway.recompute_job run --resume <run_id>
+    python -m L_patgway.recompute_job status [--run <run_id>]
+"""
+
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Iterable
+from bson import ObjectId
+from pymongo import ReplaceOne
+
+import sys
+from pathlib import Path
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from database import get_database
+from . import config, pipelines
+from .indexes import ensure_indexes
+from .metrics import log_error
+from .student_context import StudentContext
+
+
+def recompute_student(student_id: str) -> Dict[str, Any]:
+    """Concept mastery, pathway and weak areas for one student, sharing one context."""
+    from .concept_mastery import concept_mastery_service
+    from .learning_pathway import learning_pathway_service
+    from .roadmap_service import roadmap_service
+    
+    context = StudentContext(student_id)
+    mastery = concept_mastery_service.get_concept_mastery(student_id, context)
+    pathway = learning_pathway_service.determine_pathway(student_id, context)
+    return {
+        'student_id': ObjectId(student_id),
+        'concept_mastery': mastery,
+        'pathway': learning_pathway_service._flatten_pathway(pathway),
+        'weak_areas': roadmap_service.identify_weak_areas(student_id, context),
+        'computed_at': datetime.utcnow()
+    }
+
+
+def recompute_batch(run_id: str, student_ids: List[str]) -> Dict[str, int]:
+    """Worker task: recompute a batch of students and bulk-upsert their results."""
+    db = get_database()
+    operations = []
+    failed = 0
+    for student_id in student_ids:
+        try:
+            result = recompute_student(student_id)
+            result['run_id'] = run_id
+            operations.append(ReplaceOne({'student_id': result['student_id']}, result, upsert=True))
+        except Exception as e:
+            failed += 1
+            log_error('RecomputeJob', f'Error recomputing {student_id}: {e}')
+    if operations:
+        db[config.RECOMPUTE_RESULTS_COLLECTION].bulk_write(operations, ordered=False)
+    return {'processed': len(operations), 'failed': failed}
+
+
+def _init_worker() -> None:
+    # Each student is computed once per run; caching results would only use memory
+    config.RESULT_CACHE_ENABLED = False
+
+
+class RecomputeJob:
+    """Runs and resumes recompute jobs, checkpointing progress in Mongo."""
+    
+    def __init__(self):
+        self._db = None
+    
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = get_database()
+        return self._db
+    
+    @property
+    def runs(self):
+        return self.db[config.RECOMPUTE_RUNS_COLLECTION]
+    
+    def start_run(self, student_ids: Optional[List[str]] = None,
+                  module_names: Optional[List[str]] = None) -> Dict:
+        """Create the run document for a new run."""
+        now = datetime.utcnow()
+        run = {
+            '_id': now.strftime('%Y%m%dT%H%M%S') + '-' + str(ObjectId())[-6:],
+            'status': 'running',
+            'student_ids': student_ids,
+            'module_names': module_names,
+            'checkpoint': None,
+            'processed': 0,
+            'failed': 0,
+            'started_at': now,
+            'updated_at': now,
+            'finished_at': None
+        }
+        self.runs.insert_one(run)
+        return run
+    
+    def resume_run(self, run_id: str) -> Dict:
+        """Reopen an unfinished run; it continues after its checkpoint."""
+        run = self.runs.find_one({'_id': run_id})
+        if run is None:
+            raise ValueError(f'Unknown run: {run_id}')
+        if run['status'] == 'completed':
+            raise ValueError(f'Run {run_id} already completed')
+        self.runs.update_one({'_id': run_id}, {'$set': {'status': 'running', 'updated_at': datetime.utcnow()}})
+        return run
+    
+    def iter_students(self, run: Dict) -> Iterable[str]:
+        """Stream the run's student ids in ascending order, after its checkpoint."""
+        after = run.get('checkpoint')
+        if run.get('student_ids'):
+            student_oids = sorted(ObjectId(student_id) for student_id in run['student_ids'])
+            for student_oid in student_oids:
+                if after is None or student_oid > after:
+                    yield str(student_oid)
+            return
+        
+        collection = self.db.enrollments if run.get('module_names') else self.db.learning_activities
+        cursor = collection.aggregate(
+            pipelines.student_ids_pipeline(after, run.get('module_names')),
+            allowDiskUse=True, batchSize=config.RECOMPUTE_BATCH_SIZE
+        )
+        for row in cursor:
+            yield str(row['_id'])
+    
+    def _batches(self, run: Dict, batch_size: int) -> Iterable[List[str]]:
+        batch = []
+        for student_id in self.iter_students(run):
+            batch.append(student_id)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    
+    def _checkpoint(self, run_id: str, last_student_id: str, counts: Dict[str, int]) -> None:
+        self.runs.update_one({'_id': run_id}, {
+            '$set': {'checkpoint': ObjectId(last_student_id), 'updated_at': datetime.utcnow()},
+            '$inc': counts
+        })
+    
+    def run(self, run: Dict, workers: Optional[int] = None, batch_size: Optional[int] = None) -> Dict:
+        """
+        Recompute every student of the run.
+        
+        At most two batches per worker are in flight, so the id cursor is
+        consumed only as fast as the pool computes. Batches finish out of
+        order; the checkpoint only moves past a batch once every earlier
+        batch has finished too. With `workers` 0 batches run in this process.
+        """
+        workers = config.RECOMPUTE_WORKERS if workers is None else workers
+        batch_size = batch_size or config.RECOMPUTE_BATCH_SIZE
+        run_id = run['_id']
+        
+        # Batch index -> its last student id, until the checkpoint passes it
+        last_ids = {}
+        done = {}
+        next_index = 0
+        
+        def finish(index: int, counts: Dict[str, int]) -> None:
+            nonlocal next_index
+            done[index] = counts
+            while next_index in done:
+                self._checkpoint(run_id, last_ids.pop(next_index), done.pop(next_index))
+                next_index += 1
+        
+        try:
+            if workers <= 0:
+                _init_worker()
+                for index, batch in enumerate(self._batches(run, batch_size)):
+                    last_ids[index] = batch[-1]
+                    finish(index, recompute_batch(run_id, batch))
+            else:
+                with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                         initializer=_init_worker) as executor:
+                    pending = {}
+                    for index, batch in enumerate(self._batches(run, batch_size)):
+                        last_ids[index] = batch[-1]
+                        pending[executor.submit(recompute_batch, run_id, batch)] = index
+                        if len(pending) >= 2 * workers:
+                            completed, _ = wait(pending, return_when=FIRST_COMPLETED)
+                            for future in completed:
+                                finish(pending.pop(future), future.result())
+                    for future in list(pending):
+                        finish(pending.pop(future), future.result())
+        except BaseException as e:
+            self.runs.update_one({'_id': run_id}, {'$set': {
+                'status': 'failed', 'error': str(e) or type(e).__name__, 'updated_at': datetime.utcnow()
+            }})
+            raise
+        
+        now = datetime.utcnow()
+        self.runs.update_one({'_id': run_id}, {'$set': {'status': 'completed', 'finished_at': now, 'updated_at': now}})
+        return self.runs.find_one({'_id': run_id})
+    
+    def latest_run(self) -> Optional[Dict]:
+        return self.runs.find_one(sort=[('started_at', -1)])
+
+
+# Global job instance
+recompute_job = RecomputeJob()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Recompute concept mastery, pathways and weak areas offline')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run_parser = subparsers.add_parser('run', help='Start (or resume) a recompute run')
+    run_parser.add_argument('--student', action='append', dest='students', help='Student id (repeatable)')
+    run_parser.add_argument('--module', action='append', dest='modules', help='Only students enrolled in this module (repeatable)')
+    run_parser.add_argument('--resume', metavar='RUN_ID', help='Continue an interrupted run from its checkpoint')
+    run_parser.add_argument('--workers', type=int, default=config.RECOMPUTE_WORKERS, help='Worker processes (0 = in process)')
+    run_parser.add_argument('--batch-size', type=int, default=config.RECOMPUTE_BATCH_SIZE)
+    status_parser = subparsers.add_parser('status', help='Show a run (default: the latest)')
+    status_parser.add_argument('--run', dest='run_id')
+    args = parser.parse_args(argv)
+    
+    if recompute_job.db is None:
+        print('[RecomputeJob] Database unavailable')
+        return 1
+    
+    if args.command == 'run':
+        ensure_indexes()
+        try:
+            run = recompute_job.resume_run(args.resume) if args.resume else recompute_job.start_run(args.students, args.modules)
+        except ValueError as e:
+            print(f'[RecomputeJob] {e}')
+            return 1
+        print(f"[RecomputeJob] Run {run['_id']} started" + (f" after {run['checkpoint']}" if run.get('checkpoint') else ''))
+        run = recompute_job.run(run, args.workers, args.batch_size)
+        print(f"[RecomputeJob] Run {run['_id']} completed: {run['processed']} students, {run['failed']} failed")
+    elif args.command == 'status':
+        run = recompute_job.runs.find_one({'_id': args.run_id}) if args.run_id else recompute_job.latest_run()
+        if run is None:
+            print('[RecomputeJob] No runs found')
+            return 1
+        for key in ('_id', 'status', 'checkpoint', 'processed', 'failed', 'started_at', 'updated_at', 'finished_at'):
+            print(f'[RecomputeJob] {key}: {run.get(key)}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,351 @@
+"""
+Result Cache Module.
+
+Read-through cache for the per-student results dashboards poll
+(get_concept_mastery, get_student_pathway and get_roadmap). Entries are
+keyed by (kind, student id), bounded by count and approximate memory, and
+expire after ILPG_RESULT_CACHE_TTL seconds.
+
+A student's entries are dropped as soon as their data changes:
+- activity ingestion (ConceptMasteryStore.apply_activities and friends)
+  calls invalidate_students() for the students it touched;
+- ActivityChangeWatcher follows a MongoDB change stream (replica sets) and
+  invalidates students whose activities or enrollments were written by
+  other services. LocalChangeStream stands in for the change stream in
+  tests and single-node development setups.
+
+The watcher also keeps the materialized concept mastery store and the
+performance rollups (when those backends are selected) current with writes
+that did not go through IngestionService. Every worker process runs its
+own watcher (each has its own cache to invalidate), so a change is folded
+into the stores only by the worker that claims it first in
+WATCHER_STATE_COLLECTION; replays after a restart find the claim and are
+skipped too. The last resume token is kept there as well, so a restarted
+watcher continues where the previous one stopped.
+"""
+
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, Callable, Iterable
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+import sys
+from pathlib import Path
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from database import get_database
+from . import config
+from .cache import LRUTTLCache
+from .metrics import count_cache, log_error
+
+
+class StudentResultCache:
+    """Per-student result cache with explicit invalidation."""
+    
+    KINDS = ('concept_mastery', 'pathway', 'roadmap')
+    
+    def __init__(self):
+        self._cache = LRUTTLCache(
+            max_entries=config.RESULT_CACHE_MAX_ENTRIES,
+            ttl_seconds=config.RESULT_CACHE_TTL,
+            max_bytes=config.RESULT_CACHE_MAX_BYTES
+        )
+        self._lock = threading.Lock()
+        self._generations = {}
+        self.invalidations = 0
+    
+    def _generation(self, student_id: str) -> int:
+        with self._lock:
+            return self._generations.get(student_id, 0)
+    
+    def get_or_compute(self, kind: str, student_id: str, compute: Callable[[], Any]) -> Any:
+        """
+        Return the cached result, computing and caching it on a miss.
+        
+        A result is only stored if the student was not invalidated while it
+        was being computed, so a slow computation cannot overwrite fresher
+        data with a stale result. Cached values are shared; do not mutate them.
+        """
+        key = (kind, student_id)
+        cached = self._cache.get(key)
+        if cached is not None:
+            count_cache('result', 'hit', kind)
+            return cached
+        count_cache('result', 'miss', kind)
+        
+        generation = self._generation(student_id)
+        result = compute()
+        if result is not None and self._generation(student_id) == generation:
+            self._cache.set(key, result)
+        return result
+    
+    def invalidate_student(self, student_id: str) -> None:
+        """Drop every cached result for one student."""
+        student_id = str(student_id)
+        with self._lock:
+            self._generations[student_id] = self._generations.get(student_id, 0) + 1
+            self.invalidations += 1
+        for kind in self.KINDS:
+            self._cache.delete((kind, student_id))
+    
+    def invalidate_students(self, student_ids: Iterable) -> None:
+        for student_id in student_ids:
+            self.invalidate_student(student_id)
+    
+    def clear(self) -> None:
+        """Drop everything (e.g. after a structured-content change affecting whole modules)."""
+        with self._lock:
+            for student_id in list(self._generations):
+                self._generations[student_id] += 1
+            self.invalidations += 1
+        self._cache.clear()
+    
+    def stats(self) -> Dict[str, int]:
+        """Counters for monitoring."""
+        return dict(self._cache.stats(), invalidations=self.invalidations)
+
+
+# Global cache instance
+student_result_cache = StudentResultCache()
+
+
+class LocalChangeStream:
+    """
+    In-process stand-in for a MongoDB change stream.
+    
+    publish() queues a change event in the same shape the server sends, so
+    ActivityChangeWatcher can be driven without a replica set.
+    """
+    
+    def __init__(self):
+        self._events = queue.Queue()
+        self.alive = True
+    
+    def publish(self, collection: str, document: Optional[Dict], operation_type: str = 'insert') -> None:
+        self._events.put({
+            'ns': {'coll': collection},
+            'operationType': operation_type,
+            'fullDocument': document,
+            '_id': {'_data': f'local-{time.monotonic_ns()}'}
+        })
+    
+    def try_next(self, timeout: float = 1.0) -> Optional[Dict]:
+        if not self.alive:
+            return None
+        try:
+            return self._events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+    
+    def close(self) -> None:
+        self.alive = False
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ActivityChangeWatcher:
+    """Invalidates cached results from a change stream on the ILPG source collections."""
+    
+    # Collection -> field holding the student id
+    STUDENT_FIELDS = {
+        'learning_activities': 'user_id',
+        'engagement_logs': 'user_id',
+        'enrollments': 'student_id'
+    }
+    
+    # WATCHER_STATE_COLLECTION document holding the last resume token
+    STATE_ID = 'resume_token'
+    # Seconds between resume token saves
+    SAVE_INTERVAL = 1.0
+    # Server errors meaning the resume token is no longer usable
+    # (ChangeStreamHistoryLost, ChangeStreamFatalError)
+    LOST_HISTORY_CODES = (286, 280)
+    
+    def __init__(self, cache: StudentResultCache = None, db=None,
+                 stream_factory: Optional[Callable[[], Any]] = None):
+        self.cache = cache or student_result_cache
+        self._db = db
+        self._stream_factory = stream_factory
+        self._resume_token = None
+        self._token_loaded = False
+        self._token_saved_at = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+    
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = get_database()
+        return self._db
+    
+    @property
+    def state(self):
+        return self.db[config.WATCHER_STATE_COLLECTION]
+    
+    def _load_resume_token(self) -> None:
+        """Pick up the token saved by the previous watcher (any process) once."""
+        if self._token_loaded:
+            return
+        self._token_loaded = True
+        if self._resume_token is None:
+            doc = self.state.find_one({'_id': self.STATE_ID})
+            self._resume_token = doc.get('token') if doc else None
+    
+    def _save_resume_token(self, force: bool = False) -> None:
+        """Persist the resume token (at most every SAVE_INTERVAL seconds unless forced)."""
+        now = time.monotonic()
+        if self._stream_factory is not None or self._resume_token is None or (not force and now - self._token_saved_at < self.SAVE_INTERVAL):
+            return
+        self._token_saved_at = now
+        try:
+            self.state.update_one({'_id': self.STATE_ID}, {'$set': {'token': self._resume_token}}, upsert=True)
+        except Exception as e:
+            log_error('ResultCache', f'Error saving the change stream resume token: {e}')
+    
+    def _claim(self, change: Dict, collection: str, document: Dict) -> bool:
+        """
+        Record that this process folds `change` into the stores. False if
+        another worker (or an earlier run replaying the same event) already did.
+        
+        Inserts are keyed by the activity _id; other changes by their event id.
+        """
+        if change.get('operationType') == 'insert' and document.get('_id') is not None:
+            key = f"{collection}:{document['_id']}"
+        elif change.get('_id') is not None:
+            key = f"event:{change['_id']}"
+        else:
+            return True
+        try:
+            self.state.insert_one({
+                '_id': key,
+                'expires_at': datetime.utcnow() + timedelta(seconds=config.WATCHER_CLAIM_TTL)
+            })
+        except DuplicateKeyError:
+            return False
+        return True
+    
+    def _open_stream(self):
+        if self._stream_factory is not None:
+            return self._stream_factory()
+        self._load_resume_token()
+        pipeline = [{'$match': {
+            'ns.coll': {'$in': list(self.STUDENT_FIELDS) + ['structured_contents']},
+            'operationType': {'$in': ['insert', 'update', 'replace', 'delete']}
+        }}]
+        return self.db.watch(
+            pipeline,
+            full_document='updateLookup',
+            resume_after=self._resume_token,
+            max_await_time_ms=1000
+        )
+    
+    def handle(self, change: Dict) -> None:
+        """Invalidate the cache (and update the materialized stores) for one change event."""
+        collection = change.get('ns', {}).get('coll')
+        document = change.get('fullDocument') or {}
+        field = self.STUDENT_FIELDS.get(collection)
+        
+        if document and (field is not None or collection == 'structured_contents') and self._stores_enabled():
+            if self._claim(change, collection, document):
+                self._update_stores(collection, change.get('operationType'), document)
+        
+        if field is not None and document.get(field) is not None:
+            self.cache.invalidate_student(str(document[field]))
+        elif field is not None or collection == 'structured_contents':
+            # Deletes carry no document and content changes affect whole modules
+            self.cache.clear()
+        self._resume_token = change.get('_id', self._resume_token)
+        self._save_resume_token()
+    
+    def _stores_enabled(self) -> bool:
+        return config.MASTERY_BACKEND == 'materialized' or config.PERFORMANCE_BACKEND == 'rollup'
+    
+    def _update_stores(self, collection: str, operation_type: Optional[str], document: Dict) -> None:
+        """Fold a write made outside IngestionService into the materialized stores."""
+        from .ingestion import INGESTION_SOURCE
+        from .mastery_store import concept_mastery_store
+        from .rollups import performance_rollup_store
+        
+        materialized = config.MASTERY_BACKEND == 'materialized'
+        rollup = config.PERFORMANCE_BACKEND == 'rollup'
+        try:
+            if collection == 'structured_contents':
+                if materialized and document.get('module_name'):
+                    concept_mastery_store.refresh_module(document['module_name'])
+            elif collection == 'enrollments':
+                if materialized:
+                    concept_mastery_store.refresh_content(str(document['student_id']))
+            elif operation_type == 'insert':
+                if document.get('source') == INGESTION_SOURCE:
+                    # ingest_events() has already applied it
+                    return
+                if materialized:
+                    concept_mastery_store.apply_activities(collection, [document])
+                if rollup:
+                    performance_rollup_store.apply_activities(collection, [document])
+            else:
+                # Running totals cannot take back an edited activity's old values
+                student_id = str(document['user_id'])
+                if materialized:
+                    concept_mastery_store.rebuild_student(student_id)
+                if rollup:
+                    performance_rollup_store.rebuild_student(student_id)
+        except Exception as e:
+            log_error('ResultCache', f'Error updating materialized state from {collection}: {e}')
+    
+    def run(self) -> None:
+        """Follow the change stream until stop() is called, reopening it after errors."""
+        while not self._stop.is_set():
+            try:
+                with self._open_stream() as stream:
+                    while not self._stop.is_set() and stream.alive:
+                        change = stream.try_next()
+                        if change is not None:
+                            self.handle(change)
+                # The stream ended (e.g. invalidated); reopen from the resume token
+                self._save_resume_token(force=True)
+                self._stop.wait(1)
+            except OperationFailure as e:
+                log_error('ResultCache', f'Change stream error: {e}')
+                if e.code in self.LOST_HISTORY_CODES:
+                    # Events since the token are gone: start from now and rebuild
+                    # the materialized stores (mastery_store refresh / rollups rebuild)
+                    log_error('ResultCache', 'Change stream history lost; materialized stores need a refresh')
+                    self._resume_token = None
+                self.cache.clear()
+                self._stop.wait(5)
+            except Exception as e:
+                log_error('ResultCache', f'Change stream error: {e}')
+                # Missed events are unknown, so nothing cached can be trusted
+                self.cache.clear()
+                self._stop.wait(5)
+    
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name='ilpg-result-cache-watcher', daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._save_resume_token(force=True)
+
+
+# Global watcher, started by start_watcher_on_startup when ILPG_RESULT_CACHE_WATCH is set
+activity_change_watcher = ActivityChangeWatcher()
+
+
+def start_watcher_on_startup(state=None) -> None:
+    """Blueprint record_once hook: start the change-stream watcher once per process."""
+    materialized = config.MASTERY_BACKEND == 'materialized' or config.PERFORMANCE_BACKEND == 'rollup'
+    if config.RESULT_CACHE_WATCH and (config.RESULT_CACHE_ENABLED or materialized):
+        activity_change_watcher.start()
@@ -1,17 +1,28 @@
 """Roadmap Routes - API endpoints for learning roadmap and mind map"""
 
 from functools import wraps
-from flask import Blueprint, request, jsonify, g
+from flask import Blueprint, Response, request, jsonify, g, stream_with_context
 
 import sys
 from pathlib import Path
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from accounts import account_service, AccountError
+from . import config
 from .roadmap_service import roadmap_service, RoadmapError
 from .concept_mastery import concept_mastery_service
+from .student_context import StudentContext
+from .serialization import json_response, compress_response, sse_event
+from .etag import conditional_student_response, current_student, path_student
+from .metrics import add_server_timing
+from .indexes import ensure_indexes_on_startup
+from .result_cache import start_watcher_on_startup
 
 roadmap_bp = Blueprint('roadmap', __name__, url_prefix='/api/roadmap')
+roadmap_bp.record_once(ensure_indexes_on_startup)
+roadmap_bp.record_once(start_watcher_on_startup)
+roadmap_bp.after_request(add_server_timing)
+roadmap_bp.after_request(compress_response)
 
 def token_required(f):
     @wraps(f)
@@ -28,25 +39,63 @@ def token_required(f):
         return f(*args, **kwargs)
     return decorated
 
+def int_arg(name, default):
+    """An integer query parameter (`default` when absent); anything else is a 400."""
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise RoadmapError(f'{name} must be an integer', 400)
+
 @roadmap_bp.route('/me', methods=['GET'])
 @token_required
+@conditional_student_response(current_student, roadmap_snapshot=True)
 def get_my_roadmap():
     """Get learning roadmap for current user."""
     try:
         result = roadmap_service.get_roadmap(g.user_id)
-        return jsonify(result), 200
+        return json_response(result)
     except RoadmapError as e:
         return jsonify({'error': e.message}), e.status_code
     except Exception as e:
         return jsonify({'error': 'Failed to get roadmap'}), 500
 
+@roadmap_bp.route('/me/stream', methods=['GET'])
+@token_required
+def stream_my_roadmap():
+    """
+    Stream the current user's roadmap as server-sent events: 'roadmap' with
+    the template-based sections first, one 'recommendation' per AI section
+    as it completes, then 'done' (or 'error').
+    """
+    student_id = g.user_id
+    
+    def generate():
+        try:
+            for event, payload in roadmap_service.stream_roadmap(student_id):
+                yield sse_event(event, payload)
+        except RoadmapError as e:
+            yield sse_event('error', {'error': e.message})
+        except Exception as e:
+            yield sse_event('error', {'error': 'Failed to get roadmap'})
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # Keep reverse proxies (nginx) from buffering the stream
+        'X-Accel-Buffering': 'no'
+    })
+
 @roadmap_bp.route('/mindmap', methods=['GET'])
 @token_required
+@conditional_student_response(current_student)
 def get_mindmap():
     """Get mind map data showing weak areas."""
     try:
-        weak_areas = roadmap_service.identify_weak_areas(g.user_id)
-        mastery_data = concept_mastery_service.get_concept_mastery(g.user_id)
+        context = StudentContext(g.user_id)
+        weak_areas = roadmap_service.identify_weak_areas(g.user_id, context)
+        mastery_data = concept_mastery_service.get_concept_mastery(g.user_id, context)
         
         # Organize for mind map visualization
         mindmap_data = {
@@ -59,23 +108,46 @@ def get_mindmap():
             'average_mastery': mastery_data.get('average_mastery', 0)
         }
         
-        return jsonify({
+        return json_response({
             'success': True,
             'data': mindmap_data
-        }), 200
+        })
     except Exception as e:
         return jsonify({'error': 'Failed to get mind map'}), 500
 
+@roadmap_bp.route('/weak-areas', methods=['GET'])
+@token_required
+@conditional_student_response(current_student)
+def get_my_weak_areas():
+    """Get weak areas for current user, weakest first (?limit=&offset=)."""
+    try:
+        limit = int_arg('limit', 20)
+        offset = int_arg('offset', 0)
+        if limit < 1 or limit > config.WEAK_AREAS_MAX_LIMIT or offset < 0:
+            return jsonify({'error': f'limit must be 1-{config.WEAK_AREAS_MAX_LIMIT} and offset non-negative'}), 400
+        
+        result = roadmap_service.get_weak_areas(g.user_id, limit, offset)
+        return json_response({
+            'success': True,
+            'data': result
+        })
+    except RoadmapError as e:
+        return jsonify({'error': e.message}), e.status_code
+    except Exception as e:
+        return jsonify({'error': 'Failed to get weak areas'}), 500
+
 @roadmap_bp.route('/student/<student_id>', methods=['GET'])
 @token_required
+@conditional_student_response(path_student, roadmap_snapshot=True)
 def get_student_roadmap(student_id):
-    """Get roadmap for a specific student (teacher/admin only)."""
+    """Get roadmap for a specific student (teacher/admin only; ?refresh=true regenerates it)."""
     try:
         if g.user_role not in ['teacher', 'admin']:
             return jsonify({'error': 'Access denied'}), 403
         
-        result = roadmap_service.get_roadmap(student_id)
-        return jsonify(result), 200
+        refresh = request.args.get('refresh', '').lower() in ('1', 'true', 'yes')
+        result = roadmap_service.get_roadmap(student_id, refresh=refresh)
+        return json_response(result)
     except RoadmapError as e:
         return jsonify({'error': e.message}), e.status_code
     except Exception as e:
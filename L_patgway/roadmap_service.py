@@ -5,8 +5,15 @@ Generates AI-powered learning roadmaps based on student weaknesses
 and quiz performance. Provides personalized guidance and recommendations.
 """
 
+import hashlib
+import heapq
+import json
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeoutError
 from datetime import datetime
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Callable, Tuple, Iterator
 from bson import ObjectId
 
 import sys
@@ -15,8 +22,45 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from database import get_database
 from ai_service import ai_service
+from . import config
+from .ai_cache import ai_response_cache
 from .concept_mastery import concept_mastery_service
 from .learning_pathway import learning_pathway_service
+from .mastery_store import concept_mastery_store
+from .metrics import timer, timed, log_error, count_cache
+from .result_cache import student_result_cache
+from .student_context import StudentContext, resolve_context
+
+
+# Bounded pool shared by all requests for AI generation calls.
+# A running thread cannot be interrupted, so an AI call still running at the
+# ILPG_AI_CALL_TIMEOUT deadline keeps its worker until the AI client returns.
+# Such calls are counted as hung; while every worker is hung, roadmaps use
+# template text straight away instead of queueing behind them.
+_ai_executor = ThreadPoolExecutor(max_workers=config.AI_MAX_WORKERS, thread_name_prefix='ilpg-ai')
+_hung_ai_calls = 0
+_hung_ai_calls_lock = threading.Lock()
+
+
+def _abandon_ai_call(future) -> None:
+    """Cancel a timed-out AI call, counting it as hung until it returns if it already started."""
+    global _hung_ai_calls
+    if future.cancel():
+        return
+    with _hung_ai_calls_lock:
+        _hung_ai_calls += 1
+    future.add_done_callback(_release_hung_ai_call)
+
+
+def _release_hung_ai_call(future) -> None:
+    global _hung_ai_calls
+    with _hung_ai_calls_lock:
+        _hung_ai_calls -= 1
+
+
+def _ai_pool_saturated() -> bool:
+    """True while every AI worker is busy with a call that outlived its deadline."""
+    return _hung_ai_calls >= config.AI_MAX_WORKERS
 
 
 class RoadmapError(Exception):
@@ -39,7 +83,8 @@ class RoadmapService:
             self._db = get_database()
         return self._db
     
-    def identify_weak_areas(self, student_id: str) -> List[Dict]:
+    @timed('roadmap.identify_weak_areas')
+    def identify_weak_areas(self, student_id: str, context: Optional[StudentContext] = None) -> List[Dict]:
         """
         Identify weak areas from concept mastery data.
         
@@ -48,30 +93,64 @@ class RoadmapService:
         - Or needs_improvement level
         """
         try:
-            mastery_data = concept_mastery_service.get_concept_mastery(student_id)
+            mastery_data = concept_mastery_service.get_concept_mastery(student_id, context)
             
-            weak_areas = []
-            for concept in mastery_data.get('concepts', []):
-                if (concept['mastery_percentage'] < 60 or 
-                    concept['mastery_level'] in ['beginner', 'needs_improvement']):
-                    weak_areas.append({
-                        'concept_name': concept['concept_name'],
-                        'mastery_percentage': concept['mastery_percentage'],
-                        'mastery_level': concept['mastery_level'],
-                        'total_attempts': concept.get('total_attempts', 0),
-                        'recent_scores': concept.get('recent_scores', []),
-                        'priority': 'high' if concept['mastery_percentage'] < 40 else 'medium'
-                    })
+            weak_areas = [self._weak_area(c) for c in mastery_data.get('concepts', []) if self._is_weak(c)]
             
             # Sort by mastery percentage (lowest first - most weak)
             weak_areas.sort(key=lambda x: x['mastery_percentage'])
             
             return weak_areas
         except Exception as e:
-            print(f'[Roadmap] Error identifying weak areas: {e}')
+            log_error('Roadmap', f'Error identifying weak areas: {e}')
             return []
     
-    def generate_roadmap_guidance(self, student_id: str) -> Dict:
+    def _is_weak(self, concept: Dict) -> bool:
+        return concept['mastery_percentage'] < 60 or concept['mastery_level'] in ['beginner', 'needs_improvement']
+    
+    def _weak_area(self, concept: Dict) -> Dict:
+        return {
+            'concept_name': concept['concept_name'],
+            'mastery_percentage': concept['mastery_percentage'],
+            'mastery_level': concept['mastery_level'],
+            'total_attempts': concept.get('total_attempts', 0),
+            'recent_scores': concept.get('recent_scores', []),
+            'priority': 'high' if concept['mastery_percentage'] < 40 else 'medium'
+        }
+    
+    @timed('roadmap.get_weak_areas')
+    def get_weak_areas(self, student_id: str, limit: int, offset: int = 0,
+                       context: Optional[StudentContext] = None) -> Dict:
+        """
+        A page of weak areas, weakest first, without sorting every concept.
+        
+        The materialized backend selects the page with a bounded $sort/$limit
+        on the stored states; otherwise the page is picked from the computed
+        concept list with a heap. Returns the page and the total weak count.
+        """
+        try:
+            if config.MASTERY_BACKEND == 'materialized':
+                context = resolve_context(student_id, context, self.db)
+                states, total = context.load(
+                    f'weak_areas:{offset}:{limit}',
+                    lambda: concept_mastery_store.load_weakest_states(student_id, 60, offset, limit)
+                )
+                weak_areas = [self._weak_area(concept_mastery_service.build_concept_entry(state)) for state in states]
+            else:
+                mastery_data = concept_mastery_service.get_concept_mastery(student_id, context)
+                weak = [c for c in mastery_data.get('concepts', []) if self._is_weak(c)]
+                total = len(weak)
+                selected = heapq.nsmallest(offset + limit, weak, key=lambda c: c['mastery_percentage'])
+                weak_areas = [self._weak_area(c) for c in selected[offset:]]
+            
+            return {'weak_areas': weak_areas, 'total': total, 'limit': limit, 'offset': offset}
+        except Exception as e:
+            log_error('Roadmap', f'Error identifying weak areas: {e}')
+            return {'weak_areas': [], 'total': 0, 'limit': limit, 'offset': offset}
+    
+    @timed('roadmap.generate_roadmap_guidance')
+    def generate_roadmap_guidance(self, student_id: str, context: Optional[StudentContext] = None,
+                                  previous: Optional[Dict] = None) -> Dict:
         """
         Generate AI-powered roadmap guidance based on weaknesses.
         
@@ -80,34 +159,107 @@ class RoadmapService:
         - Study plan structure
         - Practice recommendations
         - Timeline suggestions
+        
+        With a `previous` roadmap (e.g. the last snapshot), recommendations
+        whose inputs have not changed keep their AI text, so only the changed
+        sections are sent to the model.
         """
         try:
-            # Get weak areas
-            weak_areas = self.identify_weak_areas(student_id)
+            inputs = self._roadmap_inputs(student_id, context)
+            recommendations, fingerprints = self._generate_recommendations(
+                inputs['weak_areas'], inputs['performance'], inputs['pathway'], inputs['weak_total'], previous
+            )
             
+            roadmap = self._roadmap_structure(student_id, inputs, recommendations)
+            roadmap['section_fingerprints'] = fingerprints
+            return roadmap
+        except Exception as e:
+            log_error('Roadmap', f'Error generating roadmap: {e}')
+            raise RoadmapError(f'Failed to generate roadmap: {str(e)}', 500)
+    
+    def _roadmap_inputs(self, student_id: str, context: Optional[StudentContext]) -> Dict:
+        """Weak areas, pathway and performance a roadmap is built from."""
+        # Share one set of reads across the mastery and pathway services
+        context = resolve_context(student_id, context, self.db)
+        
+        # Get weak areas (the roadmap keeps the full list; only /weak-areas is paged)
+        weak_areas = self.identify_weak_areas(student_id, context)
+        
+        return {
+            'weak_areas': weak_areas,
+            'weak_total': len(weak_areas),
             # Get pathway info
-            pathway = learning_pathway_service.determine_pathway(student_id)
-            
+            'pathway': learning_pathway_service.determine_pathway(student_id, context),
             # Get performance data
-            performance = learning_pathway_service.get_student_performance(student_id)
-            
-            # Generate roadmap structure
-            roadmap = {
-                'student_id': student_id,
-                'pathway_type': pathway['pathway_type'],
-                'generated_at': datetime.utcnow().isoformat(),
-                'weak_areas': weak_areas,
-                'focus_areas': weak_areas[:5],  # Top 5 weak areas
-                'study_plan': self._generate_study_plan(weak_areas, pathway),
-                'recommendations': self._generate_recommendations(weak_areas, performance, pathway),
-                'timeline': self._generate_timeline(weak_areas, pathway),
-                'practice_schedule': self._generate_practice_schedule(weak_areas)
-            }
-            
-            return roadmap
+            'performance': learning_pathway_service.get_student_performance(student_id, context)
+        }
+    
+    def _roadmap_structure(self, student_id: str, inputs: Dict, recommendations: List[Dict]) -> Dict:
+        """The roadmap with the given recommendations; every other section is template-based."""
+        weak_areas = inputs['weak_areas']
+        pathway = inputs['pathway']
+        return {
+            'student_id': student_id,
+            'pathway_type': pathway['pathway_type'],
+            'generated_at': datetime.utcnow().isoformat(),
+            'weak_areas': weak_areas,
+            'focus_areas': weak_areas[:5],  # Top 5 weak areas
+            'study_plan': self._generate_study_plan(weak_areas, pathway),
+            'recommendations': recommendations,
+            'timeline': self._generate_timeline(weak_areas, pathway),
+            'practice_schedule': self._generate_practice_schedule(weak_areas)
+        }
+    
+    def stream_roadmap_guidance(self, student_id: str,
+                                context: Optional[StudentContext] = None) -> Iterator[Tuple[str, Dict]]:
+        """
+        Generate a roadmap as a sequence of (event, payload) pairs.
+        
+        'roadmap' comes first, as soon as the database reads are done: every
+        template-based section, an empty `recommendations` list and the
+        `pending_recommendations` keys. Each 'recommendation' follows as its
+        AI calls finish (with its `index` in the full list; template text if
+        a call failed or timed out), then 'done'.
+        """
+        try:
+            inputs = self._roadmap_inputs(student_id, context)
+            weak_areas, weak_total = inputs['weak_areas'], inputs['weak_total']
+            performance, pathway = inputs['performance'], inputs['pathway']
+            sections = self._build_recommendation_sections(weak_areas, performance, pathway, weak_total)
         except Exception as e:
-            print(f'[Roadmap] Error generating roadmap: {e}')
+            log_error('Roadmap', f'Error generating roadmap: {e}')
             raise RoadmapError(f'Failed to generate roadmap: {str(e)}', 500)
+        
+        roadmap = self._roadmap_structure(student_id, inputs, [])
+        roadmap['pending_recommendations'] = [section['key'] for section in sections]
+        yield 'roadmap', roadmap
+        
+        if config.ROADMAP_AI_MODE == 'batched':
+            # One call answers every section; they are sent together once it returns
+            results = self._run_batched_ai_call(sections, weak_areas, performance, pathway, weak_total)
+            for index, section in enumerate(sections):
+                yield 'recommendation', {'index': index, 'recommendation': self._finish_section(section, results)}
+        else:
+            calls = {}
+            # AI call key -> index of the section it belongs to
+            owners = {}
+            for index, section in enumerate(sections):
+                calls[section['key']] = self._recommendation_call(section['prompt'])
+                owners[section['key']] = index
+                if section.get('action_items_request'):
+                    calls[f"{section['key']}_actions"] = self._action_items_call(section['action_items_request'])
+                    owners[f"{section['key']}_actions"] = index
+            
+            results = {}
+            outstanding = Counter(owners.values())
+            for key, result in self._iter_ai_calls(calls):
+                results[key] = result
+                index = owners[key]
+                outstanding[index] -= 1
+                if not outstanding[index]:
+                    yield 'recommendation', {'index': index, 'recommendation': self._finish_section(sections[index], results)}
+        
+        yield 'done', {'recommendations': len(sections)}
     
     def _generate_study_plan(self, weak_areas: List[Dict], pathway: Dict) -> List[Dict]:
         """Generate structured study plan."""
@@ -128,9 +280,248 @@ class RoadmapService:
         
         return study_plan
     
-    def _generate_recommendations(self, weak_areas: List[Dict], performance: Dict, pathway: Dict) -> List[Dict]:
-        """Generate AI-powered personalized recommendations using AI model."""
-        recommendations = []
+    def _generate_recommendations(self, weak_areas: List[Dict], performance: Dict, pathway: Dict,
+                                  weak_total: Optional[int] = None,
+                                  previous: Optional[Dict] = None) -> Tuple[List[Dict], Dict[str, str]]:
+        """
+        Generate AI-powered personalized recommendations using AI model.
+        
+        The prompts are independent, so they are sent to the AI service
+        concurrently; each one falls back to its template text if it fails
+        or does not answer within ILPG_AI_CALL_TIMEOUT seconds.
+        
+        Sections whose input fingerprint matches the `previous` roadmap reuse
+        its AI text. Returns the recommendations and the fingerprints of the
+        sections that have AI text (template fallbacks are retried next time).
+        """
+        weak_total = len(weak_areas) if weak_total is None else weak_total
+        sections = self._build_recommendation_sections(weak_areas, performance, pathway, weak_total)
+        fingerprints = {section['key']: self._section_fingerprint(section) for section in sections}
+        
+        results = {}
+        reused = set()
+        if previous and config.ROADMAP_INCREMENTAL:
+            previous_fingerprints = previous.get('section_fingerprints') or {}
+            previous_sections = {r['type']: r for r in previous.get('recommendations', [])}
+            for section in sections:
+                key = section['key']
+                if key in previous_sections and previous_fingerprints.get(key) == fingerprints[key]:
+                    results[key] = previous_sections[key]['description']
+                    if section.get('action_items_request'):
+                        results[f'{key}_actions'] = previous_sections[key]['action_items']
+                    reused.add(key)
+        pending = [section for section in sections if section['key'] not in reused]
+        for section in sections:
+            count_cache('roadmap_section', 'reused' if section['key'] in reused else 'generated', section['key'])
+        
+        if pending and config.ROADMAP_AI_MODE == 'batched':
+            results.update(self._run_batched_ai_call(pending, weak_areas, performance, pathway, weak_total))
+        elif pending:
+            calls = {}
+            for section in pending:
+                calls[section['key']] = self._recommendation_call(section['prompt'])
+                if section.get('action_items_request'):
+                    calls[f"{section['key']}_actions"] = self._action_items_call(section['action_items_request'])
+            results.update(self._run_ai_calls(calls))
+        
+        with_ai_text = {}
+        for section in sections:
+            key = section['key']
+            if results.get(key) and (results.get(f'{key}_actions') or not section.get('action_items_request')):
+                with_ai_text[key] = fingerprints[key]
+        return [self._finish_section(section, results) for section in sections], with_ai_text
+    
+    def _section_fingerprint(self, section: Dict) -> str:
+        """Hash of what a recommendation's AI text depends on (its `inputs`) and the AI mode."""
+        raw = json.dumps([section['key'], section['inputs'], config.ROADMAP_AI_MODE], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+    
+    def _section_bucket(self, percentage: float) -> float:
+        """Round a percentage in a section's inputs to ILPG_ROADMAP_SECTION_BUCKET steps."""
+        step = config.ROADMAP_SECTION_BUCKET
+        if not step:
+            return percentage
+        return round(percentage / step) * step
+    
+    def _build_batched_prompt(self, sections: List[Dict], weak_areas: List[Dict], performance: Dict, pathway: Dict,
+                              weak_total: int) -> str:
+        """One prompt covering every section, with the student context stated once."""
+        weak_lines = '\n'.join(
+            f"- {area['concept_name']}: {self._bucket(area['mastery_percentage']):.1f}% mastery"
+            for area in weak_areas[:5]
+        ) or '- None'
+        section_lines = '\n'.join(f'"{section["key"]}": {section["instruction"]}' for section in sections)
+        keys = ', '.join(f'"{section["key"]}"' for section in sections)
+        
+        return f"""Write personalized learning recommendations for a student.
+
+Student Context:
+- Learning pathway: {pathway.get('pathway_type', 'balanced')}
+- Quizzes completed: {performance.get('total_quizzes', 0)}
+- Average quiz score: {self._bucket(performance.get('average_score', 0)):.1f}%
+- Task completion rate: {self._bucket(performance.get('task_completion_rate', 0) * 100):.0f}%
+- Completed tasks: {performance.get('completed_tasks', 0)} / {performance.get('total_tasks', 0)}
+- Number of weak areas: {weak_total}
+- Weakest concepts:
+{weak_lines}
+
+Sections to write:
+{section_lines}
+
+Respond with only a JSON object with the keys {keys}. Each value is an object with a "description" string; "focus" also has an "action_items" array of strings.
+Be encouraging, specific, and actionable. Write in second person."""
+    
+    def _run_batched_ai_call(self, sections: List[Dict], weak_areas: List[Dict], performance: Dict, pathway: Dict,
+                             weak_total: int) -> Dict[str, Any]:
+        """Generate every section with a single AI call; unparseable sections map to None."""
+        prompt = self._build_batched_prompt(sections, weak_areas, performance, pathway, weak_total)
+        max_tokens = config.AI_BATCH_MAX_TOKENS
+        call = lambda: ai_response_cache.get_or_generate(
+            'roadmap_batch',
+            {'prompt': prompt, 'max_tokens': max_tokens},
+            lambda: ai_service.generate_recommendation(prompt, max_tokens=max_tokens)
+        )
+        parsed = self._parse_batched_response(self._run_ai_calls({'batch': call}).get('batch'))
+        
+        results = {}
+        for section in sections:
+            entry = parsed.get(section['key'])
+            if not isinstance(entry, dict):
+                continue
+            description = entry.get('description')
+            if isinstance(description, str) and description.strip():
+                results[section['key']] = description.strip()
+            action_items = entry.get('action_items')
+            if isinstance(action_items, list):
+                action_items = [item.strip() for item in action_items if isinstance(item, str) and item.strip()]
+                if action_items:
+                    results[f"{section['key']}_actions"] = action_items
+        return results
+    
+    def _parse_batched_response(self, text: Optional[str]) -> Dict:
+        """Extract the JSON object from a model response (tolerates code fences and prose)."""
+        if not text:
+            return {}
+        start = text.find('{')
+        end = text.rfind('}')
+        if start == -1 or end <= start:
+            log_error('Roadmap', 'Batched AI response contained no JSON object')
+            return {}
+        try:
+            parsed = json.loads(text[start:end + 1])
+        except ValueError as e:
+            log_error('Roadmap', f'Could not parse batched AI response: {e}')
+            return {}
+        return parsed if isinstance(parsed, dict) else {}
+    
+    def _recommendation_call(self, prompt: str) -> Callable[[], Optional[str]]:
+        """Cached AI call producing a recommendation description."""
+        return lambda: ai_response_cache.get_or_generate(
+            'recommendation',
+            {'prompt': prompt, 'max_tokens': 200},
+            lambda: ai_service.generate_recommendation(prompt, max_tokens=200)
+        )
+    
+    def _action_items_call(self, request: Dict) -> Callable[[], Optional[List[str]]]:
+        """Cached AI call producing action items for a concept."""
+        return lambda: ai_response_cache.get_or_generate(
+            'action_items',
+            request,
+            lambda: ai_service.generate_action_items(**request)
+        )
+    
+    def _bucket(self, percentage: float) -> float:
+        """Round a percentage used in an AI prompt to ILPG_AI_PROMPT_BUCKET steps."""
+        step = config.AI_PROMPT_BUCKET
+        if not step:
+            return percentage
+        return round(percentage / step) * step
+    
+    def _run_ai_calls(self, calls: Dict[str, Callable[[], Any]]) -> Dict[str, Any]:
+        """
+        Run AI calls concurrently on the shared AI thread pool.
+        
+        Every call gets the same deadline, so the total wait is bounded by the
+        slowest call (or the timeout) rather than the sum of all calls. Calls
+        that fail or time out map to None, as do all calls while the pool is
+        saturated with hung calls.
+        """
+        if _ai_pool_saturated():
+            log_error('Roadmap', f'All {config.AI_MAX_WORKERS} AI workers are busy with timed-out calls; using template text')
+            return {key: None for key in calls}
+        futures = {key: _ai_executor.submit(call) for key, call in calls.items()}
+        deadline = time.monotonic() + config.AI_CALL_TIMEOUT
+        
+        results = {}
+        # Time spent waiting on the pool (the calls themselves are timed per kind by the AI cache)
+        with timer('service', 'roadmap.ai_calls'):
+            for key, future in futures.items():
+                try:
+                    results[key] = future.result(timeout=max(0, deadline - time.monotonic()))
+                except FutureTimeoutError:
+                    _abandon_ai_call(future)
+                    log_error('Roadmap', f'AI call {key} timed out after {config.AI_CALL_TIMEOUT}s')
+                    results[key] = None
+                except Exception as e:
+                    log_error('Roadmap', f'AI call {key} failed: {e}')
+                    results[key] = None
+        return results
+    
+    def _iter_ai_calls(self, calls: Dict[str, Callable[[], Any]]) -> Iterator[Tuple[str, Any]]:
+        """
+        Run AI calls on the shared AI thread pool, yielding (key, result) in
+        completion order. Calls that fail map to None; calls still running at
+        the ILPG_AI_CALL_TIMEOUT deadline are cancelled and yield None, as do
+        all calls while the pool is saturated with hung calls.
+        """
+        if _ai_pool_saturated():
+            log_error('Roadmap', f'All {config.AI_MAX_WORKERS} AI workers are busy with timed-out calls; using template text')
+            for key in calls:
+                yield key, None
+            return
+        futures = {_ai_executor.submit(call): key for key, call in calls.items()}
+        try:
+            for future in as_completed(list(futures), timeout=config.AI_CALL_TIMEOUT):
+                key = futures.pop(future)
+                try:
+                    yield key, future.result()
+                except Exception as e:
+                    log_error('Roadmap', f'AI call {key} failed: {e}')
+                    yield key, None
+        except FutureTimeoutError:
+            for future, key in list(futures.items()):
+                _abandon_ai_call(future)
+                log_error('Roadmap', f'AI call {key} timed out after {config.AI_CALL_TIMEOUT}s')
+                yield key, None
+    
+    def _finish_section(self, section: Dict, results: Dict[str, Any]) -> Dict:
+        """Fill a recommendation from AI results, using template text for anything missing."""
+        static = section['recommendation']
+        action_items = static.get('action_items', [])
+        if section.get('action_items_request'):
+            action_items = results.get(f"{section['key']}_actions") or section['action_items_fallback']
+        
+        return {
+            'type': static['type'],
+            'title': static['title'],
+            'description': results.get(section['key']) or section['fallback'],
+            'priority': static['priority'],
+            'action_items': action_items
+        }
+    
+    def _build_recommendation_sections(self, weak_areas: List[Dict], performance: Dict, pathway: Dict,
+                                       weak_total: int) -> List[Dict]:
+        """
+        Build the prompt, template fallback and static fields for each recommendation.
+        
+        Section keys: focus, strategy, practice, pathway, engagement. `inputs`
+        holds every value the section's prompt, instruction, action-item
+        request and fallback read, for _section_fingerprint; percentages are
+        in ROADMAP_SECTION_BUCKET steps and the fallback's thresholds are
+        recorded as a band, so a reused section is never more than one bucket
+        out of date.
+        """
+        sections = []
         
         # Recommendation 1: Focus on weakest areas (AI-generated using pre-trained model)
         if weak_areas:
@@ -142,53 +533,63 @@ class RoadmapService:
             ai_prompt = f"""Provide a personalized learning recommendation for a student working on the concept "{weakest['concept_name']}".
 
 Student Performance:
-- Current mastery: {mastery:.1f}%
+- Current mastery: {self._bucket(mastery):.1f}%
 - Learning pathway: {pathway_type}
 - Total quiz attempts: {performance.get('total_quizzes', 0)}
-- Average quiz score: {performance.get('average_score', 0):.1f}%
+- Average quiz score: {self._bucket(performance.get('average_score', 0)):.1f}%
 
 Provide a 2-3 sentence encouraging, specific recommendation that:
-1. Acknowledges their current mastery level ({mastery:.1f}%)
+1. Acknowledges their current mastery level ({self._bucket(mastery):.1f}%)
 2. Explains what this means for their learning
 3. Gives clear guidance on how to improve
 
 Be encouraging, specific, and actionable. Write in second person ("Your mastery is...")."""
 
-            # Try AI generation, fallback to template if it fails
-            description = ai_service.generate_recommendation(ai_prompt, max_tokens=200)
-            if not description:
-                # Fallback to template-based
-                if mastery < 30:
-                    description = f"Your current mastery in {weakest['concept_name']} is {mastery:.1f}%, indicating significant gaps in understanding. I recommend starting from the absolute basics and building a solid foundation. Focus on understanding core principles before attempting complex problems."
-                elif mastery < 50:
-                    description = f"Your mastery in {weakest['concept_name']} is {mastery:.1f}%, showing you have some understanding but need reinforcement. Focus on strengthening your grasp of fundamental concepts and their applications."
-                else:
-                    description = f"Your mastery in {weakest['concept_name']} is {mastery:.1f}%, which is approaching proficiency. With focused practice, you can reach mastery level. Concentrate on application and problem-solving."
-            
-            # Generate AI-powered action items
-            action_items = ai_service.generate_action_items(
-                concept_name=weakest['concept_name'],
-                mastery_percentage=mastery,
-                pathway_type=pathway_type,
-                max_items=5
-            )
+            # Template-based fallback
+            band = 'foundation' if mastery < 30 else 'reinforcement' if mastery < 50 else 'proficiency'
+            if band == 'foundation':
+                description = f"Your current mastery in {weakest['concept_name']} is {mastery:.1f}%, indicating significant gaps in understanding. I recommend starting from the absolute basics and building a solid foundation. Focus on understanding core principles before attempting complex problems."
+            elif band == 'reinforcement':
+                description = f"Your mastery in {weakest['concept_name']} is {mastery:.1f}%, showing you have some understanding but need reinforcement. Focus on strengthening your grasp of fundamental concepts and their applications."
+            else:
+                description = f"Your mastery in {weakest['concept_name']} is {mastery:.1f}%, which is approaching proficiency. With focused practice, you can reach mastery level. Concentrate on application and problem-solving."
             
-            recommendations.append({
-                'type': 'focus',
-                'title': f'Priority Focus: Master {weakest["concept_name"]}',
-                'description': description,
-                'priority': 'high' if mastery < 40 else 'medium',
-                'action_items': action_items
+            sections.append({
+                'key': 'focus',
+                'prompt': ai_prompt,
+                'inputs': {
+                    'concept_name': weakest['concept_name'],
+                    'mastery': self._section_bucket(mastery),
+                    'band': band,
+                    'pathway_type': pathway_type,
+                    'total_quizzes': performance.get('total_quizzes', 0),
+                    'average_score': self._section_bucket(performance.get('average_score', 0))
+                },
+                'instruction': f'2-3 encouraging, specific sentences on improving "{weakest["concept_name"]}" (current mastery {self._bucket(mastery):.1f}%), plus up to 5 short action items.',
+                'fallback': description,
+                # AI-powered action items
+                'action_items_request': {
+                    'concept_name': weakest['concept_name'],
+                    'mastery_percentage': self._bucket(mastery),
+                    'pathway_type': pathway_type,
+                    'max_items': 5
+                },
+                'action_items_fallback': self._get_activities_for_concept(weakest, pathway),
+                'recommendation': {
+                    'type': 'focus',
+                    'title': f'Priority Focus: Master {weakest["concept_name"]}',
+                    'priority': 'high' if mastery < 40 else 'medium'
+                }
             })
         
         # Recommendation 2: Multiple weak areas strategy (AI-generated)
-        if len(weak_areas) >= 3:
-            ai_prompt = f"""Provide a learning strategy recommendation for a student with {len(weak_areas)} weak areas that need improvement.
+        if weak_total >= 3:
+            ai_prompt = f"""Provide a learning strategy recommendation for a student with {weak_total} weak areas that need improvement.
 
 Context:
-- Number of weak areas: {len(weak_areas)}
+- Number of weak areas: {weak_total}
 - Learning pathway: {pathway.get('pathway_type', 'balanced')}
-- Average mastery across weak areas: {sum(w['mastery_percentage'] for w in weak_areas[:5]) / min(5, len(weak_areas)):.1f}%
+- Average mastery across weak areas: {self._bucket(sum(w['mastery_percentage'] for w in weak_areas[:5]) / min(5, len(weak_areas))):.1f}%
 
 Provide a 2-3 sentence strategy recommendation that:
 1. Acknowledges the number of areas needing work
@@ -198,22 +599,28 @@ Provide a 2-3 sentence strategy recommendation that:
 
 Write in second person. Be specific and actionable."""
 
-            description = ai_service.generate_recommendation(ai_prompt, max_tokens=200)
-            if not description:
-                description = f'You have {len(weak_areas)} areas needing improvement. I recommend a structured approach: focus on 2 concepts per week, dedicating focused time to each. This prevents overwhelm while ensuring steady progress.'
-            
-            recommendations.append({
-                'type': 'strategy',
-                'title': 'Multi-Concept Learning Strategy',
-                'description': description,
-                'priority': 'high',
-                'action_items': [
-                    'Follow the weekly study plan provided below',
-                    'Dedicate specific time blocks for each weak area',
-                    'Track your progress weekly',
-                    'Celebrate small improvements',
-                    'Don\'t rush - mastery takes time'
-                ]
+            sections.append({
+                'key': 'strategy',
+                'prompt': ai_prompt,
+                'inputs': {
+                    'weak_total': weak_total,
+                    'pathway_type': pathway.get('pathway_type', 'balanced'),
+                    'weak_mastery': self._section_bucket(sum(w['mastery_percentage'] for w in weak_areas[:5]) / min(5, len(weak_areas)))
+                },
+                'instruction': 'A 2-3 sentence structured strategy for working through all the weak areas (e.g., 2 concepts per week) and why it works.',
+                'fallback': f'You have {weak_total} areas needing improvement. I recommend a structured approach: focus on 2 concepts per week, dedicating focused time to each. This prevents overwhelm while ensuring steady progress.',
+                'recommendation': {
+                    'type': 'strategy',
+                    'title': 'Multi-Concept Learning Strategy',
+                    'priority': 'high',
+                    'action_items': [
+                        'Follow the weekly study plan provided below',
+                        'Dedicate specific time blocks for each weak area',
+                        'Track your progress weekly',
+                        'Celebrate small improvements',
+                        'Don\'t rush - mastery takes time'
+                    ]
+                }
             })
         
         # Recommendation 3: Practice frequency (AI-generated)
@@ -225,7 +632,7 @@ Write in second person. Be specific and actionable."""
 
 Context:
 - Quizzes completed: {quiz_count}
-- Average score: {avg_score:.1f}%
+- Average score: {self._bucket(avg_score):.1f}%
 - Learning pathway: {pathway.get('pathway_type', 'balanced')}
 
 Provide a 2-3 sentence recommendation that:
@@ -236,29 +643,36 @@ Provide a 2-3 sentence recommendation that:
 
 Write in second person. Be specific."""
 
-            description = ai_service.generate_recommendation(ai_prompt, max_tokens=200)
-            if not description:
-                description = f'You\'ve completed {quiz_count} quiz{"es" if quiz_count != 1 else ""}. Regular assessment is crucial for identifying knowledge gaps. I recommend taking at least 2-3 quizzes per week to track your progress effectively.'
-            
-            recommendations.append({
-                'type': 'practice',
-                'title': 'Build Consistent Practice Habits',
-                'description': description,
-                'priority': 'high',
-                'action_items': [
-                    'Schedule quiz time in your weekly calendar',
-                    'Take quizzes after reviewing each concept',
-                    'Analyze results to identify patterns',
-                    'Focus on improving weak areas identified in quizzes',
-                    'Review incorrect answers thoroughly'
-                ]
+            sections.append({
+                'key': 'practice',
+                'prompt': ai_prompt,
+                'inputs': {
+                    'variant': 'habits',
+                    'quiz_count': quiz_count,
+                    'average_score': self._section_bucket(avg_score),
+                    'pathway_type': pathway.get('pathway_type', 'balanced')
+                },
+                'instruction': 'A 2-3 sentence recommendation on building a regular quiz habit, with a specific frequency (e.g., 2-3 quizzes per week).',
+                'fallback': f'You\'ve completed {quiz_count} quiz{"es" if quiz_count != 1 else ""}. Regular assessment is crucial for identifying knowledge gaps. I recommend taking at least 2-3 quizzes per week to track your progress effectively.',
+                'recommendation': {
+                    'type': 'practice',
+                    'title': 'Build Consistent Practice Habits',
+                    'priority': 'high',
+                    'action_items': [
+                        'Schedule quiz time in your weekly calendar',
+                        'Take quizzes after reviewing each concept',
+                        'Analyze results to identify patterns',
+                        'Focus on improving weak areas identified in quizzes',
+                        'Review incorrect answers thoroughly'
+                    ]
+                }
             })
         elif quiz_count < 10 and avg_score < 70:
-            ai_prompt = f"""Provide a quiz improvement recommendation for a student with {quiz_count} quizzes completed and an average score of {avg_score:.1f}%.
+            ai_prompt = f"""Provide a quiz improvement recommendation for a student with {quiz_count} quizzes completed and an average score of {self._bucket(avg_score):.1f}%.
 
 Context:
 - Quizzes completed: {quiz_count}
-- Average score: {avg_score:.1f}%
+- Average score: {self._bucket(avg_score):.1f}%
 - Learning pathway: {pathway.get('pathway_type', 'balanced')}
 
 Provide a 2-3 sentence recommendation that:
@@ -269,22 +683,29 @@ Provide a 2-3 sentence recommendation that:
 
 Write in second person. Be encouraging and specific."""
 
-            description = ai_service.generate_recommendation(ai_prompt, max_tokens=200)
-            if not description:
-                description = f'With {quiz_count} quizzes completed and an average score of {avg_score:.1f}%, there\'s room for improvement. Focus on understanding why answers are correct or incorrect, not just memorizing.'
-            
-            recommendations.append({
-                'type': 'practice',
-                'title': 'Enhance Quiz Performance',
-                'description': description,
-                'priority': 'medium',
-                'action_items': [
-                    'Review quiz explanations carefully',
-                    'Identify common mistake patterns',
-                    'Practice similar problems before next quiz',
-                    'Take time to understand concepts deeply',
-                    'Use quizzes as learning tools, not just assessments'
-                ]
+            sections.append({
+                'key': 'practice',
+                'prompt': ai_prompt,
+                'inputs': {
+                    'variant': 'performance',
+                    'quiz_count': quiz_count,
+                    'average_score': self._section_bucket(avg_score),
+                    'pathway_type': pathway.get('pathway_type', 'balanced')
+                },
+                'instruction': 'A 2-3 sentence recommendation for improving quiz performance, emphasizing understanding over memorization.',
+                'fallback': f'With {quiz_count} quizzes completed and an average score of {avg_score:.1f}%, there\'s room for improvement. Focus on understanding why answers are correct or incorrect, not just memorizing.',
+                'recommendation': {
+                    'type': 'practice',
+                    'title': 'Enhance Quiz Performance',
+                    'priority': 'medium',
+                    'action_items': [
+                        'Review quiz explanations carefully',
+                        'Identify common mistake patterns',
+                        'Practice similar problems before next quiz',
+                        'Take time to understand concepts deeply',
+                        'Use quizzes as learning tools, not just assessments'
+                    ]
+                }
             })
         
         # Recommendation 4: Pathway-specific AI guidance
@@ -296,9 +717,9 @@ Write in second person. Be encouraging and specific."""
 
 Student Context:
 - Learning pathway: {pathway_type}
-- Average quiz score: {avg_score:.1f}%
-- Task completion rate: {task_completion*100:.0f}%
-- Number of weak areas: {len(weak_areas)}
+- Average quiz score: {self._bucket(avg_score):.1f}%
+- Task completion rate: {self._bucket(task_completion*100):.0f}%
+- Number of weak areas: {weak_total}
 
 Provide a 2-3 sentence recommendation that:
 1. Explains what the {pathway_type} pathway means for them
@@ -308,15 +729,13 @@ Provide a 2-3 sentence recommendation that:
 
 Write in second person. Be specific to the {pathway_type} pathway."""
 
-        description = ai_service.generate_recommendation(ai_prompt, max_tokens=200)
-        if not description:
-            # Fallback templates
-            if pathway_type == 'basic':
-                description = 'Based on your current pathway, you\'re on a foundational learning journey. This is perfect for building strong fundamentals. Take your time, don\'t skip steps, and ensure you truly understand each concept before moving forward.'
-            elif pathway_type == 'balanced':
-                description = 'You\'re on a balanced learning path, which means you can handle a mix of foundational and challenging content. Maintain this balance by alternating between review and new challenges.'
-            else:
-                description = 'Your pathway indicates readiness for advanced content. While you have some weak areas, your overall performance suggests you can handle challenging material. Use this to deepen understanding through complex problems.'
+        # Fallback templates
+        if pathway_type == 'basic':
+            description = 'Based on your current pathway, you\'re on a foundational learning journey. This is perfect for building strong fundamentals. Take your time, don\'t skip steps, and ensure you truly understand each concept before moving forward.'
+        elif pathway_type == 'balanced':
+            description = 'You\'re on a balanced learning path, which means you can handle a mix of foundational and challenging content. Maintain this balance by alternating between review and new challenges.'
+        else:
+            description = 'Your pathway indicates readiness for advanced content. While you have some weak areas, your overall performance suggests you can handle challenging material. Use this to deepen understanding through complex problems.'
         
         pathway_titles = {
             'basic': 'Foundational Learning Path',
@@ -350,21 +769,32 @@ Write in second person. Be specific to the {pathway_type} pathway."""
             ]
         }
         
-        recommendations.append({
-            'type': 'pathway',
-            'title': pathway_titles.get(pathway_type, 'Learning Pathway Guidance'),
-            'description': description,
-            'priority': 'high' if pathway_type == 'basic' else 'medium',
-            'action_items': pathway_action_items.get(pathway_type, [])
+        sections.append({
+            'key': 'pathway',
+            'prompt': ai_prompt,
+            'inputs': {
+                'pathway_type': pathway_type,
+                'average_score': self._section_bucket(avg_score),
+                'task_completion': self._section_bucket(task_completion * 100),
+                'weak_total': weak_total
+            },
+            'instruction': f'A 2-3 sentence explanation of what the {pathway_type} pathway means for the student and how to make the most of it.',
+            'fallback': description,
+            'recommendation': {
+                'type': 'pathway',
+                'title': pathway_titles.get(pathway_type, 'Learning Pathway Guidance'),
+                'priority': 'high' if pathway_type == 'basic' else 'medium',
+                'action_items': pathway_action_items.get(pathway_type, [])
+            }
         })
         
         # Recommendation 5: Performance-based insights (AI-generated)
         task_completion_rate = performance.get('task_completion_rate', 0)
         if task_completion_rate < 0.6:
-            ai_prompt = f"""Provide a task completion improvement recommendation for a student with a {task_completion_rate*100:.0f}% task completion rate.
+            ai_prompt = f"""Provide a task completion improvement recommendation for a student with a {self._bucket(task_completion_rate*100):.0f}% task completion rate.
 
 Context:
-- Task completion rate: {task_completion_rate*100:.0f}%
+- Task completion rate: {self._bucket(task_completion_rate*100):.0f}%
 - Completed tasks: {performance.get('completed_tasks', 0)} / {performance.get('total_tasks', 0)}
 - Learning pathway: {pathway.get('pathway_type', 'balanced')}
 
@@ -376,25 +806,32 @@ Provide a 2-3 sentence recommendation that:
 
 Write in second person. Be specific and motivating."""
 
-            description = ai_service.generate_recommendation(ai_prompt, max_tokens=200)
-            if not description:
-                description = f'Your task completion rate is {task_completion_rate*100:.0f}%. Completing assigned tasks is essential for building knowledge systematically. Focus on finishing what you start.'
-            
-            recommendations.append({
-                'type': 'engagement',
-                'title': 'Improve Task Completion',
-                'description': description,
-                'priority': 'medium',
-                'action_items': [
-                    'Set daily completion goals',
-                    'Break large tasks into smaller steps',
-                    'Remove distractions during study time',
-                    'Track completion to build momentum',
-                    'Reward yourself for completing tasks'
-                ]
+            sections.append({
+                'key': 'engagement',
+                'prompt': ai_prompt,
+                'inputs': {
+                    'task_completion': self._section_bucket(task_completion_rate * 100),
+                    'completed_tasks': performance.get('completed_tasks', 0),
+                    'total_tasks': performance.get('total_tasks', 0),
+                    'pathway_type': pathway.get('pathway_type', 'balanced')
+                },
+                'instruction': 'A 2-3 sentence recommendation for improving task completion, with specific, actionable advice.',
+                'fallback': f'Your task completion rate is {task_completion_rate*100:.0f}%. Completing assigned tasks is essential for building knowledge systematically. Focus on finishing what you start.',
+                'recommendation': {
+                    'type': 'engagement',
+                    'title': 'Improve Task Completion',
+                    'priority': 'medium',
+                    'action_items': [
+                        'Set daily completion goals',
+                        'Break large tasks into smaller steps',
+                        'Remove distractions during study time',
+                        'Track completion to build momentum',
+                        'Reward yourself for completing tasks'
+                    ]
+                }
             })
         
-        return recommendations
+        return sections
     
     def _generate_timeline(self, weak_areas: List[Dict], pathway: Dict) -> List[Dict]:
         """Generate learning timeline."""
@@ -484,8 +921,40 @@ Write in second person. Be specific and motivating."""
         
         return activities
     
-    def get_roadmap(self, student_id: str) -> Dict:
-        """Get complete roadmap for a student."""
+    @timed('roadmap.get_roadmap')
+    def get_roadmap(self, student_id: str, refresh: bool = False) -> Dict:
+        """
+        Get complete roadmap for a student.
+        
+        Served from the roadmap snapshots with ILPG_ROADMAP_SNAPSHOTS, otherwise
+        from the student result cache. `refresh` regenerates it now.
+        """
+        if config.ROADMAP_SNAPSHOTS:
+            from .roadmap_snapshots import roadmap_snapshot_store
+            return roadmap_snapshot_store.get_roadmap(student_id, refresh)
+        if refresh:
+            student_result_cache.invalidate_student(student_id)
+        if config.RESULT_CACHE_ENABLED:
+            return student_result_cache.get_or_compute('roadmap', student_id, lambda: self._get_roadmap(student_id))
+        return self._get_roadmap(student_id)
+    
+    def stream_roadmap(self, student_id: str) -> Iterator[Tuple[str, Dict]]:
+        """
+        The student's roadmap as (event, payload) pairs for server-sent events.
+        
+        With ILPG_ROADMAP_SNAPSHOTS the snapshot is complete already and is sent
+        as a single 'roadmap' event (with its `snapshot` details); otherwise
+        see stream_roadmap_guidance().
+        """
+        if config.ROADMAP_SNAPSHOTS:
+            from .roadmap_snapshots import roadmap_snapshot_store
+            result = roadmap_snapshot_store.get_roadmap(student_id)
+            yield 'roadmap', dict(result['data'], snapshot=result['snapshot'])
+            yield 'done', {'recommendations': len(result['data'].get('recommendations', []))}
+            return
+        yield from self.stream_roadmap_guidance(student_id)
+    
+    def _get_roadmap(self, student_id: str) -> Dict:
         try:
             roadmap = self.generate_roadmap_guidance(student_id)
             return {
@@ -495,7 +964,7 @@ Write in second person. Be specific and motivating."""
         except RoadmapError as e:
             raise e
         except Exception as e:
-            print(f'[Roadmap] Error getting roadmap: {e}')
+            log_error('Roadmap', f'Error getting roadmap: {e}')
             raise RoadmapError(f'Failed to get roadmap: {str(e)}', 500)
 
 
@@ -0,0 +1,206 @@
+"""
+Roadmap Snapshot Module.
+
+With ILPG_ROADMAP_SNAPSHOTS, roadmaps are stored as versioned snapshots per
+student and views are served from the latest one (a single indexed read)
+instead of regenerating the roadmap and its AI text every time.
+
+Snapshots are refreshed stale-while-revalidate: the current snapshot is
+always returned, and a background worker regenerates it when
+- it is older than ROADMAP_SNAPSHOT_MAX_AGE (a weekly plan by default), or
+- a revalidation, run at most every ROADMAP_SNAPSHOT_CHECK_INTERVAL seconds
+  per student, finds a concept whose mastery moved by at least
+  ROADMAP_REFRESH_THRESHOLD percentage points since the snapshot.
+
+A student's first view generates the snapshot synchronously. Teachers can
+force a synchronous regeneration with ?refresh=true.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List
+from bson import ObjectId
+from pymongo import DESCENDING
+from pymongo.errors import DuplicateKeyError
+
+import sys
+from pathlib import Path
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from database import get_database
+from . import config
+from .concept_mastery import concept_mastery_service
+from .metrics import timed, log_error
+from .roadmap_service import roadmap_service
+from .student_context import StudentContext
+
+
+# Background regeneration, shared by all requests
+_refresh_executor = ThreadPoolExecutor(max_workers=config.ROADMAP_REFRESH_WORKERS, thread_name_prefix='ilpg-roadmap-refresh')
+
+
+def mastery_signature(mastery: Dict) -> Dict[str, List]:
+    """Concept names and mastery percentages of a mastery summary (names may contain dots)."""
+    concepts = mastery.get('concepts', [])
+    return {
+        'concepts': [c['concept_name'] for c in concepts],
+        'mastery': [c['mastery_percentage'] for c in concepts]
+    }
+
+
+def mastery_drift(signature: Dict[str, List], mastery: Dict) -> float:
+    """Largest per-concept mastery change since `signature`; new or dropped concepts count in full."""
+    before = dict(zip(signature.get('concepts', []), signature.get('mastery', [])))
+    after = {c['concept_name']: c['mastery_percentage'] for c in mastery.get('concepts', [])}
+    return max((abs(after.get(name, 0) - before.get(name, 0)) for name in set(before) | set(after)), default=0)
+
+
+class RoadmapSnapshotStore:
+    """Versioned roadmap snapshots with background refresh."""
+    
+    def __init__(self):
+        self._db = None
+        self._lock = threading.Lock()
+        self._refreshing = set()
+    
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = get_database()
+        return self._db
+    
+    @property
+    def collection(self):
+        return self.db[config.ROADMAP_SNAPSHOT_COLLECTION]
+    
+    def latest(self, student_id: str) -> Optional[Dict]:
+        """The student's newest snapshot."""
+        return self.collection.find_one({'student_id': ObjectId(student_id)}, sort=[('version', DESCENDING)])
+    
+    @timed('roadmap_snapshots.create_snapshot')
+    def create_snapshot(self, student_id: str, trigger: str) -> Dict:
+        """Generate the roadmap and store it as the student's next version."""
+        previous = self.latest(student_id)
+        context = StudentContext(student_id, self.db)
+        # Unchanged recommendations keep the previous snapshot's AI text; a manual refresh starts over
+        roadmap = roadmap_service.generate_roadmap_guidance(
+            student_id, context, previous=previous['roadmap'] if previous and trigger != 'manual' else None
+        )
+        mastery = concept_mastery_service.get_concept_mastery(student_id, context)
+        
+        now = datetime.utcnow()
+        snapshot = {
+            'student_id': ObjectId(student_id),
+            'version': (previous['version'] + 1) if previous else 1,
+            'trigger': trigger,
+            'roadmap': roadmap,
+            'mastery_signature': mastery_signature(mastery),
+            'created_at': now,
+            'checked_at': now
+        }
+        try:
+            self.collection.insert_one(snapshot)
+        except DuplicateKeyError:
+            # Another worker stored this version first; serve theirs
+            return self.latest(student_id)
+        self.collection.delete_many({
+            'student_id': snapshot['student_id'],
+            'version': {'$lte': snapshot['version'] - config.ROADMAP_SNAPSHOT_KEEP}
+        })
+        return snapshot
+    
+    def is_expired(self, snapshot: Dict, now: datetime) -> bool:
+        return now - snapshot['created_at'] >= timedelta(seconds=config.ROADMAP_SNAPSHOT_MAX_AGE)
+    
+    def needs_check(self, snapshot: Dict, now: datetime) -> bool:
+        return now - snapshot.get('checked_at', snapshot['created_at']) >= timedelta(seconds=config.ROADMAP_SNAPSHOT_CHECK_INTERVAL)
+    
+    def revalidate(self, student_id: str) -> Optional[Dict]:
+        """
+        Regenerate the snapshot if it has expired or mastery has drifted past
+        the threshold; otherwise just record the check. Returns the new
+        snapshot, or None when the current one is still valid.
+        """
+        snapshot = self.latest(student_id)
+        now = datetime.utcnow()
+        if snapshot is None:
+            return self.create_snapshot(student_id, 'initial')
+        if self.is_expired(snapshot, now):
+            return self.create_snapshot(student_id, 'age')
+        
+        drift = mastery_drift(snapshot.get('mastery_signature', {}), concept_mastery_service.get_concept_mastery(student_id))
+        if drift >= config.ROADMAP_REFRESH_THRESHOLD:
+            return self.create_snapshot(student_id, 'mastery_change')
+        self.collection.update_one({'_id': snapshot['_id']}, {'$set': {'checked_at': now}})
+        return None
+    
+    def _revalidate_in_background(self, student_id: str) -> None:
+        try:
+            self.revalidate(student_id)
+        except Exception as e:
+            log_error('RoadmapSnapshots', f'Error refreshing {student_id}: {e}')
+        finally:
+            with self._lock:
+                self._refreshing.discard(student_id)
+    
+    def schedule_refresh(self, student_id: str) -> bool:
+        """Queue a background revalidation unless one is already pending for the student."""
+        with self._lock:
+            if student_id in self._refreshing:
+                return False
+            self._refreshing.add(student_id)
+        _refresh_executor.submit(self._revalidate_in_background, student_id)
+        return True
+    
+    def _refresh_if_due(self, snapshot: Dict, now: datetime) -> bool:
+        """Queue a background revalidation when the snapshot is due one; returns whether it has expired."""
+        stale = self.is_expired(snapshot, now)
+        if stale or self.needs_check(snapshot, now):
+            self.schedule_refresh(str(snapshot['student_id']))
+        return stale
+    
+    def current_version(self, student_id: str) -> int:
+        """
+        Version of the latest snapshot (0 before the first), for ETags.
+        
+        Queues a due refresh like get_roadmap() does, since a request
+        answered with 304 never reaches get_roadmap().
+        """
+        snapshot = self.latest(student_id)
+        if snapshot is None:
+            return 0
+        self._refresh_if_due(snapshot, datetime.utcnow())
+        return snapshot['version']
+    
+    def get_roadmap(self, student_id: str, refresh: bool = False) -> Dict:
+        """
+        Roadmap response served from the latest snapshot.
+        
+        `snapshot` describes the version served: `stale` when it has expired
+        and `refreshing` when a background regeneration was queued or is
+        already running.
+        """
+        snapshot = None if refresh else self.latest(student_id)
+        if snapshot is None:
+            snapshot = self.create_snapshot(student_id, 'manual' if refresh else 'initial')
+        
+        stale = self._refresh_if_due(snapshot, datetime.utcnow())
+        with self._lock:
+            refreshing = student_id in self._refreshing
+        
+        return {
+            'success': True,
+            'data': snapshot['roadmap'],
+            'snapshot': {
+                'version': snapshot['version'],
+                'trigger': snapshot['trigger'],
+                'created_at': snapshot['created_at'],
+                'stale': stale,
+                'refreshing': refreshing
+            }
+        }
+
+
+# Global store instance
+roadmap_snapshot_store = RoadmapSnapshotStore()
@@ -0,0 +1,267 @@
+"""
+Performance Rollup Module.
+
+Per-student daily buckets of quiz and task activity (quiz count, score
+sum, last quiz time, task count, completed task count), maintained as
+activities are ingested. With ILPG_PERFORMANCE_BACKEND=rollup the pathway
+service reads performance from these buckets instead of a student's full
+quiz and task history, and any windowed metric (7-day, 30-day, a term) is
+a sum over a bounded number of buckets.
+
+Buckets are whole UTC days, so windows start at midnight UTC: the 7-day
+attempt count covers today and the previous seven days in full.
+
+Backfill or repair with:
+    python -m L_patgway.rollups rebuild [--student <id> ...]
+    python -m L_patgway.rollups window --student <id> --days 30
+"""
+
+import argparse
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List, Iterable
+from bson import ObjectId
+from pymongo import UpdateOne, ReplaceOne
+
+import sys
+from pathlib import Path
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from database import get_database
+from . import config
+from .indexes import ensure_indexes
+from .result_cache import student_result_cache
+from .student_context import TASK_ACTIVITY_TYPES
+
+
+def day_start(moment: datetime) -> datetime:
+    """Midnight (UTC) of the day containing `moment`."""
+    return datetime(moment.year, moment.month, moment.day)
+
+
+def is_completed_task(task: Dict) -> bool:
+    """Same rule as the pathway service's completed task count."""
+    return (task.get('metadata') or {}).get('status') == 'completed' or (task.get('points_earned') or 0) > 0
+
+
+class PerformanceRollupStore:
+    """Daily per-student performance buckets."""
+    
+    def __init__(self):
+        self._db = None
+    
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = get_database()
+        return self._db
+    
+    @property
+    def collection(self):
+        return self.db[config.PERFORMANCE_ROLLUP_COLLECTION]
+    
+    def _new_bucket(self, student_oid: ObjectId, day: datetime) -> Dict:
+        return {
+            'student_id': student_oid,
+            'day': day,
+            'quiz_count': 0,
+            'score_sum': 0,
+            'last_quiz_at': None,
+            'task_count': 0,
+            'completed_count': 0
+        }
+    
+    def _collect(self, collection_name: str, activities: Iterable[Dict]) -> Dict[tuple, Dict]:
+        """Group learning_activities/engagement_logs documents into (student, day) buckets."""
+        buckets = {}
+        for activity in activities:
+            student_oid = activity.get('user_id')
+            if student_oid is None:
+                continue
+            activity_type = activity.get('activity_type')
+            created_at = activity.get('created_at') or datetime.utcnow()
+            
+            is_quiz = (collection_name == 'learning_activities' and activity_type == 'quiz_complete'
+                       and activity.get('score') is not None)
+            is_task = collection_name == 'engagement_logs' and activity_type in TASK_ACTIVITY_TYPES
+            if not is_quiz and not is_task:
+                continue
+            
+            key = (student_oid, day_start(created_at))
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = self._new_bucket(*key)
+            if is_quiz:
+                bucket['quiz_count'] += 1
+                bucket['score_sum'] += activity['score']
+                if bucket['last_quiz_at'] is None or created_at > bucket['last_quiz_at']:
+                    bucket['last_quiz_at'] = created_at
+            else:
+                bucket['task_count'] += 1
+                bucket['completed_count'] += 1 if is_completed_task(activity) else 0
+        return buckets
+    
+    def apply_activities(self, collection_name: str, activities: Iterable[Dict]) -> List[ObjectId]:
+        """
+        Fold newly written activities into the daily buckets.
+        
+        Activities for the same student and day become a single upsert.
+        Returns the ids of the students whose buckets changed.
+        """
+        if self.db is None:
+            return []
+        
+        buckets = self._collect(collection_name, activities)
+        if not buckets:
+            return []
+        
+        now = datetime.utcnow()
+        operations = []
+        for (student_oid, day), bucket in buckets.items():
+            update = {
+                '$inc': {
+                    'quiz_count': bucket['quiz_count'],
+                    'score_sum': bucket['score_sum'],
+                    'task_count': bucket['task_count'],
+                    'completed_count': bucket['completed_count']
+                },
+                '$set': {'updated_at': now}
+            }
+            if bucket['last_quiz_at'] is not None:
+                update['$max'] = {'last_quiz_at': bucket['last_quiz_at']}
+            operations.append(UpdateOne({'student_id': student_oid, 'day': day}, update, upsert=True))
+        self.collection.bulk_write(operations, ordered=False)
+        
+        changed = list({student_oid for student_oid, _ in buckets})
+        student_result_cache.invalidate_students(changed)
+        return changed
+    
+    def rebuild_student(self, student_id: str) -> int:
+        """Recompute a student's buckets from their full history. Returns the bucket count."""
+        if self.db is None:
+            return 0
+        
+        student_oid = ObjectId(student_id)
+        buckets = self._collect('learning_activities', self.db.learning_activities.find(
+            {'user_id': student_oid, 'activity_type': 'quiz_complete', 'score': {'$exists': True, '$ne': None}},
+            {'user_id': 1, 'activity_type': 1, 'score': 1, 'created_at': 1}
+        ))
+        for key, bucket in self._collect('engagement_logs', self.db.engagement_logs.find(
+            {'user_id': student_oid, 'activity_type': {'$in': TASK_ACTIVITY_TYPES}},
+            {'user_id': 1, 'activity_type': 1, 'metadata.status': 1, 'points_earned': 1, 'created_at': 1}
+        )).items():
+            if key in buckets:
+                buckets[key]['task_count'] = bucket['task_count']
+                buckets[key]['completed_count'] = bucket['completed_count']
+            else:
+                buckets[key] = bucket
+        
+        now = datetime.utcnow()
+        operations = []
+        for (_, day), bucket in buckets.items():
+            document = dict(bucket, updated_at=now)
+            if document['last_quiz_at'] is None:
+                # Task-only day; leave the field for a later quiz's $max to set
+                del document['last_quiz_at']
+            operations.append(ReplaceOne({'student_id': student_oid, 'day': day}, document, upsert=True))
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+        self.collection.delete_many({'student_id': student_oid, 'day': {'$nin': [day for _, day in buckets]}})
+        student_result_cache.invalidate_student(student_id)
+        return len(buckets)
+    
+    def rebuild(self, student_ids: Optional[List[str]] = None) -> Dict[str, int]:
+        """Backfill the buckets for the given students, or for everyone."""
+        from .mastery_store import concept_mastery_store
+        
+        if self.db is None:
+            return {'students': 0, 'buckets': 0}
+        
+        students = 0
+        buckets = 0
+        for student_id in (student_ids or concept_mastery_store.iter_student_ids()):
+            try:
+                buckets += self.rebuild_student(student_id)
+                students += 1
+            except Exception as e:
+                print(f'[Rollups] Error rebuilding {student_id}: {e}')
+        return {'students': students, 'buckets': buckets}
+    
+    def performance_stats(self, student_ids: List[str], recent_days: int = 7) -> Dict[str, Dict]:
+        """
+        Quiz/task totals per student in the shape of the quiz_stats/task_stats
+        pipeline rows, with recent_attempts over the last `recent_days` days.
+        One aggregation for all students.
+        """
+        recent_since = day_start(datetime.utcnow() - timedelta(days=recent_days))
+        rows = self.collection.aggregate([
+            {'$match': {'student_id': {'$in': [ObjectId(student_id) for student_id in student_ids]}}},
+            {'$group': {
+                '_id': '$student_id',
+                'total_quizzes': {'$sum': '$quiz_count'},
+                'score_sum': {'$sum': '$score_sum'},
+                'recent_attempts': {'$sum': {'$cond': [{'$gte': ['$day', recent_since]}, '$quiz_count', 0]}},
+                'last_quiz_date': {'$max': '$last_quiz_at'},
+                'total_tasks': {'$sum': '$task_count'},
+                'completed_tasks': {'$sum': '$completed_count'}
+            }}
+        ])
+        return {str(row['_id']): row for row in rows}
+    
+    def window_stats(self, student_id: str, since: datetime, until: Optional[datetime] = None) -> Dict[str, Any]:
+        """Totals and rates for the days from `since` up to (excluding) `until`."""
+        day_range = {'$gte': day_start(since)}
+        if until is not None:
+            day_range['$lt'] = day_start(until)
+        rows = list(self.collection.aggregate([
+            {'$match': {'student_id': ObjectId(student_id), 'day': day_range}},
+            {'$group': {
+                '_id': None,
+                'quiz_count': {'$sum': '$quiz_count'},
+                'score_sum': {'$sum': '$score_sum'},
+                'task_count': {'$sum': '$task_count'},
+                'completed_count': {'$sum': '$completed_count'},
+                'active_days': {'$sum': 1}
+            }}
+        ]))
+        totals = rows[0] if rows else {}
+        quiz_count = totals.get('quiz_count', 0)
+        task_count = totals.get('task_count', 0)
+        return {
+            'since': day_start(since),
+            'until': day_start(until) if until is not None else None,
+            'quiz_count': quiz_count,
+            'average_score': round(totals.get('score_sum', 0) / quiz_count, 2) if quiz_count else 0,
+            'task_count': task_count,
+            'completed_count': totals.get('completed_count', 0),
+            'task_completion_rate': round(totals.get('completed_count', 0) / task_count, 2) if task_count else 0,
+            'active_days': totals.get('active_days', 0)
+        }
+
+
+# Global store instance
+performance_rollup_store = PerformanceRollupStore()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Maintain the daily performance rollups')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    rebuild_parser = subparsers.add_parser('rebuild', help='Recompute buckets from full activity history')
+    rebuild_parser.add_argument('--student', action='append', dest='students', help='Student id (repeatable)')
+    window_parser = subparsers.add_parser('window', help='Print a student\'s stats over the last N days')
+    window_parser.add_argument('--student', required=True, help='Student id')
+    window_parser.add_argument('--days', type=int, default=30)
+    args = parser.parse_args(argv)
+    
+    ensure_indexes()
+    if args.command == 'rebuild':
+        result = performance_rollup_store.rebuild(args.students)
+        print(f"[Rollups] Rebuilt {result['buckets']} day buckets for {result['students']} students")
+    elif args.command == 'window':
+        stats = performance_rollup_store.window_stats(args.student, datetime.utcnow() - timedelta(days=args.days))
+        for key, value in stats.items():
+            print(f'[Rollups] {key}: {value}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
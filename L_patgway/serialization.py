@@ -0,0 +1,99 @@
+"""
+Serialization Module.
+
+JSON responses for the ILPG blueprints. Services return plain dicts with
+their timestamps already formatted as ISO 8601 strings (the wire format
+clients read); json_response() still writes any datetime it meets as an ISO
+8601 string and ObjectIds as hex strings.
+
+With ILPG_FAST_JSON (and orjson installed) encoding uses orjson; otherwise
+the standard library encoder produces the same output. compress_response()
+is registered as an after_request hook and gzip/brotli-encodes bodies of at
+least ILPG_COMPRESS_MIN_BYTES for clients that accept it.
+
+sse_event() encodes one server-sent event for the streaming endpoints;
+event streams are never compressed, so each event reaches the client as
+soon as it is written.
+"""
+
+import gzip
+import json
+from datetime import datetime, date
+from typing import Any
+
+from bson import ObjectId
+from flask import Response, request
+
+import sys
+from pathlib import Path
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from . import config
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; dumps() falls back to the json module
+    orjson = None
+try:
+    import brotli
+except ImportError:  # brotli is optional; only gzip is offered without it
+    brotli = None
+
+
+def _default(value: Any) -> Any:
+    """Encode the non-JSON types the services return."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (set, tuple)):
+        return list(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def dumps(payload: Any) -> bytes:
+    """Encode a response payload as UTF-8 JSON."""
+    if config.FAST_JSON and orjson is not None:
+        # orjson writes datetimes natively; _default handles ObjectId and sets
+        return orjson.dumps(payload, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def sse_event(event: str, payload: Any) -> bytes:
+    """A text/event-stream event whose data is the JSON-encoded payload."""
+    return b'event: ' + event.encode('utf-8') + b'\ndata: ' + dumps(payload) + b'\n\n'
+
+
+def json_response(payload: Any, status: int = 200) -> Response:
+    """Flask response for a JSON payload (drop-in for jsonify(payload), status)."""
+    return Response(dumps(payload), status=status, mimetype='application/json')
+
+
+def compress_response(response: Response) -> Response:
+    """after_request hook: compress large JSON bodies when the client accepts it."""
+    if not config.COMPRESS_RESPONSES or response.direct_passthrough:
+        return response
+    if response.status_code != 200 or 'Content-Encoding' in response.headers:
+        return response
+    if response.mimetype != 'application/json':
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    if len(body) < config.COMPRESS_MIN_BYTES:
+        return response
+    
+    if brotli is not None and request.accept_encodings['br']:
+        encoding, compressed = 'br', brotli.compress(body, quality=config.COMPRESS_LEVEL)
+    elif request.accept_encodings['gzip']:
+        encoding, compressed = 'gzip', gzip.compress(body, compresslevel=min(config.COMPRESS_LEVEL, 9))
+    else:
+        return response
+    
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        # The encoded body differs from the identity one; only weak comparison still holds
+        response.set_etag(etag, weak=True)
+    return response
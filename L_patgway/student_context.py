@@ -0,0 +1,119 @@
+"""
+Student Context Module.
+
+Request-scoped loader shared by the ILPG services. A single roadmap or
+mind map request touches the same student data from the concept mastery,
+learning pathway and roadmap services; routing their reads through one
+StudentContext means each collection is read at most once per request.
+"""
+
+from typing import Optional, Dict, Any, List, Callable
+from bson import ObjectId
+
+import sys
+from pathlib import Path
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from database import get_database
+from . import metrics
+
+
+# Activity types the ILPG services read from each collection
+LEARNING_ACTIVITY_TYPES = ['quiz_complete', 'lesson_complete']
+TASK_ACTIVITY_TYPES = ['lesson_complete', 'assignment_submit']
+
+
+class StudentContext:
+    """
+    Per-request cache of a student's source documents and derived results.
+    
+    `round_trips` counts the database calls issued through this context,
+    so callers (and tests) can check how many times Mongo was hit.
+    """
+    
+    def __init__(self, student_id: str, db=None):
+        self.student_id = student_id
+        self._db = db
+        self._documents = {}
+        self._results = {}
+        self.round_trips = 0
+    
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = get_database()
+        return self._db
+    
+    @property
+    def student_oid(self) -> ObjectId:
+        return ObjectId(self.student_id)
+    
+    def load(self, key: str, loader: Callable[[], Any]) -> Any:
+        """Run a database loader once and keep its result for the rest of the request."""
+        if key not in self._documents:
+            self.round_trips += 1
+            # Parameterized keys ('weak_areas:0:10') are reported under their prefix
+            source = key.split(':', 1)[0]
+            with metrics.timer('db', source):
+                self._documents[key] = loader()
+            metrics.count_documents(source, self._documents[key])
+        return self._documents[key]
+    
+    def get_learning_activities(self) -> List[Dict]:
+        """All quiz and lesson completions for the student (one query)."""
+        return self.load('learning_activities', lambda: list(self.db.learning_activities.find({
+            'user_id': self.student_oid,
+            'activity_type': {'$in': LEARNING_ACTIVITY_TYPES}
+        })))
+    
+    def get_quizzes(self) -> List[Dict]:
+        """Scored quiz completions."""
+        return [
+            a for a in self.get_learning_activities()
+            if a.get('activity_type') == 'quiz_complete' and a.get('score') is not None
+        ]
+    
+    def get_lessons(self) -> List[Dict]:
+        """Lesson completions from learning_activities."""
+        return [a for a in self.get_learning_activities() if a.get('activity_type') == 'lesson_complete']
+    
+    def get_tasks(self) -> List[Dict]:
+        """Lesson and assignment engagement logs."""
+        return self.load('engagement_logs', lambda: list(self.db.engagement_logs.find({
+            'user_id': self.student_oid,
+            'activity_type': {'$in': TASK_ACTIVITY_TYPES}
+        })))
+    
+    def get_enrollments(self) -> List[Dict]:
+        """Module enrollments for the student."""
+        return self.load('enrollments', lambda: list(self.db.enrollments.find({'student_id': self.student_oid})))
+    
+    def get_structured_contents(self) -> List[Dict]:
+        """Approved structured content from the student's enrolled modules."""
+        module_names = [e['module_name'] for e in self.get_enrollments()]
+        if not module_names:
+            return []
+        return self.load('structured_contents', lambda: list(self.db.structured_contents.find({
+            'module_name': {'$in': module_names},
+            'approved': True,
+            'status': {'$in': ['approved', 'published']}
+        })))
+    
+    def aggregate(self, key: str, collection: str, pipeline: List[Dict]) -> List[Dict]:
+        """Run an aggregation pipeline once per request."""
+        return self.load(key, lambda: list(self.db[collection].aggregate(pipeline)))
+    
+    def memoize(self, key: str, compute: Callable[[], Any]) -> Any:
+        """Compute a derived result once per request."""
+        if key not in self._results:
+            self._results[key] = compute()
+        return self._results[key]
+
+
+def resolve_context(student_id: str, context: Optional[StudentContext], db=None) -> StudentContext:
+    """Return the caller's context, or a fresh one when none was passed."""
+    if context is None:
+        return StudentContext(student_id, db)
+    if context.student_id != student_id:
+        raise ValueError(f'Context belongs to student {context.student_id}, not {student_id}')
+    return context
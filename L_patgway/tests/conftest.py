@@ -0,0 +1,185 @@
+"""
+Shared fixtures for the ILPG tests.
+
+The services import `database`, `accounts` and `ai_service` from the backend
+directory. When the package is tested on its own those modules are not on
+the path, so mongomock-backed stand-ins are registered before L_patgway is
+imported. Either way every test runs against a fresh mongomock database.
+
+Set ILPG_TEST_MONGO_URI to also run the parity tests against a real mongod.
+"""
+
+import os
+import sys
+import types
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import mongomock
+import pytest
+from bson import ObjectId
+
+
+class _StandInAccountError(Exception):
+    def __init__(self, message: str, status_code: int = 401):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class _StandInAIService:
+    """Answers like ai_service does when no model is configured."""
+    
+    def generate_recommendation(self, prompt, max_tokens=200):
+        return None
+    
+    def generate_action_items(self, concept_name, mastery_percentage, pathway_type, max_items=5):
+        return []
+
+
+def _install_backend_stand_ins() -> None:
+    # The backend directory holding L_patgway (and, in the app, database.py)
+    sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+    try:
+        import database  # noqa: F401
+    except ImportError:
+        module = types.ModuleType('database')
+        module.get_database = lambda: mongomock.MongoClient()['ilpg_test']
+        sys.modules['database'] = module
+    try:
+        import accounts  # noqa: F401
+    except ImportError:
+        module = types.ModuleType('accounts')
+        module.AccountError = _StandInAccountError
+        module.account_service = types.SimpleNamespace(verify_token=lambda token: {})
+        sys.modules['accounts'] = module
+    try:
+        import ai_service  # noqa: F401
+    except ImportError:
+        module = types.ModuleType('ai_service')
+        module.ai_service = _StandInAIService()
+        sys.modules['ai_service'] = module
+
+
+_install_backend_stand_ins()
+
+import L_patgway  # noqa: E402
+from L_patgway import config  # noqa: E402
+from L_patgway.result_cache import student_result_cache  # noqa: E402
+
+ROUTE_MODULES = (
+    'L_patgway.roadmap_routes', 'L_patgway.concept_mastery_routes',
+    'L_patgway.learning_pathway_routes', 'L_patgway.ingestion_routes', 'L_patgway.metrics_routes'
+)
+
+
+def _ilpg_modules():
+    return [module for name, module in list(sys.modules.items()) if name.startswith('L_patgway.') and module]
+
+
+def use_database(monkeypatch, database) -> None:
+    """Point every ILPG module and global service at `database`."""
+    for module in _ilpg_modules():
+        if hasattr(module, 'get_database'):
+            monkeypatch.setattr(module, 'get_database', lambda: database)
+        for value in list(vars(module).values()):
+            # The global service instances connect lazily through `_db`
+            if type(value).__module__.startswith('L_patgway.') and hasattr(value, '_db'):
+                monkeypatch.setattr(value, '_db', None)
+
+
+@pytest.fixture(autouse=True)
+def db(monkeypatch):
+    """A fresh mongomock database behind every ILPG module and service."""
+    database = mongomock.MongoClient()['ilpg_test']
+    use_database(monkeypatch, database)
+    monkeypatch.setattr(config, 'AI_CACHE_ENABLED', False)
+    student_result_cache.clear()
+    yield database
+    student_result_cache.clear()
+
+
+@pytest.fixture
+def mongod_db(db, monkeypatch):
+    """A scratch database on the mongod at ILPG_TEST_MONGO_URI, used instead of mongomock (skipped when unset)."""
+    uri = os.getenv('ILPG_TEST_MONGO_URI')
+    if not uri:
+        pytest.skip('ILPG_TEST_MONGO_URI is not set')
+    from pymongo import MongoClient
+    client = MongoClient(uri)
+    name = f'ilpg_test_{ObjectId()}'
+    use_database(monkeypatch, client[name])
+    yield client[name]
+    client.drop_database(name)
+    client.close()
+
+
+def add_student(db, quiz_scores=(35, 50, 90, 80, 20), module_name: str = 'Math') -> str:
+    """
+    Insert a student enrolled in `module_name` with one quiz per score (a
+    percentage), a lesson and two engagement logs, using the different
+    concept formats extract_concepts() understands.
+    """
+    student_oid = ObjectId()
+    now = datetime.utcnow()
+    concept_fields = [
+        {'metadata': {'concepts': ['Algebra', 'Geometry']}},
+        {'metadata': {'concept': 'Fractions'}},
+        {'metadata': {'topic': 'Algebra'}},
+        {'topic_name': 'Trig', 'unit_name': 'Unit 1', 'module_name': module_name},
+        {}
+    ]
+    db.enrollments.insert_one({'student_id': student_oid, 'module_name': module_name, 'enrolled_at': now})
+    db.structured_contents.update_one(
+        {'module_name': module_name, 'topic_name': 'Trig'},
+        {'$set': {'unit_name': 'Unit 1', 'approved': True, 'status': 'approved'}},
+        upsert=True
+    )
+    for index, score in enumerate(quiz_scores):
+        db.learning_activities.insert_one(dict(
+            concept_fields[index % len(concept_fields)],
+            user_id=student_oid, activity_type='quiz_complete', score=score,
+            quiz_id=ObjectId(), created_at=now - timedelta(days=index)
+        ))
+    db.learning_activities.insert_one({
+        'user_id': student_oid, 'activity_type': 'lesson_complete', 'lesson_id': ObjectId(),
+        'metadata': {'concept': 'Fractions'}, 'created_at': now - timedelta(days=2)
+    })
+    db.engagement_logs.insert_many([
+        {'user_id': student_oid, 'activity_type': 'assignment_submit', 'points_earned': 5,
+         'metadata': {'topic': 'Algebra'}, 'created_at': now - timedelta(days=1)},
+        {'user_id': student_oid, 'activity_type': 'lesson_complete', 'points_earned': 0,
+         'metadata': {'concepts': ['Geometry']}, 'created_at': now - timedelta(days=3)}
+    ])
+    return str(student_oid)
+
+
+@pytest.fixture
+def student_id(db) -> str:
+    return add_student(db)
+
+
+class FakeAccountService:
+    """Accepts 'Bearer <role>:<user id>' tokens."""
+    
+    def verify_token(self, token: str):
+        role, _, user_id = token.partition(':')
+        return {'user_id': user_id, 'role': role}
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    """Flask test client with the ILPG blueprints and role-prefixed test tokens."""
+    from flask import Flask
+    
+    for name in ROUTE_MODULES:
+        monkeypatch.setattr(sys.modules[name], 'account_service', FakeAccountService())
+    app = Flask(__name__)
+    for blueprint in (L_patgway.pathway_bp, L_patgway.concept_mastery_bp, L_patgway.roadmap_bp,
+                      L_patgway.ingestion_bp, L_patgway.metrics_bp):
+        app.register_blueprint(blueprint)
+    return app.test_client()
+
+
+def auth(role: str, user_id: str) -> dict:
+    return {'Authorization': f'Bearer {role}:{user_id}'}
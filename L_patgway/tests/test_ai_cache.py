@@ -0,0 +1,98 @@
+"""AIResponseCache reuses generations by request and expires them after AI_CACHE_TTL."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from L_patgway import config
+from L_patgway.ai_cache import AIResponseCache
+
+
+class Generator:
+    def __init__(self, value='Generated text'):
+        self.value = value
+        self.calls = 0
+    
+    def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+@pytest.fixture
+def cache(db, monkeypatch):
+    monkeypatch.setattr(config, 'AI_CACHE_ENABLED', True)
+    monkeypatch.setattr(config, 'AI_CACHE_BACKEND', 'mongo')
+    return AIResponseCache()
+
+
+def test_identical_requests_share_a_generation(cache):
+    generate = Generator()
+    request = {'prompt': 'Explain fractions', 'max_tokens': 200}
+    
+    assert cache.get_or_generate('recommendation', request, generate) == 'Generated text'
+    assert cache.get_or_generate('recommendation', dict(reversed(list(request.items()))), generate) == 'Generated text'
+    
+    assert generate.calls == 1
+    assert cache.stats()['hits'] == 1
+
+
+@pytest.mark.parametrize('kind, ai_request, model', [
+    ('action_items', {'prompt': 'Explain fractions', 'max_tokens': 200}, ''),
+    ('recommendation', {'prompt': 'Explain algebra', 'max_tokens': 200}, ''),
+    ('recommendation', {'prompt': 'Explain fractions', 'max_tokens': 300}, ''),
+    ('recommendation', {'prompt': 'Explain fractions', 'max_tokens': 200}, 'other-model'),
+])
+def test_kind_request_and_model_are_part_of_the_key(cache, monkeypatch, kind, ai_request, model):
+    monkeypatch.delenv('GROQ_MODEL', raising=False)
+    generate = Generator()
+    cache.get_or_generate('recommendation', {'prompt': 'Explain fractions', 'max_tokens': 200}, generate)
+    if model:
+        monkeypatch.setenv('GROQ_MODEL', model)
+    
+    cache.get_or_generate(kind, ai_request, generate)
+    
+    assert generate.calls == 2
+
+
+def test_failed_generations_are_retried(cache):
+    generate = Generator(value=None)
+    
+    cache.get_or_generate('recommendation', {'prompt': 'p'}, generate)
+    cache.get_or_generate('recommendation', {'prompt': 'p'}, generate)
+    
+    assert generate.calls == 2
+    assert cache.collection.count_documents({}) == 0
+
+
+def test_generations_survive_restarts_until_they_expire(cache, db):
+    generate = Generator()
+    cache.get_or_generate('recommendation', {'prompt': 'p'}, generate)
+    
+    # A new process starts with an empty memory tier
+    restarted = AIResponseCache()
+    assert restarted.get_or_generate('recommendation', {'prompt': 'p'}, generate) == 'Generated text'
+    assert generate.calls == 1
+    assert restarted.stats()['persistent_hits'] == 1
+    
+    db[config.AI_CACHE_COLLECTION].update_many({}, {'$set': {'expires_at': datetime.utcnow() - timedelta(seconds=1)}})
+    AIResponseCache().get_or_generate('recommendation', {'prompt': 'p'}, generate)
+    assert generate.calls == 2
+
+
+def test_entries_are_stored_with_the_ttl(cache, monkeypatch):
+    monkeypatch.setattr(config, 'AI_CACHE_TTL', 3600)
+    cache.get_or_generate('recommendation', {'prompt': 'p'}, Generator())
+    
+    entry = cache.collection.find_one({})
+    assert entry['kind'] == 'recommendation'
+    assert entry['expires_at'] - entry['created_at'] == timedelta(seconds=3600)
+
+
+def test_disabled_cache_always_generates(cache, monkeypatch):
+    monkeypatch.setattr(config, 'AI_CACHE_ENABLED', False)
+    generate = Generator()
+    
+    cache.get_or_generate('recommendation', {'prompt': 'p'}, generate)
+    cache.get_or_generate('recommendation', {'prompt': 'p'}, generate)
+    
+    assert generate.calls == 2
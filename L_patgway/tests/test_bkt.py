@@ -0,0 +1,12 @@
+"""BKT observations read quiz scores as percentages."""
+
+import pytest
+
+from L_patgway import config
+from L_patgway.bkt import is_correct
+
+
+@pytest.mark.parametrize('score, correct', [(0, False), (1, False), (59.9, False), (60, True), (100, True)])
+def test_scores_are_percentages(monkeypatch, score, correct):
+    monkeypatch.setattr(config, 'BKT_CORRECT_THRESHOLD', 0.6)
+    assert is_correct(score) is correct
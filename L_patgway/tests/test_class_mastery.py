@@ -0,0 +1,80 @@
+"""GET /api/concept-mastery/class/<module>: staff only, and cells match the per-student mastery."""
+
+import math
+
+import pytest
+
+from L_patgway import config
+from L_patgway.concept_mastery import concept_mastery_service
+from L_patgway.mastery_store import concept_mastery_store
+
+from conftest import add_student, auth
+
+TEACHER = auth('teacher', 'teacher-1')
+
+
+def class_matrix(client, module_name='Math', headers=TEACHER):
+    return client.get(f'/api/concept-mastery/class/{module_name}', headers=headers)
+
+
+@pytest.mark.parametrize('backend', ['recompute', 'materialized'])
+def test_cells_match_per_student_mastery(client, db, monkeypatch, backend):
+    monkeypatch.setattr(config, 'MASTERY_BACKEND', backend)
+    monkeypatch.setattr(config, 'QUERY_MODE', 'python')
+    student_ids = [add_student(db, scores) for scores in [(20, 30), (60, 70, 55, 40), (95, 90, 85, 99, 100)]]
+    add_student(db, (50,), module_name='Physics')
+    if backend == 'materialized':
+        concept_mastery_store.rebuild(student_ids)
+    
+    data = class_matrix(client).get_json()['data']
+    
+    assert data['students'] == student_ids
+    assert data['student_count'] == 3 and data['concept_count'] == len(data['concepts'])
+    for row, student_id in enumerate(student_ids):
+        expected = {c['concept_name']: c['mastery_percentage']
+                    for c in concept_mastery_service.get_concept_mastery(student_id)['concepts']
+                    if c['total_attempts'] or c['engagement_count']}
+        cells = {concept: column[row] for concept, column in zip(data['concepts'], data['mastery'])}
+        assert expected
+        assert {concept: value for concept, value in cells.items() if value is not None} == pytest.approx(expected)
+
+
+def test_statistics_are_aligned_with_the_columns(client, db):
+    for scores in [(20, 30), (60, 70, 55, 40), (95, 90, 85, 99, 100)]:
+        add_student(db, scores)
+    
+    data = class_matrix(client).get_json()['data']
+    
+    averages = [math.inf if average is None else average for average in data['concept_average']]
+    assert averages == sorted(averages)
+    for index, column in enumerate(data['mastery']):
+        values = [value for value in column if value is not None]
+        assert data['assessed_count'][index] == len(values)
+        assert sum(counts[index] for counts in data['level_distribution'].values()) == len(values)
+        if values:
+            assert data['concept_average'][index] == pytest.approx(sum(values) / len(values), abs=0.01)
+    assert len(data['student_average']) == data['student_count']
+
+
+def test_students_cannot_read_the_class_matrix(client, db):
+    student_id = add_student(db)
+    
+    assert class_matrix(client, headers=auth('student', student_id)).status_code == 403
+    assert class_matrix(client, headers=auth('admin', 'admin-1')).status_code == 200
+
+
+def test_empty_class(client, db):
+    data = class_matrix(client, 'Chemistry').get_json()['data']
+    
+    assert (data['student_count'], data['students'], data['mastery'], data['class_average']) == (0, [], [], 0)
+
+
+def test_oversized_class_is_rejected(client, db, monkeypatch):
+    monkeypatch.setattr(config, 'CLASS_MATRIX_MAX_STUDENTS', 2)
+    for _ in range(3):
+        add_student(db)
+    
+    response = class_matrix(client)
+    
+    assert response.status_code == 400
+    assert '2' in response.get_json()['error']
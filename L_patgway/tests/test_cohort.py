@@ -0,0 +1,72 @@
+"""The vectorized cohort classifier agrees with classify_performance on every branch."""
+
+import itertools
+
+import numpy as np
+
+from L_patgway.benchmarks.bench_cohort import run_per_student, run_vectorized, synthetic_aggregates
+from L_patgway.cohort import classify_arrays, performance_arrays, PATHWAY_TYPES, REASON_CODES
+from L_patgway.learning_pathway import learning_pathway_service
+
+
+def vectorized(average_scores, completion_rates, total_quizzes):
+    result = classify_arrays(average_scores, completion_rates, total_quizzes)
+    return [(PATHWAY_TYPES[label], REASON_CODES[reason]) for label, reason in zip(result['labels'], result['reasons'])]
+
+
+def test_every_threshold_matches_classify_performance():
+    # Both sides of each threshold: BALANCED_MIN 50, LOW_COMPLETION_SCORE_MAX 60, ACCELERATION_MIN 75,
+    # LOW_COMPLETION_RATE 0.5, and no quizzes
+    cases = list(itertools.product(
+        [0, 49.99, 50, 59.99, 60, 74.99, 75, 100],
+        [0, 0.49, 0.5, 1],
+        [0, 1, 12]
+    ))
+    average_scores, completion_rates, total_quizzes = (np.array(column) for column in zip(*cases))
+    
+    actual = vectorized(average_scores, completion_rates, total_quizzes)
+    expected = []
+    for average_score, completion_rate, quizzes in cases:
+        pathway = learning_pathway_service.classify_performance({
+            'average_score': average_score, 'task_completion_rate': completion_rate, 'total_quizzes': quizzes
+        })
+        expected.append((pathway['pathway_type'], pathway['reason_code']))
+    
+    assert actual == expected
+    assert set(expected) == {
+        ('basic', 'foundational_support'), ('balanced', 'normal_progression'),
+        ('acceleration', 'advanced_ready'), ('basic', 'low_completion_adjustment'), ('balanced', 'insufficient_data')
+    }
+
+
+def test_performance_arrays_match_build_performance():
+    aggregates = {
+        'total_quizzes': np.array([0, 3, 7, 4]),
+        'score_sums': np.array([0, 150.0, 412.3, 399.99]),
+        'total_tasks': np.array([0, 3, 0, 9]),
+        'completed_tasks': np.array([0, 1, 0, 9])
+    }
+    
+    arrays = performance_arrays(**aggregates)
+    
+    for index in range(4):
+        performance = learning_pathway_service.build_performance(
+            total_quizzes=int(aggregates['total_quizzes'][index]),
+            total_score=float(aggregates['score_sums'][index]),
+            total_tasks=int(aggregates['total_tasks'][index]),
+            completed_tasks=int(aggregates['completed_tasks'][index]),
+            recent_attempts=0,
+            last_quiz_date=None
+        )
+        assert arrays['average_score'][index] == performance['average_score']
+        assert arrays['task_completion_rate'][index] == performance['task_completion_rate']
+
+
+def test_benchmark_data_reaches_every_branch():
+    aggregates = synthetic_aggregates(5000)
+    
+    expected = run_per_student(aggregates)
+    result = run_vectorized(aggregates)
+    
+    assert [(PATHWAY_TYPES[label], REASON_CODES[reason]) for label, reason in zip(result['labels'], result['reasons'])] == expected
+    assert len(set(expected)) == 5
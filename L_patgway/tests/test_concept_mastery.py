@@ -0,0 +1,60 @@
+"""Single-concept lookups match the full listing, with or without concept_keys tags; pages validate their limit."""
+
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from L_patgway import config
+from L_patgway.concept_mastery import concept_mastery_service
+from L_patgway.mastery_store import concept_mastery_store
+
+from conftest import auth
+
+
+@pytest.fixture(autouse=True)
+def recompute(monkeypatch):
+    monkeypatch.setattr(config, 'MASTERY_BACKEND', 'recompute')
+    monkeypatch.setattr(config, 'QUERY_MODE', 'python')
+
+
+def lookup(student_id, name):
+    entry = concept_mastery_service.get_concept_mastery_by_name(student_id, name)
+    return entry and (entry['mastery_percentage'], entry['total_attempts'], entry['engagement_count'])
+
+
+@pytest.mark.parametrize('name', ['Algebra', ' geometry ', 'FRACTIONS', 'Trig'])
+def test_tagged_lookup_includes_untagged_activities(db, student_id, monkeypatch, name):
+    expected = lookup(student_id, name)
+    
+    # Tag what exists, then write activities the way the app does, without the tag
+    concept_mastery_store.tag_activities()
+    student_oid = ObjectId(student_id)
+    db.learning_activities.insert_one({
+        'user_id': student_oid, 'activity_type': 'quiz_complete', 'score': 40,
+        'metadata': {'concepts': ['Algebra', 'Geometry', 'Fractions', 'Trig']}, 'created_at': datetime.utcnow()
+    })
+    db.engagement_logs.insert_one({
+        'user_id': student_oid, 'activity_type': 'assignment_submit', 'points_earned': 5,
+        'metadata': {'concepts': ['Algebra', 'Geometry', 'Fractions', 'Trig']}, 'created_at': datetime.utcnow()
+    })
+    untagged = lookup(student_id, name)
+    assert untagged != expected
+    
+    monkeypatch.setattr(config, 'CONCEPT_KEYS_TAGGED', True)
+    assert lookup(student_id, name) == untagged
+
+
+@pytest.mark.parametrize('query', ['limit=abc', 'limit=2.5', 'limit=0', 'limit=-1'])
+def test_mastery_page_rejects_bad_limits(client, student_id, query):
+    response = client.get(f'/api/concept-mastery/me?{query}', headers=auth('student', student_id))
+    
+    assert response.status_code == 400
+    assert 'limit' in response.get_json()['error']
+
+
+def test_mastery_page_applies_a_valid_limit(client, student_id):
+    response = client.get('/api/concept-mastery/me?limit=2', headers=auth('student', student_id))
+    
+    assert response.status_code == 200
+    assert len(response.get_json()['data']['concepts']) == 2
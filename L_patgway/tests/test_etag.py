@@ -0,0 +1,74 @@
+"""Polls are answered with 304 until the student's data changes."""
+
+from datetime import datetime
+
+from bson import ObjectId
+
+from L_patgway import config
+from L_patgway.roadmap_snapshots import roadmap_snapshot_store
+
+from conftest import auth
+
+
+def test_unchanged_poll_is_not_modified(client, db, student_id):
+    headers = auth('student', student_id)
+    first = client.get('/api/pathway/me', headers=headers)
+    assert first.status_code == 200
+    assert first.headers['ETag']
+    
+    second = client.get('/api/pathway/me', headers=dict(headers, **{'If-None-Match': first.headers['ETag']}))
+    assert second.status_code == 304
+    assert second.headers['ETag'] == first.headers['ETag']
+
+
+def test_insert_changes_the_etag(client, db, student_id):
+    headers = auth('student', student_id)
+    etag = client.get('/api/pathway/me', headers=headers).headers['ETag']
+    
+    db.engagement_logs.insert_one({
+        'user_id': ObjectId(student_id), 'activity_type': 'assignment_submit', 'created_at': datetime.utcnow()
+    })
+    response = client.get('/api/pathway/me', headers=dict(headers, **{'If-None-Match': etag}))
+    
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert response.get_json()['data']['total_tasks'] == 3
+
+
+def test_teacher_views_get_their_own_etag(client, db, student_id):
+    path = f'/api/pathway/student/{student_id}'
+    etag = client.get(path, headers=auth('teacher', 'teacher-1')).headers['ETag']
+    
+    assert client.get(path, headers=dict(auth('teacher', 'teacher-1'), **{'If-None-Match': etag})).status_code == 304
+    assert client.get('/api/pathway/me', headers=dict(auth('student', student_id), **{'If-None-Match': etag})).status_code == 200
+
+
+def test_roadmap_etag_follows_the_snapshot_version(client, db, student_id, monkeypatch):
+    monkeypatch.setattr(config, 'ROADMAP_SNAPSHOTS', True)
+    monkeypatch.setattr(config, 'ROADMAP_SNAPSHOT_CHECK_INTERVAL', 3600)
+    headers = auth('student', student_id)
+    client.get('/api/roadmap/me', headers=headers)
+    etag = client.get('/api/roadmap/me', headers=headers).headers['ETag']
+    assert client.get('/api/roadmap/me', headers=dict(headers, **{'If-None-Match': etag})).status_code == 304
+    
+    # A background refresh stores a new version without any new activity
+    roadmap_snapshot_store.create_snapshot(student_id, 'mastery_change')
+    response = client.get('/api/roadmap/me', headers=dict(headers, **{'If-None-Match': etag}))
+    
+    assert response.status_code == 200
+    assert response.get_json()['snapshot']['version'] == 2
+
+
+def test_not_modified_roadmap_still_schedules_refresh(client, db, student_id, monkeypatch):
+    monkeypatch.setattr(config, 'ROADMAP_SNAPSHOTS', True)
+    monkeypatch.setattr(config, 'ROADMAP_SNAPSHOT_CHECK_INTERVAL', 3600)
+    headers = auth('student', student_id)
+    client.get('/api/roadmap/me', headers=headers)
+    etag = client.get('/api/roadmap/me', headers=headers).headers['ETag']
+    
+    scheduled = []
+    monkeypatch.setattr(roadmap_snapshot_store, 'schedule_refresh', scheduled.append)
+    monkeypatch.setattr(config, 'ROADMAP_SNAPSHOT_CHECK_INTERVAL', 0)
+    
+    assert client.get('/api/roadmap/me', headers=dict(headers, **{'If-None-Match': etag})).status_code == 304
+    assert scheduled == [student_id]
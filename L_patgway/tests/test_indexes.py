@@ -0,0 +1,96 @@
+"""verify_query_plans flags service queries that no index serves, in every mode."""
+
+import importlib
+
+import pytest
+
+from L_patgway import config
+from L_patgway.concept_mastery import concept_mastery_service
+from L_patgway.indexes import _collection_scans, ensure_indexes, record_service_queries, verify_query_plans
+from L_patgway.learning_pathway import learning_pathway_service
+
+
+def test_collection_scans_only_reads_winning_plans():
+    explain = {'queryPlanner': {
+        'winningPlan': {'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN', 'indexName': 'ilpg_user_id'}},
+        'rejectedPlans': [{'stage': 'COLLSCAN', 'filter': {'user_id': 1}}]
+    }}
+    assert _collection_scans(explain) == []
+    
+    explain['queryPlanner']['winningPlan'] = {'stage': 'COLLSCAN', 'filter': {'user_id': 1}}
+    assert _collection_scans(explain) == ["{'user_id': 1}"]
+
+
+def test_collection_scans_reads_aggregation_and_sbe_plans():
+    explain = {'stages': [
+        {'$cursor': {'queryPlanner': {'winningPlan': {'queryPlan': {'stage': 'COLLSCAN'}}}}},
+        {'$group': {'_id': '$concept'}}
+    ]}
+    assert _collection_scans(explain) == ['{}']
+
+
+class ExplainingDatabase:
+    """
+    mongomock has no explain; plan a query as an IXSCAN when an index's
+    leading field is in its filter (or the pipeline's first $match).
+    """
+    
+    def __init__(self, db):
+        self._db = db
+    
+    def __getitem__(self, name):
+        return self._db[name]
+    
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+    
+    def command(self, command):
+        query = command['explain']
+        if 'find' in query:
+            collection, fields = query['find'], query['filter']
+        else:
+            collection, first = query['aggregate'], query['pipeline'][0]
+            fields = first.get('$match', {})
+        leading = {list(index['key'])[0][0] for index in self._db[collection].index_information().values()}
+        stage = 'IXSCAN' if leading & set(fields) else 'COLLSCAN'
+        return {'queryPlanner': {'winningPlan': {'stage': stage, 'filter': fields}}}
+
+
+@pytest.mark.parametrize('mastery_backend', ['recompute', 'materialized'])
+def test_verify_passes_once_indexes_exist(db, student_id, monkeypatch, mastery_backend):
+    monkeypatch.setattr(config, 'MASTERY_BACKEND', mastery_backend)
+    database = ExplainingDatabase(db)
+    
+    problems = verify_query_plans(student_id, database)
+    assert any(problem.startswith('COLLSCAN on learning_activities') for problem in problems)
+    
+    ensure_indexes(db)
+    assert verify_query_plans(student_id, database) == []
+
+
+def test_every_mode_reads_the_database(db, student_id, monkeypatch):
+    monkeypatch.setattr(config, 'RESULT_CACHE_ENABLED', True)
+    # Warm the result cache the way a dashboard poll would
+    concept_mastery_service.get_concept_mastery(student_id)
+    learning_pathway_service.get_student_pathway(student_id)
+    
+    reads = {(query['collection'], 'find' if 'find' in query else 'aggregate') for query in record_service_queries(student_id, db)}
+    
+    assert ('learning_activities', 'aggregate') in reads
+    assert (config.MASTERY_STATE_COLLECTION, 'find') in reads
+    assert (config.PERFORMANCE_ROLLUP_COLLECTION, 'aggregate') in reads
+    assert config.RESULT_CACHE_ENABLED
+
+
+def test_startup_builds_indexes_in_the_background(db, monkeypatch):
+    indexes_module = importlib.import_module('L_patgway.indexes')
+    monkeypatch.setattr(indexes_module, '_startup_done', False)
+    assert indexes_module.ensure_indexes_on_startup() is None
+    
+    monkeypatch.setattr(config, 'ENSURE_INDEXES_ON_STARTUP', True)
+    thread = indexes_module.ensure_indexes_on_startup()
+    thread.join(5)
+    
+    assert 'ilpg_user_id_activity_type_score' in db.learning_activities.index_information()
+    # Once per process
+    assert indexes_module.ensure_indexes_on_startup() is None
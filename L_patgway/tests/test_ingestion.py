@@ -0,0 +1,84 @@
+"""Bulk ingestion: who may submit which events, and the score scale."""
+
+import pytest
+from bson import ObjectId
+
+from L_patgway import config
+
+from conftest import auth
+
+
+@pytest.fixture(autouse=True)
+def recompute(monkeypatch):
+    monkeypatch.setattr(config, 'MASTERY_BACKEND', 'recompute')
+    monkeypatch.setattr(config, 'PERFORMANCE_BACKEND', 'recompute')
+
+
+def ingest(client, headers, *events):
+    return client.post('/api/ilpg/events/bulk', json={'events': list(events)}, headers=headers)
+
+
+@pytest.mark.parametrize('event', [
+    {'type': 'quiz', 'score': 100, 'concepts': ['Algebra']},
+    {'type': 'lesson', 'score': 100},
+])
+def test_students_cannot_report_scores(client, db, event):
+    student_id = str(ObjectId())
+    
+    response = ingest(client, auth('student', student_id), event)
+    
+    assert response.status_code == 403
+    assert db.learning_activities.count_documents({}) == 0
+
+
+def test_students_report_their_own_lessons(client, db):
+    student_id = str(ObjectId())
+    headers = auth('student', student_id)
+    
+    assert ingest(client, headers, {'type': 'lesson', 'student_id': str(ObjectId())}).status_code == 403
+    response = ingest(client, headers, {'type': 'lesson', 'lesson_id': str(ObjectId())},
+                      {'type': 'assignment', 'student_id': student_id})
+    
+    assert response.status_code == 200
+    assert response.get_json()['data']['inserted'] == 2
+
+
+@pytest.mark.parametrize('event', [
+    {'type': 'assignment', 'status': 'completed'},
+    {'type': 'assignment', 'points_earned': 5},
+    {'type': 'lesson', 'concepts': ['Algebra']},
+    {'type': 'lesson', 'topic': 'Algebra'},
+    {'type': 'lesson', 'topic_name': 'Trig', 'module_name': 'Math'},
+    {'type': 'lesson', 'occurred_at': '2020-01-01T00:00:00Z'},
+])
+def test_students_cannot_set_server_side_fields(client, db, event):
+    student_id = str(ObjectId())
+    
+    response = ingest(client, auth('student', student_id), {'type': 'lesson'}, event)
+    
+    assert response.status_code == 403
+    assert db.learning_activities.count_documents({}) == db.engagement_logs.count_documents({}) == 0
+
+
+@pytest.mark.parametrize('role', ['service', 'parent'])
+def test_only_teachers_and_admins_are_trusted(client, db, role):
+    event = {'type': 'quiz', 'student_id': str(ObjectId()), 'score': 90}
+    
+    assert ingest(client, auth(role, 'caller-1'), event).status_code == 403
+    assert ingest(client, auth('admin', 'admin-1'), event).status_code == 200
+
+
+@pytest.mark.parametrize('performance_backend', ['recompute', 'rollup'])
+def test_ingested_scores_are_pathway_percentages(client, db, monkeypatch, performance_backend):
+    monkeypatch.setattr(config, 'PERFORMANCE_BACKEND', performance_backend)
+    student_id = str(ObjectId())
+    quiz = {'type': 'quiz', 'student_id': student_id, 'concepts': ['Algebra']}
+    
+    response = ingest(client, auth('teacher', 'teacher-1'), dict(quiz, score=80), dict(quiz, score=60), dict(quiz, score=800))
+    
+    assert response.get_json()['data']['inserted'] == 2
+    pathway = client.get(f'/api/pathway/student/{student_id}', headers=auth('teacher', 'teacher-1')).get_json()['data']
+    assert pathway['average_score'] == 70
+    assert pathway['pathway_type'] == 'balanced'
+    mastery = client.get(f'/api/concept-mastery/student/{student_id}', headers=auth('teacher', 'teacher-1')).get_json()
+    assert mastery['data']['concepts'][0]['mastery_percentage'] == 70
@@ -0,0 +1,31 @@
+"""average_score is on the 0-100 quiz scale the pathway thresholds use, in every query mode."""
+
+import pytest
+
+from L_patgway import config
+from L_patgway.learning_pathway import learning_pathway_service
+from L_patgway.rollups import performance_rollup_store
+
+from conftest import add_student
+
+
+@pytest.mark.parametrize('query_mode, performance_backend', [
+    ('python', 'recompute'), ('aggregation', 'recompute'), ('python', 'rollup')
+])
+@pytest.mark.parametrize('scores, average_score, pathway_type', [
+    ((40, 45), 42.5, 'basic'),
+    ((60, 70), 65.0, 'balanced'),
+    ((80, 90), 85.0, 'acceleration'),
+])
+def test_average_score_is_a_percentage(db, monkeypatch, query_mode, performance_backend,
+                                       scores, average_score, pathway_type):
+    monkeypatch.setattr(config, 'QUERY_MODE', query_mode)
+    monkeypatch.setattr(config, 'PERFORMANCE_BACKEND', performance_backend)
+    student_id = add_student(db, scores)
+    if performance_backend == 'rollup':
+        performance_rollup_store.rebuild([student_id])
+    
+    pathway = learning_pathway_service.get_student_pathway(student_id)['data']
+    
+    assert pathway['average_score'] == average_score <= config.QUIZ_SCORE_MAX
+    assert pathway['pathway_type'] == pathway_type
@@ -0,0 +1,130 @@
+"""The change watcher keeps the materialized store current with writes made outside ingestion."""
+
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from L_patgway import config
+from L_patgway.concept_mastery import concept_mastery_service
+from L_patgway.ingestion import ingestion_service
+from L_patgway.mastery_store import concept_mastery_store, main
+from L_patgway.result_cache import ActivityChangeWatcher, StudentResultCache
+from L_patgway.rollups import performance_rollup_store
+from L_patgway.student_context import StudentContext
+
+
+@pytest.fixture(autouse=True)
+def materialized(monkeypatch):
+    monkeypatch.setattr(config, 'MASTERY_BACKEND', 'materialized')
+
+
+FIELDS = ('score_sum', 'score_count', 'engagement_count', 'has_content')
+
+
+def stored(student_id):
+    return {
+        name: {field: state[field] for field in FIELDS}
+        for name, state in concept_mastery_store.load_states(student_id).items()
+        if state['score_count'] or state['engagement_count'] or state['has_content']
+    }
+
+
+def recomputed(student_id):
+    context = StudentContext(student_id)
+    states = concept_mastery_service.aggregate_concept_states(
+        quizzes=context.get_quizzes(),
+        lessons=context.get_lessons(),
+        assignments=context.get_tasks(),
+        structured_contents=context.get_structured_contents()
+    )
+    return {name: {field: state[field] for field in FIELDS} for name, state in states.items()}
+
+
+def publish(watcher, db, collection, document, operation_type='insert'):
+    if operation_type == 'insert':
+        db[collection].insert_one(document)
+    watcher.handle({'ns': {'coll': collection}, 'operationType': operation_type, 'fullDocument': document})
+
+
+def test_watcher_applies_other_components_writes(db, student_id):
+    concept_mastery_store.rebuild([student_id])
+    watcher = ActivityChangeWatcher(cache=StudentResultCache(), db=db)
+    student_oid = ObjectId(student_id)
+    
+    publish(watcher, db, 'learning_activities', {
+        'user_id': student_oid, 'activity_type': 'quiz_complete', 'score': 70,
+        'metadata': {'concept': 'Vectors'}, 'created_at': datetime.utcnow()
+    })
+    publish(watcher, db, 'structured_contents', {
+        'module_name': 'Physics', 'topic_name': 'Motion', 'approved': True, 'status': 'published'
+    })
+    publish(watcher, db, 'enrollments', {'student_id': student_oid, 'module_name': 'Physics'})
+    
+    assert stored(student_id)['Vectors']['score_count'] == 1
+    assert stored(student_id)['Motion']['has_content'] is True
+    assert stored(student_id) == recomputed(student_id)
+
+
+def test_watcher_skips_ingested_activities(db, student_id):
+    concept_mastery_store.rebuild([student_id])
+    watcher = ActivityChangeWatcher(cache=StudentResultCache(), db=db)
+    ingestion_service.ingest_events([{'type': 'quiz', 'student_id': student_id, 'score': 40, 'topic': 'Algebra'}])
+    
+    activity = db.learning_activities.find_one({'source': 'ilpg_bulk'})
+    watcher.handle({'ns': {'coll': 'learning_activities'}, 'operationType': 'insert', 'fullDocument': activity})
+    
+    assert stored(student_id) == recomputed(student_id)
+
+
+def test_watcher_rebuilds_on_edits(db, student_id):
+    concept_mastery_store.rebuild([student_id])
+    watcher = ActivityChangeWatcher(cache=StudentResultCache(), db=db)
+    quiz = db.learning_activities.find_one({'user_id': ObjectId(student_id), 'activity_type': 'quiz_complete'})
+    db.learning_activities.update_one({'_id': quiz['_id']}, {'$set': {'score': 100}})
+    
+    publish(watcher, db, 'learning_activities', db.learning_activities.find_one({'_id': quiz['_id']}), 'update')
+    
+    assert stored(student_id) == recomputed(student_id)
+
+
+def test_refresh_command_picks_up_enrollments(db, student_id):
+    concept_mastery_store.rebuild([student_id])
+    db.structured_contents.insert_one({'module_name': 'Physics', 'topic_name': 'Motion', 'approved': True, 'status': 'approved'})
+    db.enrollments.insert_one({'student_id': ObjectId(student_id), 'module_name': 'Physics'})
+    assert 'Motion' not in stored(student_id)
+    
+    assert main(['refresh', '--module', 'Physics']) == 0
+    assert stored(student_id) == recomputed(student_id)
+
+
+def test_each_change_is_applied_once(db, student_id, monkeypatch):
+    monkeypatch.setattr(config, 'PERFORMANCE_BACKEND', 'rollup')
+    concept_mastery_store.rebuild([student_id])
+    performance_rollup_store.rebuild([student_id])
+    # Two worker processes see the same change stream
+    workers = [ActivityChangeWatcher(cache=StudentResultCache(), db=db) for _ in range(2)]
+    activity = {
+        '_id': ObjectId(), 'user_id': ObjectId(student_id), 'activity_type': 'quiz_complete', 'score': 70,
+        'metadata': {'concept': 'Vectors'}, 'created_at': datetime.utcnow()
+    }
+    db.learning_activities.insert_one(activity)
+    change = {'_id': {'_data': 'event-1'}, 'ns': {'coll': 'learning_activities'},
+              'operationType': 'insert', 'fullDocument': activity}
+    
+    for watcher in workers + workers:
+        watcher.handle(change)
+    
+    assert stored(student_id)['Vectors']['score_count'] == 1
+    assert stored(student_id) == recomputed(student_id)
+    assert performance_rollup_store.performance_stats([student_id])[student_id]['total_quizzes'] == 6
+
+
+def test_resume_token_survives_restarts(db):
+    watcher = ActivityChangeWatcher(cache=StudentResultCache(), db=db)
+    watcher.handle({'_id': {'_data': 'event-7'}, 'ns': {'coll': 'enrollments'}, 'operationType': 'delete'})
+    watcher.stop()
+    
+    restarted = ActivityChangeWatcher(cache=StudentResultCache(), db=db)
+    restarted._load_resume_token()
+    assert restarted._resume_token == {'_data': 'event-7'}
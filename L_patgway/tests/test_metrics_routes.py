@@ -0,0 +1,27 @@
+"""/api/ilpg/metrics is only served to scrapers and staff."""
+
+import pytest
+
+from L_patgway import config
+
+from conftest import auth
+
+
+@pytest.mark.parametrize('headers, status', [
+    ({}, 401),
+    (auth('student', 'student-1'), 403),
+    (auth('teacher', 'teacher-1'), 200),
+    (auth('admin', 'admin-1'), 200),
+])
+def test_metrics_need_a_staff_token(client, headers, status):
+    assert client.get('/api/ilpg/metrics', headers=headers).status_code == status
+
+
+def test_metrics_token_for_scrapers(client, monkeypatch):
+    monkeypatch.setattr(config, 'METRICS_TOKEN', 'scrape-secret')
+    
+    response = client.get('/api/ilpg/metrics', headers={'Authorization': 'Bearer scrape-secret'})
+    
+    assert response.status_code == 200
+    assert 'ilpg_cache_entries' in response.get_data(as_text=True)
+    assert client.get('/api/ilpg/metrics', headers={'Authorization': 'Bearer student:student-1'}).status_code == 403
@@ -0,0 +1,68 @@
+"""POST /api/pathway/batch: staff only, and the same pathways as the per-student route."""
+
+import pytest
+from bson import ObjectId
+
+from L_patgway import config
+from L_patgway.learning_pathway import learning_pathway_service
+from L_patgway.rollups import performance_rollup_store
+
+from conftest import add_student, auth
+
+TEACHER = auth('teacher', 'teacher-1')
+
+
+def batch(client, student_ids, headers=TEACHER):
+    return client.post('/api/pathway/batch', json={'student_ids': student_ids}, headers=headers)
+
+
+@pytest.mark.parametrize('query_mode, performance_backend', [
+    ('python', 'recompute'), ('aggregation', 'recompute'), ('python', 'rollup')
+])
+def test_batch_matches_single_pathways(client, db, monkeypatch, query_mode, performance_backend):
+    monkeypatch.setattr(config, 'QUERY_MODE', query_mode)
+    monkeypatch.setattr(config, 'PERFORMANCE_BACKEND', performance_backend)
+    monkeypatch.setattr(config, 'RESULT_CACHE_ENABLED', False)
+    student_ids = [add_student(db, scores) for scores in [(20, 30), (60, 70, 55), (95, 90, 85, 99)]]
+    if performance_backend == 'rollup':
+        performance_rollup_store.rebuild(student_ids)
+    
+    data = batch(client, student_ids + [student_ids[0]]).get_json()['data']
+    
+    assert list(data) == student_ids
+    for student_id in student_ids:
+        single = learning_pathway_service.get_student_pathway(student_id)['data']
+        assert data[student_id]['pathway_type'] == single['pathway_type']
+        assert data[student_id]['average_score'] == single['average_score']
+        assert data[student_id]['total_tasks'] == single['total_tasks']
+    assert [data[s]['pathway_type'] for s in student_ids] == ['basic', 'balanced', 'acceleration']
+
+
+def test_students_without_activity_get_default_pathways(client, db, student_id):
+    unknown = str(ObjectId())
+    
+    data = batch(client, [student_id, unknown]).get_json()['data']
+    
+    assert data[unknown]['total_quizzes'] == 0
+    assert data[unknown]['pathway_type'] == 'balanced'
+    assert data[student_id]['total_quizzes'] == 5
+
+
+def test_batch_is_staff_only(client, db, student_id):
+    assert batch(client, [student_id], headers=auth('student', student_id)).status_code == 403
+    assert batch(client, [student_id], headers={}).status_code == 401
+    assert batch(client, [student_id], headers=auth('admin', 'admin-1')).status_code == 200
+
+
+@pytest.mark.parametrize('student_ids', [[], 'not a list', ['not-an-id']])
+def test_invalid_batches_are_rejected(client, db, student_ids):
+    assert batch(client, student_ids).status_code == 400
+
+
+def test_batch_size_is_capped(client, db, monkeypatch):
+    monkeypatch.setattr(config, 'PATHWAY_BATCH_MAX_STUDENTS', 2)
+    
+    response = batch(client, [str(ObjectId()) for _ in range(3)])
+    
+    assert response.status_code == 400
+    assert 'At most 2' in response.get_json()['error']
@@ -0,0 +1,62 @@
+"""QUERY_MODE=aggregation produces the same concepts and performance as the Python path."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from L_patgway import config, pipelines
+from L_patgway.concept_mastery import concept_mastery_service
+from L_patgway.student_context import StudentContext
+
+from conftest import add_student
+
+
+@pytest.fixture(params=['mongomock', 'mongod'])
+def database(request, db):
+    return db if request.param == 'mongomock' else request.getfixturevalue('mongod_db')
+
+
+def add_edge_cases(db, student_id):
+    """Activities exercising each extract_concepts() fallback rule."""
+    student_oid = ObjectId(student_id)
+    now = datetime.utcnow()
+    quiz = {'user_id': student_oid, 'activity_type': 'quiz_complete'}
+    db.learning_activities.insert_many([
+        # metadata.concepts is not an array: falls through to metadata.concept
+        dict(quiz, score=60, metadata={'concepts': 'Algebra', 'concept': 'Limits'}, created_at=now),
+        # Empty array, blank and duplicate names
+        dict(quiz, score=45, metadata={'concepts': [], 'topic': '  '}, topic_name='Limits', created_at=now),
+        dict(quiz, score=80, metadata={'concepts': ['Limits', 'Limits', ' ']}, created_at=now - timedelta(days=9)),
+        # No concepts at all: quiz_<id>
+        dict(quiz, score=10, quiz_id=ObjectId(), metadata={}, created_at=now - timedelta(days=20)),
+        # Ids as the only concepts
+        dict(quiz, score=90, quiz_id=ObjectId(), course_id=ObjectId(), created_at=now),
+        # Unscored quizzes are ignored
+        dict(quiz, score=None, metadata={'concept': 'Limits'}, created_at=now),
+        {'user_id': student_oid, 'activity_type': 'lesson_complete', 'course_id': 'intro', 'created_at': now}
+    ])
+    db.engagement_logs.insert_many([
+        {'user_id': student_oid, 'activity_type': 'assignment_submit', 'metadata': {'status': 'completed'},
+         'module_name': 'Math', 'created_at': now},
+        {'user_id': student_oid, 'activity_type': 'assignment_submit', 'quiz_id': ObjectId(), 'created_at': now}
+    ])
+
+
+def test_aggregation_mode_matches_python_mode(database, monkeypatch):
+    monkeypatch.setattr(config, 'MASTERY_BACKEND', 'recompute')
+    monkeypatch.setattr(config, 'PERFORMANCE_BACKEND', 'recompute')
+    student_id = add_student(database)
+    add_edge_cases(database, student_id)
+    
+    assert pipelines.verify_parity(student_id) == []
+
+
+def test_aggregation_mode_reports_concepts(database, monkeypatch):
+    monkeypatch.setattr(config, 'MASTERY_BACKEND', 'recompute')
+    monkeypatch.setattr(config, 'QUERY_MODE', 'aggregation')
+    student_id = add_student(database)
+    add_edge_cases(database, student_id)
+    
+    concepts = {c['concept_name'] for c in concept_mastery_service.calculate_concept_mastery(student_id, StudentContext(student_id))}
+    assert {'Algebra', 'Geometry', 'Fractions', 'Limits', 'Trig', 'course_intro'} <= concepts
@@ -0,0 +1,150 @@
+"""recompute_job: checkpoints follow finished batches in id order, and resumed runs skip them."""
+
+import importlib
+from concurrent.futures import Future
+
+import pytest
+from bson import ObjectId
+
+from L_patgway import config
+from L_patgway.recompute_job import recompute_job
+
+from conftest import add_student
+
+# The module, for patching recompute_batch and wait
+job_module = importlib.import_module('L_patgway.recompute_job')
+
+
+@pytest.fixture(autouse=True)
+def recompute(monkeypatch):
+    monkeypatch.setattr(config, 'MASTERY_BACKEND', 'recompute')
+    monkeypatch.setattr(config, 'PERFORMANCE_BACKEND', 'recompute')
+
+
+@pytest.fixture
+def students(db):
+    return sorted((add_student(db) for _ in range(7)), key=ObjectId)
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    """Records each batch a run computes."""
+    computed = []
+    compute = job_module.recompute_batch
+    
+    def recording(run_id, student_ids):
+        computed.append(list(student_ids))
+        return compute(run_id, student_ids)
+    monkeypatch.setattr(job_module, 'recompute_batch', recording)
+    return computed
+
+
+def results(db):
+    return db[config.RECOMPUTE_RESULTS_COLLECTION]
+
+
+def test_run_recomputes_every_student(db, students, batches):
+    run = recompute_job.start_run(module_names=['Math'])
+    
+    run = recompute_job.run(run, workers=0, batch_size=3)
+    
+    assert batches == [students[0:3], students[3:6], students[6:7]]
+    assert (run['status'], run['processed'], run['failed']) == ('completed', 7, 0)
+    assert run['checkpoint'] == ObjectId(students[-1])
+    stored = results(db).find_one({'student_id': ObjectId(students[0])})
+    assert stored['run_id'] == run['_id']
+    assert stored['pathway']['pathway_type'] and stored['concept_mastery']['concepts']
+    assert results(db).count_documents({}) == 7
+
+
+def test_interrupted_run_resumes_after_its_checkpoint(db, students, batches, monkeypatch):
+    compute = job_module.recompute_batch
+    
+    def crash_on_third_batch(run_id, student_ids):
+        if len(batches) == 2:
+            raise KeyboardInterrupt
+        return compute(run_id, student_ids)
+    monkeypatch.setattr(job_module, 'recompute_batch', crash_on_third_batch)
+    run = recompute_job.start_run(student_ids=students)
+    
+    with pytest.raises(KeyboardInterrupt):
+        recompute_job.run(run, workers=0, batch_size=2)
+    
+    failed = recompute_job.runs.find_one({'_id': run['_id']})
+    assert (failed['status'], failed['processed']) == ('failed', 4)
+    assert failed['checkpoint'] == ObjectId(students[3])
+    
+    monkeypatch.setattr(job_module, 'recompute_batch', compute)
+    batches.clear()
+    finished = recompute_job.run(recompute_job.resume_run(run['_id']), workers=0, batch_size=2)
+    
+    assert batches == [students[4:6], students[6:7]]
+    assert (finished['status'], finished['processed']) == ('completed', 7)
+    assert results(db).count_documents({}) == 7
+
+
+class ImmediateExecutor:
+    """ProcessPoolExecutor stand-in that runs each batch when it is submitted."""
+    
+    def __init__(self, *args, **kwargs):
+        pass
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        return False
+    
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+def test_checkpoint_waits_for_earlier_batches(db, students, monkeypatch):
+    monkeypatch.setattr(job_module, 'ProcessPoolExecutor', ImmediateExecutor)
+    
+    # Batches finish newest first: the pool reports the last submitted future
+    def newest_first(futures, return_when):
+        newest = list(futures)[-1]
+        return {newest}, set(futures) - {newest}
+    monkeypatch.setattr(job_module, 'wait', newest_first)
+    checkpoints = []
+    checkpoint = recompute_job._checkpoint
+    
+    def recording(run_id, last_student_id, counts):
+        checkpoints.append(last_student_id)
+        checkpoint(run_id, last_student_id, counts)
+    monkeypatch.setattr(recompute_job, '_checkpoint', recording)
+    run = recompute_job.start_run(student_ids=students)
+    
+    run = recompute_job.run(run, workers=1, batch_size=2)
+    
+    # Every batch is checkpointed once, in id order, although batch 1 finished before batch 0
+    assert checkpoints == [students[1], students[3], students[5], students[6]]
+    assert (run['status'], run['processed']) == ('completed', 7)
+
+
+def test_resume_rejects_unknown_and_completed_runs(db, students):
+    run = recompute_job.run(recompute_job.start_run(student_ids=students[:1]), workers=0)
+    
+    with pytest.raises(ValueError, match='already completed'):
+        recompute_job.resume_run(run['_id'])
+    with pytest.raises(ValueError, match='Unknown run'):
+        recompute_job.resume_run('missing')
+
+
+def test_module_runs_only_cover_enrolled_students(db, students, batches):
+    physics = add_student(db, module_name='Physics')
+    
+    recompute_job.run(recompute_job.start_run(module_names=['Physics']), workers=0)
+    
+    assert batches == [[physics]]
+
+
+def test_full_run_streams_every_student_once(mongod_db, batches):
+    student_ids = sorted((add_student(mongod_db) for _ in range(3)), key=ObjectId)
+    
+    recompute_job.run(recompute_job.start_run(), workers=0, batch_size=2)
+    
+    assert batches == [student_ids[0:2], student_ids[2:3]]
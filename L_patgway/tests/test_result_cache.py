@@ -0,0 +1,87 @@
+"""ActivityChangeWatcher invalidates cached results for the students whose data changed."""
+
+import importlib
+import os
+import time
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from L_patgway import config
+from L_patgway.learning_pathway import learning_pathway_service
+from L_patgway.result_cache import ActivityChangeWatcher, LocalChangeStream, student_result_cache
+
+from conftest import add_student
+
+
+@pytest.fixture
+def stream(monkeypatch):
+    monkeypatch.setattr(config, 'RESULT_CACHE_ENABLED', True)
+    monkeypatch.setattr(config, 'PERFORMANCE_BACKEND', 'recompute')
+    monkeypatch.setattr(config, 'MASTERY_BACKEND', 'recompute')
+    stream = LocalChangeStream()
+    watcher = ActivityChangeWatcher(stream_factory=lambda: stream)
+    watcher.start()
+    yield stream
+    watcher.stop(timeout=5)
+
+
+def wait_for_invalidations(count: int) -> None:
+    deadline = time.monotonic() + 5
+    while student_result_cache.invalidations < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def quizzes(student_id: str) -> int:
+    return learning_pathway_service.get_student_pathway(student_id)['data']['total_quizzes']
+
+
+def test_insert_invalidates_only_that_student(db, stream):
+    changed, unchanged = add_student(db), add_student(db)
+    before = {student: quizzes(student) for student in (changed, unchanged)}
+    
+    # Written behind the cache's back; the cached pathways are now stale
+    activity = {'user_id': ObjectId(changed), 'activity_type': 'quiz_complete', 'score': 70,
+                'metadata': {'concept': 'Algebra'}, 'created_at': datetime.utcnow()}
+    db.learning_activities.insert_one(activity)
+    db.learning_activities.insert_one(dict(activity, _id=ObjectId(), user_id=ObjectId(unchanged)))
+    assert quizzes(changed) == before[changed]
+    
+    invalidations = student_result_cache.invalidations
+    stream.publish('learning_activities', activity)
+    wait_for_invalidations(invalidations + 1)
+    
+    assert quizzes(changed) == before[changed] + 1
+    assert quizzes(unchanged) == before[unchanged]
+
+
+def test_delete_without_document_clears_everything(db, stream):
+    student = add_student(db)
+    before = quizzes(student)
+    db.learning_activities.delete_one({'user_id': ObjectId(student), 'activity_type': 'quiz_complete'})
+    
+    invalidations = student_result_cache.invalidations
+    stream.publish('learning_activities', None, operation_type='delete')
+    wait_for_invalidations(invalidations + 1)
+    
+    assert quizzes(student) == before - 1
+
+
+@pytest.mark.parametrize('environ, enabled', [
+    ({}, False),
+    ({'ILPG_RESULT_CACHE_WATCH': 'true'}, True),
+    ({'ILPG_RESULT_CACHE_ENABLED': 'true'}, True),
+    ({'ILPG_RESULT_CACHE_WATCH': 'true', 'ILPG_RESULT_CACHE_ENABLED': 'false'}, False),
+])
+def test_cache_is_off_by_default_without_the_watcher(environ, enabled):
+    names = ('ILPG_RESULT_CACHE_WATCH', 'ILPG_RESULT_CACHE_ENABLED')
+    saved = {name: os.environ.pop(name, None) for name in names}
+    os.environ.update(environ)
+    try:
+        assert importlib.reload(config).RESULT_CACHE_ENABLED is enabled
+    finally:
+        for name in names:
+            os.environ.pop(name, None)
+        os.environ.update({name: value for name, value in saved.items() if value is not None})
+        importlib.reload(config)
@@ -0,0 +1,159 @@
+"""Roadmap AI calls run concurrently (or batched) and fall back to template text."""
+
+import importlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from L_patgway import config
+from L_patgway.roadmap_service import roadmap_service
+
+# The package re-exports the service instance under the module's name
+roadmap_module = importlib.import_module('L_patgway.roadmap_service')
+
+
+class SleepingAIService:
+    """Answers every prompt after `delay` seconds; `release` ends a sleep early."""
+    
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.calls = 0
+        self.release = threading.Event()
+    
+    def generate_recommendation(self, prompt, max_tokens=200):
+        self.calls += 1
+        self.release.wait(self.delay)
+        return 'AI recommendation'
+    
+    def generate_action_items(self, concept_name, mastery_percentage, pathway_type, max_items=5):
+        self.calls += 1
+        self.release.wait(self.delay)
+        return ['AI action']
+
+
+@pytest.fixture
+def ai(monkeypatch):
+    monkeypatch.setattr(config, 'MASTERY_BACKEND', 'recompute')
+    monkeypatch.setattr(config, 'PERFORMANCE_BACKEND', 'recompute')
+    monkeypatch.setattr(config, 'ROADMAP_AI_MODE', 'per_section')
+    monkeypatch.setattr(config, 'AI_MAX_WORKERS', 8)
+    executor = ThreadPoolExecutor(max_workers=8)
+    monkeypatch.setattr(roadmap_module, '_ai_executor', executor)
+    monkeypatch.setattr(roadmap_module, '_hung_ai_calls', 0)
+    
+    def install(delay):
+        service = SleepingAIService(delay)
+        monkeypatch.setattr(roadmap_module, 'ai_service', service)
+        return service
+    yield install
+    executor.shutdown(wait=False)
+
+
+def test_calls_run_concurrently(ai, db, student_id):
+    service = ai(0.2)
+    
+    started = time.monotonic()
+    roadmap = roadmap_service.generate_roadmap_guidance(student_id)
+    elapsed = time.monotonic() - started
+    
+    assert service.calls >= 3
+    assert elapsed < service.calls * 0.2 / 2
+    assert all(r['description'] == 'AI recommendation' for r in roadmap['recommendations'])
+
+
+def test_timeout_uses_template_text(ai, db, student_id, monkeypatch):
+    monkeypatch.setattr(config, 'AI_CALL_TIMEOUT', 0.2)
+    service = ai(5)
+    
+    started = time.monotonic()
+    roadmap = roadmap_service.generate_roadmap_guidance(student_id)
+    elapsed = time.monotonic() - started
+    service.release.set()
+    
+    assert elapsed < 1
+    assert roadmap['recommendations']
+    assert all(r['description'] != 'AI recommendation' for r in roadmap['recommendations'])
+
+
+def test_saturated_pool_skips_ai(ai, db, student_id, monkeypatch):
+    monkeypatch.setattr(config, 'AI_CALL_TIMEOUT', 0.1)
+    monkeypatch.setattr(config, 'AI_MAX_WORKERS', 1)
+    monkeypatch.setattr(roadmap_module, '_ai_executor', ThreadPoolExecutor(max_workers=1))
+    service = ai(5)
+    
+    # The first call hangs and holds the only worker past its deadline
+    roadmap_service._run_ai_calls({'hung': lambda: service.generate_recommendation('prompt')})
+    assert roadmap_module._ai_pool_saturated()
+    calls = service.calls
+    
+    started = time.monotonic()
+    assert roadmap_service._run_ai_calls({'next': lambda: service.generate_recommendation('prompt')}) == {'next': None}
+    assert time.monotonic() - started < 0.1
+    assert service.calls == calls
+    
+    service.release.set()
+    roadmap_module._ai_executor.shutdown(wait=True)
+    assert not roadmap_module._ai_pool_saturated()
+
+
+class BatchedAIService:
+    """Answers the batched prompt with `response`, recording each prompt."""
+    
+    def __init__(self, response):
+        self.response = response
+        self.prompts = []
+    
+    def generate_recommendation(self, prompt, max_tokens=200):
+        self.prompts.append(prompt)
+        return self.response
+    
+    def generate_action_items(self, concept_name, mastery_percentage, pathway_type, max_items=5):
+        raise AssertionError('batched mode makes no per-section calls')
+
+
+SECTION_KEYS = ('focus', 'strategy', 'practice', 'pathway', 'engagement')
+
+
+def batched_roadmap(monkeypatch, student_id, response):
+    monkeypatch.setattr(config, 'MASTERY_BACKEND', 'recompute')
+    monkeypatch.setattr(config, 'PERFORMANCE_BACKEND', 'recompute')
+    monkeypatch.setattr(config, 'ROADMAP_AI_MODE', 'batched')
+    service = BatchedAIService(response)
+    monkeypatch.setattr(roadmap_module, 'ai_service', service)
+    roadmap = roadmap_service.generate_roadmap_guidance(student_id)
+    assert len(service.prompts) == 1
+    return {r['type']: r for r in roadmap['recommendations']}
+
+
+def test_batched_response_fills_every_section(db, student_id, monkeypatch):
+    body = {key: {'description': f'AI {key}'} for key in SECTION_KEYS}
+    body['focus']['action_items'] = ['Practise daily', ' ', 7]
+    response = 'Here you go:\n```json\n' + json.dumps(body) + '\n```'
+    
+    recommendations = batched_roadmap(monkeypatch, student_id, response)
+    
+    assert recommendations
+    assert all(r['description'] == f'AI {key}' for key, r in recommendations.items())
+    assert recommendations['focus']['action_items'] == ['Practise daily']
+
+
+def test_batched_response_missing_sections_use_templates(db, student_id, monkeypatch):
+    response = json.dumps({'focus': {'description': 'AI focus'}, 'strategy': 'not an object'})
+    
+    recommendations = batched_roadmap(monkeypatch, student_id, response)
+    
+    assert recommendations['focus']['description'] == 'AI focus'
+    # No AI action items: the template ones stay
+    assert recommendations['focus']['action_items']
+    assert all(not r['description'].startswith('AI ') for key, r in recommendations.items() if key != 'focus')
+
+
+@pytest.mark.parametrize('response', [None, '', 'Sorry, I cannot help with that.', '{"focus": {"description": "cut off'])
+def test_unparseable_batched_response_uses_templates(db, student_id, monkeypatch, response):
+    recommendations = batched_roadmap(monkeypatch, student_id, response)
+    
+    assert recommendations
+    assert all(r['description'] and not r['description'].startswith('AI ') for r in recommendations.values())
@@ -0,0 +1,103 @@
+"""Incremental roadmaps regenerate exactly the recommendations whose inputs changed."""
+
+import importlib
+import itertools
+
+import pytest
+
+from L_patgway import config
+from L_patgway.roadmap_service import roadmap_service
+
+# The package re-exports the service instance under the module's name
+roadmap_module = importlib.import_module('L_patgway.roadmap_service')
+
+
+class CountingAIService:
+    """Numbers every answer, so regenerated text differs from reused text."""
+    
+    def __init__(self):
+        self.calls = []
+        self.counter = itertools.count(1)
+    
+    def generate_recommendation(self, prompt, max_tokens=200):
+        self.calls.append('recommendation')
+        return f'AI text {next(self.counter)}'
+    
+    def generate_action_items(self, concept_name, mastery_percentage, pathway_type, max_items=5):
+        self.calls.append('action_items')
+        return [f'AI action {next(self.counter)}']
+
+
+@pytest.fixture
+def ai(monkeypatch):
+    monkeypatch.setattr(config, 'ROADMAP_AI_MODE', 'per_section')
+    monkeypatch.setattr(config, 'ROADMAP_INCREMENTAL', True)
+    monkeypatch.setattr(config, 'ROADMAP_SECTION_BUCKET', 5.0)
+    service = CountingAIService()
+    monkeypatch.setattr(roadmap_module, 'ai_service', service)
+    return service
+
+
+def weak_area(name, mastery):
+    return {'concept_name': name, 'mastery_percentage': mastery, 'mastery_level': 'developing',
+            'total_attempts': 3, 'recent_scores': [mastery], 'priority': 'medium'}
+
+
+WEAK_AREAS = [weak_area(name, mastery) for name, mastery in
+              [('Algebra', 20.0), ('Geometry', 30.0), ('Fractions', 40.0), ('Trig', 45.0), ('Ratios', 55.0)]]
+PERFORMANCE = {'total_quizzes': 5, 'average_score': 55.0, 'task_completion_rate': 0.4,
+               'completed_tasks': 2, 'total_tasks': 5}
+PATHWAY = {'pathway_type': 'balanced'}
+
+
+def generate(weak_areas, performance, previous=None):
+    recommendations, fingerprints = roadmap_service._generate_recommendations(
+        weak_areas, performance, PATHWAY, len(weak_areas), previous
+    )
+    return {'recommendations': recommendations, 'section_fingerprints': fingerprints}
+
+
+def regenerated(ai, weak_areas, performance):
+    """Sections rewritten when `weak_areas`/`performance` replace the base inputs, and the AI calls made."""
+    previous = generate(WEAK_AREAS, PERFORMANCE)
+    ai.calls.clear()
+    current = generate(weak_areas, performance, previous)
+    before = {r['type']: r['description'] for r in previous['recommendations']}
+    return {r['type'] for r in current['recommendations'] if r['description'] != before[r['type']]}, ai.calls
+
+
+def test_unchanged_inputs_make_no_ai_calls(ai):
+    assert regenerated(ai, WEAK_AREAS, PERFORMANCE) == (set(), [])
+
+
+def test_changing_one_weak_area_makes_one_ai_call(ai):
+    # Trig 45% -> 20% moves the weak-area average a bucket but leaves Algebra the weakest
+    weak_areas = [weak_area('Trig', 20.0) if area['concept_name'] == 'Trig' else area for area in WEAK_AREAS]
+    
+    sections, calls = regenerated(ai, weak_areas, PERFORMANCE)
+    
+    assert sections == {'strategy'}
+    assert calls == ['recommendation']
+
+
+@pytest.mark.parametrize('change, sections', [
+    # The focus prompt quotes the quiz count; so does the practice prompt
+    ({'total_quizzes': 6}, {'focus', 'practice'}),
+    # The engagement prompt quotes completed / total tasks
+    ({'completed_tasks': 3, 'total_tasks': 7}, {'engagement'}),
+])
+def test_every_value_a_prompt_quotes_is_fingerprinted(ai, change, sections):
+    assert regenerated(ai, WEAK_AREAS, dict(PERFORMANCE, **change))[0] == sections
+
+
+def test_crossing_a_fallback_threshold_regenerates_focus(ai, monkeypatch):
+    # 29% and 31% share a 10-point bucket but pick different template text
+    monkeypatch.setattr(config, 'ROADMAP_SECTION_BUCKET', 10.0)
+    before = [weak_area('Algebra', 29.0)] + WEAK_AREAS[1:]
+    after = [weak_area('Algebra', 31.0)] + WEAK_AREAS[1:]
+    previous = generate(before, PERFORMANCE)
+    ai.calls.clear()
+    
+    generate(after, PERFORMANCE, previous)
+    
+    assert sorted(ai.calls) == ['action_items', 'recommendation']
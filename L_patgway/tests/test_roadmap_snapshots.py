@@ -0,0 +1,104 @@
+"""Roadmap snapshots: versions, pruning, revalidation and two writers storing the same version."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from L_patgway import config
+from L_patgway.indexes import ensure_indexes
+from L_patgway.roadmap_service import roadmap_service
+from L_patgway.roadmap_snapshots import roadmap_snapshot_store
+
+
+@pytest.fixture(autouse=True)
+def snapshots(db, monkeypatch):
+    monkeypatch.setattr(config, 'MASTERY_BACKEND', 'recompute')
+    monkeypatch.setattr(config, 'PERFORMANCE_BACKEND', 'recompute')
+    # No background refreshes unless a test makes a snapshot due
+    monkeypatch.setattr(config, 'ROADMAP_SNAPSHOT_CHECK_INTERVAL', 3600)
+    ensure_indexes(db)
+
+
+def versions(db, student_id):
+    snapshots = db[config.ROADMAP_SNAPSHOT_COLLECTION].find({'student_id': ObjectId(student_id)})
+    return sorted(snapshot['version'] for snapshot in snapshots)
+
+
+def test_first_view_creates_version_one(db, student_id):
+    result = roadmap_snapshot_store.get_roadmap(student_id)
+    
+    assert result['snapshot']['version'] == 1
+    assert result['snapshot']['trigger'] == 'initial'
+    assert result['data']['student_id'] == student_id
+    assert roadmap_snapshot_store.get_roadmap(student_id)['snapshot']['version'] == 1
+    assert roadmap_snapshot_store.current_version(student_id) == 1
+
+
+def test_refresh_stores_the_next_version(db, student_id):
+    roadmap_snapshot_store.get_roadmap(student_id)
+    
+    result = roadmap_snapshot_store.get_roadmap(student_id, refresh=True)
+    
+    assert (result['snapshot']['version'], result['snapshot']['trigger']) == (2, 'manual')
+    assert versions(db, student_id) == [1, 2]
+
+
+def test_old_versions_are_pruned(db, student_id, monkeypatch):
+    monkeypatch.setattr(config, 'ROADMAP_SNAPSHOT_KEEP', 2)
+    
+    for _ in range(4):
+        roadmap_snapshot_store.create_snapshot(student_id, 'manual')
+    
+    assert versions(db, student_id) == [3, 4]
+
+
+def test_losing_writer_serves_the_stored_version(db, student_id, monkeypatch):
+    roadmap_snapshot_store.create_snapshot(student_id, 'initial')
+    generate = roadmap_service.generate_roadmap_guidance
+    
+    def another_worker_finishes_first(*args, **kwargs):
+        roadmap = generate(*args, **kwargs)
+        db[config.ROADMAP_SNAPSHOT_COLLECTION].insert_one({
+            'student_id': ObjectId(student_id), 'version': 2, 'trigger': 'age', 'roadmap': roadmap,
+            'mastery_signature': {}, 'created_at': datetime.utcnow(), 'checked_at': datetime.utcnow()
+        })
+        return roadmap
+    monkeypatch.setattr(roadmap_service, 'generate_roadmap_guidance', another_worker_finishes_first)
+    
+    snapshot = roadmap_snapshot_store.create_snapshot(student_id, 'mastery_change')
+    
+    assert (snapshot['version'], snapshot['trigger']) == (2, 'age')
+    assert versions(db, student_id) == [1, 2]
+
+
+def test_revalidation_only_regenerates_on_drift(db, student_id, monkeypatch):
+    monkeypatch.setattr(config, 'ROADMAP_REFRESH_THRESHOLD', 10)
+    first = roadmap_snapshot_store.create_snapshot(student_id, 'initial')
+    
+    assert roadmap_snapshot_store.revalidate(student_id) is None
+    assert roadmap_snapshot_store.latest(student_id)['checked_at'] >= first['checked_at']
+    
+    db.learning_activities.insert_many([
+        {'user_id': ObjectId(student_id), 'activity_type': 'quiz_complete', 'score': 100,
+         'metadata': {'concept': 'Fractions'}, 'created_at': datetime.utcnow()}
+        for _ in range(5)
+    ])
+    snapshot = roadmap_snapshot_store.revalidate(student_id)
+    
+    assert (snapshot['version'], snapshot['trigger']) == (2, 'mastery_change')
+
+
+def test_expired_snapshot_is_served_stale_and_regenerated(db, student_id, monkeypatch):
+    roadmap_snapshot_store.create_snapshot(student_id, 'initial')
+    db[config.ROADMAP_SNAPSHOT_COLLECTION].update_many({}, {'$set': {
+        'created_at': datetime.utcnow() - timedelta(seconds=config.ROADMAP_SNAPSHOT_MAX_AGE + 1)
+    }})
+    scheduled = []
+    monkeypatch.setattr(roadmap_snapshot_store, 'schedule_refresh', scheduled.append)
+    
+    result = roadmap_snapshot_store.get_roadmap(student_id)
+    
+    assert (result['snapshot']['version'], result['snapshot']['stale']) == (1, True)
+    assert scheduled == [student_id]
+    assert roadmap_snapshot_store.revalidate(student_id)['trigger'] == 'age'
@@ -0,0 +1,147 @@
+"""GET /api/roadmap/me/stream: 'roadmap' first, one 'recommendation' per section as it completes, then 'done'."""
+
+import importlib
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from L_patgway import config
+from L_patgway.roadmap_service import roadmap_service
+
+from conftest import auth
+
+# The package re-exports the service instance under the module's name
+roadmap_module = importlib.import_module('L_patgway.roadmap_service')
+
+FOCUS_PROMPT = 'working on the concept'
+
+
+class SlowFocusAIService:
+    """Answers the focus section only after `release` is set; every other section at once."""
+    
+    def __init__(self):
+        self.release = threading.Event()
+    
+    def generate_recommendation(self, prompt, max_tokens=200):
+        if FOCUS_PROMPT in prompt:
+            self.release.wait(5)
+            return 'AI focus'
+        return 'AI section'
+    
+    def generate_action_items(self, concept_name, mastery_percentage, pathway_type, max_items=5):
+        self.release.wait(5)
+        return [f'Practise {concept_name}']
+
+
+@pytest.fixture(autouse=True)
+def per_section(monkeypatch):
+    monkeypatch.setattr(config, 'MASTERY_BACKEND', 'recompute')
+    monkeypatch.setattr(config, 'PERFORMANCE_BACKEND', 'recompute')
+    monkeypatch.setattr(config, 'ROADMAP_AI_MODE', 'per_section')
+    monkeypatch.setattr(config, 'ROADMAP_SNAPSHOTS', False)
+    executor = ThreadPoolExecutor(max_workers=8)
+    monkeypatch.setattr(roadmap_module, '_ai_executor', executor)
+    monkeypatch.setattr(roadmap_module, '_hung_ai_calls', 0)
+    yield
+    executor.shutdown(wait=False)
+
+
+def read_events(response):
+    """The (event, data) pairs of a text/event-stream body."""
+    events = []
+    for block in response.get_data(as_text=True).split('\n\n'):
+        if block:
+            event, data = block.split('\n')
+            events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+    return events
+
+
+def stream(client, student_id, **headers):
+    return client.get('/api/roadmap/me/stream', headers=dict(auth('student', student_id), **headers))
+
+
+def test_events_arrive_in_order(client, student_id):
+    events = read_events(stream(client, student_id))
+    names = [event for event, _ in events]
+    roadmap = events[0][1]
+    pending = roadmap['pending_recommendations']
+    
+    assert names == ['roadmap'] + ['recommendation'] * len(pending) + ['done']
+    assert roadmap['recommendations'] == [] and roadmap['study_plan'] and roadmap['weak_areas']
+    assert sorted(payload['index'] for event, payload in events if event == 'recommendation') == list(range(len(pending)))
+    assert events[-1][1] == {'recommendations': len(pending)}
+
+
+def test_streamed_roadmap_matches_the_generated_one(client, student_id):
+    events = read_events(stream(client, student_id))
+    generated = roadmap_service.generate_roadmap_guidance(student_id)
+    
+    recommendations = {payload['index']: payload['recommendation'] for event, payload in events if event == 'recommendation'}
+    assert [recommendations[index] for index in sorted(recommendations)] == generated['recommendations']
+    assert [r['type'] for r in generated['recommendations']] == events[0][1]['pending_recommendations']
+    for key in ('pathway_type', 'weak_areas', 'focus_areas', 'study_plan', 'timeline', 'practice_schedule'):
+        assert events[0][1][key] == generated[key]
+
+
+def test_slow_sections_arrive_last(client, student_id, monkeypatch):
+    service = SlowFocusAIService()
+    monkeypatch.setattr(roadmap_module, 'ai_service', service)
+    response = client.get('/api/roadmap/me/stream', headers=auth('student', student_id), buffered=False)
+    
+    events = []
+    for chunk in response.response:
+        event, data = chunk.decode('utf-8').strip().split('\n')
+        events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+        # Every other section has been sent while focus is still waiting on the model
+        if len(events) == len(events[0][1]['pending_recommendations']):
+            service.release.set()
+    
+    recommendations = [payload for event, payload in events if event == 'recommendation']
+    weakest = events[0][1]['weak_areas'][0]['concept_name']
+    assert recommendations[-1]['index'] == 0
+    assert recommendations[-1]['recommendation']['description'] == 'AI focus'
+    assert recommendations[-1]['recommendation']['action_items'] == [f'Practise {weakest}']
+    assert all(r['recommendation']['description'] == 'AI section' for r in recommendations[:-1])
+    assert events[-1][0] == 'done'
+
+
+def test_batched_mode_sends_sections_in_order(client, student_id, monkeypatch):
+    monkeypatch.setattr(config, 'ROADMAP_AI_MODE', 'batched')
+    
+    events = read_events(stream(client, student_id))
+    indexes = [payload['index'] for event, payload in events if event == 'recommendation']
+    
+    assert indexes == list(range(len(events[0][1]['pending_recommendations'])))
+    assert events[-1][0] == 'done'
+
+
+def test_snapshot_mode_sends_the_snapshot(client, student_id, monkeypatch):
+    monkeypatch.setattr(config, 'ROADMAP_SNAPSHOTS', True)
+    monkeypatch.setattr(config, 'ROADMAP_SNAPSHOT_CHECK_INTERVAL', 3600)
+    
+    events = read_events(stream(client, student_id))
+    
+    assert [event for event, _ in events] == ['roadmap', 'done']
+    assert events[0][1]['snapshot']['version'] == 1
+    assert events[1][1] == {'recommendations': len(events[0][1]['recommendations'])}
+
+
+def test_failure_is_an_error_event(client, student_id, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError('boom')
+    monkeypatch.setattr(roadmap_service, '_roadmap_inputs', fail)
+    
+    response = stream(client, student_id)
+    
+    assert response.status_code == 200
+    assert read_events(response) == [('error', {'error': 'Failed to generate roadmap: boom'})]
+
+
+def test_stream_is_never_compressed(client, student_id):
+    response = stream(client, student_id, **{'Accept-Encoding': 'gzip'})
+    
+    assert response.mimetype == 'text/event-stream'
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['Cache-Control'] == 'no-cache'
@@ -0,0 +1,123 @@
+"""Timestamps reach clients as ISO 8601 strings; json_response and compress_response."""
+
+import gzip
+import json
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from flask import Flask
+
+from L_patgway import config, serialization
+from L_patgway.serialization import compress_response, json_response
+
+from conftest import auth
+
+
+@pytest.fixture(autouse=True)
+def recompute(monkeypatch):
+    monkeypatch.setattr(config, 'MASTERY_BACKEND', 'recompute')
+    monkeypatch.setattr(config, 'PERFORMANCE_BACKEND', 'recompute')
+
+
+def assert_iso(value):
+    assert isinstance(value, str)
+    datetime.fromisoformat(value)
+
+
+def test_timestamps_are_iso_strings_on_the_wire(client, student_id):
+    headers = auth('student', student_id)
+    mastery = client.get('/api/concept-mastery/me', headers=headers).get_json()['data']
+    pathway = client.get('/api/pathway/me', headers=headers).get_json()['data']
+    roadmap = client.get('/api/roadmap/me', headers=headers).get_json()['data']
+    
+    assert_iso(mastery['last_updated'])
+    for concept in mastery['concepts']:
+        assert_iso(concept['last_attempt'])
+    assert_iso(pathway['last_quiz_date'])
+    assert pathway['performance']['last_quiz_date'] == pathway['last_quiz_date']
+    assert_iso(roadmap['generated_at'])
+
+
+def test_services_return_iso_strings(student_id):
+    from L_patgway.concept_mastery import concept_mastery_service
+    from L_patgway.learning_pathway import learning_pathway_service
+    from L_patgway.roadmap_service import roadmap_service
+    
+    concept = concept_mastery_service.get_concept_mastery(student_id)['concepts'][0]
+    assert_iso(concept['last_attempt'])
+    assert_iso(learning_pathway_service.get_student_performance(student_id)['last_quiz_date'])
+    assert_iso(roadmap_service.generate_roadmap_guidance(student_id)['generated_at'])
+
+
+PAYLOAD = {
+    'id': ObjectId('64b7f0c2a1b2c3d4e5f60718'),
+    'at': datetime(2024, 3, 1, 12, 30, 5, 250000),
+    'tags': ('a', 'b'),
+    'name': 'Éclair'
+}
+EXPECTED = {'id': '64b7f0c2a1b2c3d4e5f60718', 'at': '2024-03-01T12:30:05.250000', 'tags': ['a', 'b'], 'name': 'Éclair'}
+
+
+@pytest.mark.parametrize('fast_json', [False, True])
+def test_json_response_encodes_service_types(monkeypatch, fast_json):
+    if fast_json:
+        pytest.importorskip('orjson')
+    monkeypatch.setattr(config, 'FAST_JSON', fast_json)
+    
+    response = json_response(PAYLOAD, 201)
+    
+    assert response.status_code == 201
+    assert response.mimetype == 'application/json'
+    assert json.loads(response.get_data()) == EXPECTED
+
+
+def test_json_response_without_orjson_uses_the_json_module(monkeypatch):
+    monkeypatch.setattr(config, 'FAST_JSON', True)
+    monkeypatch.setattr(serialization, 'orjson', None)
+    
+    assert json.loads(json_response(PAYLOAD).get_data()) == EXPECTED
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(config, 'COMPRESS_RESPONSES', True)
+    monkeypatch.setattr(config, 'COMPRESS_MIN_BYTES', 1024)
+    monkeypatch.setattr(serialization, 'brotli', None)
+    app = Flask(__name__)
+    app.after_request(compress_response)
+    
+    @app.route('/items/<int:count>')
+    def items(count):
+        response = json_response({'items': list(range(count))})
+        response.set_etag('v1')
+        return response
+    
+    return app.test_client()
+
+
+def test_large_bodies_are_gzipped(app):
+    response = app.get('/items/1000', headers={'Accept-Encoding': 'br, gzip'})
+    
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert json.loads(gzip.decompress(response.get_data())) == {'items': list(range(1000))}
+    assert response.headers['ETag'] == 'W/"v1"'
+
+
+@pytest.mark.parametrize('path, accept', [
+    ('/items/10', 'gzip'),          # below COMPRESS_MIN_BYTES
+    ('/items/1000', 'identity'),    # client does not accept gzip
+])
+def test_small_or_unaccepted_bodies_are_sent_as_is(app, path, accept):
+    response = app.get(path, headers={'Accept-Encoding': accept})
+    
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['ETag'] == '"v1"'
+    assert json.loads(response.get_data())['items']
+
+
+def test_compression_can_be_turned_off(app, monkeypatch):
+    monkeypatch.setattr(config, 'COMPRESS_RESPONSES', False)
+    
+    assert 'Content-Encoding' not in app.get('/items/1000', headers={'Accept-Encoding': 'gzip'}).headers
@@ -0,0 +1,53 @@
+"""A roadmap request reads each source collection once through its StudentContext."""
+
+import pytest
+
+from L_patgway import config
+from L_patgway.concept_mastery import concept_mastery_service
+from L_patgway.learning_pathway import learning_pathway_service
+from L_patgway.roadmap_service import roadmap_service
+from L_patgway.student_context import StudentContext, resolve_context
+
+
+@pytest.fixture(autouse=True)
+def python_recompute(monkeypatch):
+    monkeypatch.setattr(config, 'MASTERY_BACKEND', 'recompute')
+    monkeypatch.setattr(config, 'QUERY_MODE', 'python')
+    monkeypatch.setattr(config, 'PERFORMANCE_BACKEND', 'recompute')
+
+
+def test_roadmap_reads_each_collection_once(db, student_id):
+    context = StudentContext(student_id, db)
+    roadmap = roadmap_service.generate_roadmap_guidance(student_id, context)
+    
+    assert roadmap['weak_areas']
+    # learning_activities, engagement_logs, enrollments, structured_contents
+    assert context.round_trips == 4
+
+
+def test_services_share_the_context(db, student_id):
+    context = StudentContext(student_id, db)
+    concept_mastery_service.get_concept_mastery(student_id, context)
+    after_mastery = context.round_trips
+    
+    learning_pathway_service.determine_pathway(student_id, context)
+    roadmap_service.identify_weak_areas(student_id, context)
+    concept_mastery_service.get_concept_mastery(student_id, context)
+    
+    # Quizzes and tasks were already loaded for concept mastery
+    assert context.round_trips == after_mastery == 4
+
+
+def test_fresh_context_reads_again(db, student_id):
+    first = StudentContext(student_id, db)
+    second = StudentContext(student_id, db)
+    learning_pathway_service.get_student_performance(student_id, first)
+    learning_pathway_service.get_student_performance(student_id, second)
+    
+    assert first.round_trips == second.round_trips == 2
+
+
+def test_context_belongs_to_one_student(db, student_id):
+    context = StudentContext(student_id, db)
+    with pytest.raises(ValueError):
+        resolve_context('0' * 24, context)
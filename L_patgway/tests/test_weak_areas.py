@@ -0,0 +1,73 @@
+"""Roadmaps carry every weak area; /api/roadmap/weak-areas pages them."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from L_patgway import config
+from L_patgway.roadmap_service import roadmap_service
+
+from conftest import add_student, auth
+
+
+@pytest.fixture(autouse=True)
+def python_recompute(monkeypatch):
+    monkeypatch.setattr(config, 'MASTERY_BACKEND', 'recompute')
+    monkeypatch.setattr(config, 'PERFORMANCE_BACKEND', 'recompute')
+
+
+@pytest.fixture
+def weak_student(db) -> str:
+    """A student with more weak concepts than a page: Concept 00 (5%) through Concept 14 (33%)."""
+    student_id = add_student(db, quiz_scores=(90, 95))
+    now = datetime.utcnow()
+    db.learning_activities.insert_many([
+        {'user_id': ObjectId(student_id), 'activity_type': 'quiz_complete', 'score': 5 + 2 * index,
+         'quiz_id': ObjectId(), 'metadata': {'concept': f'Concept {index:02d}'},
+         'created_at': now - timedelta(hours=index)}
+        for index in range(15)
+    ])
+    return student_id
+
+
+def concept_names(weak_areas):
+    return [area['concept_name'] for area in weak_areas]
+
+
+def test_roadmap_keeps_every_weak_area(db, weak_student):
+    roadmap = roadmap_service.generate_roadmap_guidance(weak_student)
+    
+    assert concept_names(roadmap['weak_areas']) == concept_names(roadmap_service.identify_weak_areas(weak_student))
+    assert {f'Concept {index:02d}' for index in range(15)} <= set(concept_names(roadmap['weak_areas']))
+    assert len(roadmap['focus_areas']) == 5
+
+
+def test_weak_areas_are_paged_weakest_first(client, weak_student):
+    headers = auth('student', weak_student)
+    everything = roadmap_service.identify_weak_areas(weak_student)
+    
+    first = client.get('/api/roadmap/weak-areas?limit=4', headers=headers).get_json()['data']
+    second = client.get('/api/roadmap/weak-areas?limit=4&offset=4', headers=headers).get_json()['data']
+    
+    assert first['total'] == second['total'] == len(everything)
+    assert (first['limit'], first['offset'], second['offset']) == (4, 0, 4)
+    assert concept_names(first['weak_areas'] + second['weak_areas']) == concept_names(everything[:8])
+
+
+def test_weak_areas_page_past_the_end_is_empty(client, weak_student):
+    response = client.get('/api/roadmap/weak-areas?offset=500', headers=auth('student', weak_student))
+    
+    assert response.status_code == 200
+    assert response.get_json()['data']['weak_areas'] == []
+    assert response.get_json()['data']['limit'] == 20
+
+
+@pytest.mark.parametrize('query', [
+    'limit=0', 'limit=-3', f'limit={config.WEAK_AREAS_MAX_LIMIT + 1}', 'offset=-1',
+    'limit=abc', 'offset=1.5', 'limit='
+])
+def test_weak_areas_rejects_bad_paging(client, weak_student, query):
+    response = client.get(f'/api/roadmap/weak-areas?{query}', headers=auth('student', weak_student))
+    
+    assert response.status_code == 400